@@ -10,7 +10,13 @@ from core.singleton import check_single_instance
 from utils.icons import set_window_icon
 from ui.theme import apply_tencent_theme
 
-from core.store import load as load_store, save as save_store
+from core import store
+from core.store import load as load_store, save_later
+from core.prices import start_feed, stop_feed, latest_snapshot, load_last_good
+from core.instruments import by_code, codes_of
+from core.portfolio import PortfolioBook
+from core.lots import PnlBook
+from core.units import UnitConverter
 from ui.welcome import WelcomeSelector
 from ui.bubble import Bubble
 from ui.manager import ManagerWindow
@@ -47,10 +53,17 @@ class App:
 
         st = load_store()
         self.portfolios     = st.get("portfolios") or []
+        self.book           = PortfolioBook(self.portfolios)      # 所有仓的持仓汇总，估值 O(品种数)
+        self.pnl            = PnlBook(self.portfolios)            # 批次口径的已实现 / 浮动盈亏汇总
         self.active_index   = st.get("active_index")
-        self.display_quotes = st.get("display_quotes") or []
+        self.display_quotes = codes_of(st.get("display_quotes"))   # 旧数据存的是展示名，统一转成品种 code
         self.minimal_mode   = bool(st.get("minimal_mode", False))
         self.unit_overrides = st.get("unit_overrides") or {}
+        self.converter      = UnitConverter(self.unit_overrides)   # 展示报价按 unit_overrides 换算口径
+
+        # 行情：先载入上次的快照（标记 stale）立即可显示，后台线程同时开始取数
+        self._quote_listeners = []
+        self.feed = start_feed(seed=load_last_good())
 
         _ensure_tcltk()
 
@@ -68,6 +81,10 @@ class App:
         self.selector_win = None
         self.bubble = None
 
+        # Tk 线程只在 after() 里分发行情
+        self._update_watch()
+        self.root.after(200, self._pump_quotes)
+
         if len(self.display_quotes) != 2:
             self.open_selector(mode="welcome")
         else:
@@ -131,6 +148,7 @@ class App:
             msg.showwarning("选择不合法", "必须选择正好 2 个品种。"); return
 
         self.display_quotes = list(picks)
+        self._update_watch()
         self.save_all()
 
         try:
@@ -145,7 +163,7 @@ class App:
             self.open_bubble()
         else:
             if self.bubble and hasattr(self.bubble, "apply_quotes"):
-                self.bubble.apply_quotes(self.display_quotes)
+                self.bubble.apply_quotes(self.display_names())
 
     def _on_select_cancel(self, win, mode):
         try:
@@ -193,12 +211,16 @@ class App:
             portfolios_state={
                 "portfolios": self.portfolios,
                 "active_index": self.active_index,
-                "display_quotes": self.display_quotes,
+                "display_quotes": self.display_names(),
                 "minimal_mode": self.minimal_mode,
                 "unit_overrides": self.unit_overrides,
+                "unit_converter": self.converter,
                 "on_open_manager": open_manager_cb,
                 "on_open_selector": open_selector_cb,
                 "on_autostart_changed": autostart_changed_cb,
+                "get_quote_stats": self.quote_stats,
+                "get_total_pnl": self.total_pnl,
+                "get_pnl_report": self.pnl_report,
             }
         )
 
@@ -213,23 +235,93 @@ class App:
     def notify_portfolios_changed(self, portfolios, active_index=None):
         self.portfolios   = portfolios or []
         self.active_index = active_index
+        self.book.sync(self.portfolios)
+        self.pnl.sync(self.portfolios)
+        self._update_watch()
         self.save_all()
         if self.bubble and hasattr(self.bubble, "reload_all"):
             self.bubble.reload_all(
-                display_quotes=self.display_quotes,
+                display_quotes=self.display_names(),
                 portfolios=self.portfolios,
                 active_index=self.active_index
             )
 
+    def display_names(self):
+        """展示项 code → 当前上游展示名（气泡按名称匹配行情行）。"""
+        snap = latest_snapshot()
+        names = []
+        for code in self.display_quotes:
+            inst = by_code(code)
+            names.append(snap.name_of(code) or (inst.name if inst else code))
+        return names
+
+    def quote_view(self, snap=None):
+        """展示项按 unit_overrides 换算后的报价：[(code, 展示名, 价格, 单位)]，无价时价格为 None。"""
+        snap = self.feed.latest() if snap is None else snap
+        out = []
+        for code, name in zip(self.display_quotes, self.display_names()):
+            out.append((code, name, self.converter.value(snap, code), self.converter.unit_label(code)))
+        return out
+
+    def quote_stats(self):
+        """展示项的附加指标：code → {"chg_open": 较开盘涨跌幅, "vol": 短期波动率}，无数据为 NaN。"""
+        out = {}
+        for code in self.display_quotes:
+            v = self.feed.indicators.values(code) or {}
+            out[code] = {"chg_open": v.get("chg_open", float("nan")), "vol": v.get("vol", float("nan"))}
+        return out
+
+    def total_pnl(self):
+        """所有仓的总盈亏：对最新快照一次估值（各仓按各自绑定品种），无价时为 None。"""
+        return self.book.valuate(self.feed.latest()).total_pnl
+
+    def pnl_report(self):
+        """批次口径的盈亏：每仓 (已实现, 浮动) 与合计；同一快照、持仓未变时返回缓存结果。"""
+        return self.pnl.report(self.book.valuate(self.feed.latest()).prices)
+
+    # 行情分发
+    def _update_watch(self):
+        """关注品种 = 展示项 + 各仓绑定的计价品种；后台据此按交易时段调整轮询节奏。"""
+        codes = list(self.display_quotes) + self.book.codes()
+        self.feed.watch(codes)
+
+    def add_quote_listener(self, cb):
+        if cb not in self._quote_listeners:
+            self._quote_listeners.append(cb)
+
+    def remove_quote_listener(self, cb):
+        try: self._quote_listeners.remove(cb)
+        except ValueError: pass
+
+    def _pump_quotes(self):
+        try:
+            snap = self.feed.drain()
+            if snap is not None:
+                for cb in list(self._quote_listeners):
+                    try: cb(snap)
+                    except Exception: pass
+        finally:
+            try: self.root.after(200, self._pump_quotes)
+            except Exception: pass
+
     # 存储
+    def record_txn(self, p, txn):
+        """记一笔流水：只追加到该仓的分片，不整写存储。"""
+        store.append_txn(p, txn)
+
     def save_all(self):
+        """请求保存：后台合并防抖后原子写入，同一次操作里的多次调用只落盘一次。"""
         try:
-            save_store(self.portfolios, self.active_index, self.display_quotes)
+            save_later(self.portfolios, self.active_index, self.display_quotes)
         except Exception:
             pass
 
     # 退出
     def quit(self):
+        try: stop_feed()
+        except Exception: pass
+        try: store.close()
+        except Exception: pass
         try:
             if self.bubble and hasattr(self.bubble, "_quit"):
                 self.bubble._running = False
@@ -0,0 +1,295 @@
+# core/archive.py
+# 逐品种、逐日的 tick 归档：定长二进制记录、只追加；读取走 mmap，按时间戳二分定位区间，不整文件载入
+# 目录：<数据目录>/ticks/<品种code>/<YYYY-MM-DD>.tick（原始 tick）/ .m1（压缩后的分钟线）
+import datetime as _dt
+import mmap, os, re, sys, threading, time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from core.instruments import by_iid
+from core.resource import data_dir_in_appdata, APP_DIR_NAME
+
+ARCHIVE_DIR   = "ticks"
+TICK_EXT      = ".tick"         # 记录：<dd  (ts, price)
+BAR_EXT       = ".m1"           # 记录：<ddddd  (桶起点 ts, open, high, low, close)
+TICK_FIELDS   = 2
+BAR_FIELDS    = 5
+FLUSH_EVERY_S = 5.0             # 缓冲的 tick 最长多久写一次盘
+RAW_KEEP_DAYS = 7               # 原始 tick 保留天数，更早的压缩为分钟线
+BAR_S         = 60
+MAX_OPEN_MAPS = 32              # 同时保持映射的文件数
+
+_DAY_S = 86400
+_DAY_OFFSET_S = 8 * 3600        # 按北京时间自然日分文件
+_EPOCH = _dt.date(1970, 1, 1)
+_BIG_ENDIAN = sys.byteorder == "big"
+_BAD_CHARS = re.compile(r'[\\/:*?"<>|\s]+')
+
+
+def day_of(ts: float) -> int:
+    return int((ts + _DAY_OFFSET_S) // _DAY_S)
+
+def _day_name(day: int) -> str:
+    return (_EPOCH + _dt.timedelta(days=day)).isoformat()
+
+def _parse_day(name: str) -> Optional[int]:
+    try:
+        return (_dt.date.fromisoformat(name) - _EPOCH).days
+    except ValueError:
+        return None
+
+
+class _Mapped:
+    """一个只读映射：records 为按 double 展开的 memoryview，ts 为时间戳列的跨步视图（零拷贝）。"""
+    __slots__ = ("size", "mm", "records", "ts")
+
+    def __init__(self, f, size: int, fields: int):
+        self.size = size
+        self.mm = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+        self.records = memoryview(self.mm).cast("d")
+        self.ts = self.records[0::fields]
+
+    def close(self):
+        self.ts.release()
+        self.records.release()
+        self.mm.close()
+
+
+class TickArchive:
+    """tick 归档。add() 挂在 TickStore 的监听上，按 (品种, 日) 缓冲后批量追加写盘；
+    query() 读映射做二分，只拷贝命中的区间；compact() 把旧日子的原始 tick 压成分钟线。"""
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or os.path.join(data_dir_in_appdata(APP_DIR_NAME), ARCHIVE_DIR)
+        self._pending: Dict[Tuple[int, int], array] = {}
+        self._flushed_at = time.monotonic()
+        self._timer: Optional[threading.Timer] = None   # 缓冲非空时兜底的定时 flush
+        self._checked = set()           # 本次运行已校验过尾部的文件
+        self._dirs: Dict[int, str] = {}
+        self._maps: "OrderedDict[str, _Mapped]" = OrderedDict()
+        self._lock = threading.Lock()       # 写缓冲
+        self._map_lock = threading.Lock()   # 映射缓存
+
+    # ---------- 路径 ----------
+    def _dir_of_code(self, code: str) -> str:
+        return os.path.join(self.root, _BAD_CHARS.sub("_", code))
+
+    def _dir_of(self, iid: int) -> Optional[str]:
+        d = self._dirs.get(iid)
+        if d is None:
+            inst = by_iid(iid)
+            if inst is None:
+                return None
+            d = self._dirs[iid] = self._dir_of_code(inst.code)
+        return d
+
+    def path(self, code: str, day: int, ext: str = TICK_EXT) -> str:
+        return os.path.join(self._dir_of_code(code), _day_name(day) + ext)
+
+    # ---------- 写入 ----------
+    def add(self, iid: int, ts: float, px: float):
+        """TickStore 监听回调：先进缓冲，满 FLUSH_EVERY_S 秒批量落盘。
+        行情停了就不会再有 add 触发写盘，所以缓冲一非空就挂一个定时器，最迟 FLUSH_EVERY_S 秒后落盘。"""
+        key = (iid, day_of(ts))
+        with self._lock:
+            buf = self._pending.get(key)
+            if buf is None:
+                buf = self._pending[key] = array("d")
+            buf.append(ts); buf.append(px)
+            if time.monotonic() - self._flushed_at >= FLUSH_EVERY_S:
+                self._flush_locked()
+            elif self._timer is None:
+                self._timer = threading.Timer(FLUSH_EVERY_S, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, {}
+        self._flushed_at = time.monotonic()
+        rec = 8 * TICK_FIELDS
+        for (iid, day), buf in pending.items():
+            d = self._dir_of(iid)
+            if d is None:
+                continue
+            path = os.path.join(d, _day_name(day) + TICK_EXT)
+            try:
+                if path not in self._checked:
+                    os.makedirs(d, exist_ok=True)
+                    size = os.path.getsize(path) if os.path.exists(path) else 0
+                    if size % rec:          # 上次崩溃留下的半条记录
+                        with open(path, "r+b") as f:
+                            f.truncate(size - size % rec)
+                    self._checked.add(path)
+                if _BIG_ENDIAN:
+                    buf.byteswap()
+                with open(path, "ab") as f:
+                    buf.tofile(f)
+            except OSError:
+                continue
+
+    def close(self):
+        self.flush()
+        with self._map_lock:
+            for m in self._maps.values():
+                m.close()
+            self._maps.clear()
+
+    # ---------- 读取 ----------
+    def _mapped(self, path: str, fields: int) -> Optional[_Mapped]:
+        """取（或重建）映射；文件变长（当天仍在追加）时按新长度重新映射。调用方持有 _map_lock。"""
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return None
+        size -= size % (8 * fields)
+        m = self._maps.get(path)
+        if m is not None:
+            if m.size == size:
+                self._maps.move_to_end(path)
+                return m
+            self._drop(path)
+        if size <= 0:
+            return None
+        with open(path, "rb") as f:
+            m = _Mapped(f, size, fields)
+        self._maps[path] = m
+        while len(self._maps) > MAX_OPEN_MAPS:
+            _, old = self._maps.popitem(last=False)
+            old.close()
+        return m
+
+    def _drop(self, path: str):
+        m = self._maps.pop(path, None)
+        if m is not None:
+            m.close()
+
+    def _slice(self, path: str, fields: int, col: int, t0: float, t1: float,
+               out_ts: array, out_px: array):
+        with self._map_lock:
+            m = self._mapped(path, fields)
+            if m is None:
+                return
+            lo = bisect_left(m.ts, t0)
+            hi = bisect_right(m.ts, t1, lo)
+            if hi <= lo:
+                return
+            a, b = lo * fields, hi * fields
+            ts = m.records[a:b:fields].tobytes()
+            px = m.records[a + col:b:fields].tobytes()
+        n = len(out_ts)
+        out_ts.frombytes(ts); out_px.frombytes(px)
+        if _BIG_ENDIAN:
+            t, p = out_ts[n:], out_px[n:]
+            t.byteswap(); p.byteswap()
+            out_ts[n:] = t; out_px[n:] = p
+
+    def query(self, code: str, t0: float, t1: Optional[float] = None) -> Tuple[array, array]:
+        """[t0, t1] 区间内的 (时间戳, 价格)，按时间升序。已压缩的日子返回分钟线的收盘价。
+        仅包含已落盘的部分，最近几秒的缓冲请先 flush() 或从内存环里取。"""
+        t1 = time.time() if t1 is None else t1
+        out_ts, out_px = array("d"), array("d")
+        if t1 < t0:
+            return out_ts, out_px
+        for day in range(day_of(t0), day_of(t1) + 1):
+            raw = self.path(code, day, TICK_EXT)
+            if os.path.exists(raw):
+                self._slice(raw, TICK_FIELDS, 1, t0, t1, out_ts, out_px)
+                continue
+            bars = self.path(code, day, BAR_EXT)
+            if os.path.exists(bars):
+                self._slice(bars, BAR_FIELDS, 4, t0, t1, out_ts, out_px)
+        return out_ts, out_px
+
+    def days(self, code: str) -> List[int]:
+        """已归档的日子（原始或已压缩），升序。"""
+        try:
+            names = os.listdir(self._dir_of_code(code))
+        except OSError:
+            return []
+        out = set()
+        for n in names:
+            stem, ext = os.path.splitext(n)
+            if ext in (TICK_EXT, BAR_EXT):
+                d = _parse_day(stem)
+                if d is not None:
+                    out.add(d)
+        return sorted(out)
+
+    # ---------- 压缩 ----------
+    def _downsample(self, path: str, bar_s: int) -> array:
+        out = array("d")
+        with self._map_lock:
+            m = self._mapped(path, TICK_FIELDS)
+            if m is None:
+                return out
+            rec = m.records
+            bucket = None
+            o = h = l = c = 0.0
+            for i in range(0, len(rec), TICK_FIELDS):
+                ts, px = rec[i], rec[i + 1]
+                b = ts - ts % bar_s
+                if b != bucket:
+                    if bucket is not None:
+                        out.extend((bucket, o, h, l, c))
+                    bucket, o, h, l = b, px, px, px
+                elif px > h:
+                    h = px
+                elif px < l:
+                    l = px
+                c = px
+            if bucket is not None:
+                out.extend((bucket, o, h, l, c))
+            self._drop(path)
+        return out
+
+    def compact(self, now: Optional[float] = None, keep_days: int = RAW_KEEP_DAYS,
+                bar_s: int = BAR_S) -> int:
+        """把 keep_days 天以前的原始 tick 压成 bar_s 秒的 OHLC 文件并删除原文件；返回压缩的文件数。
+        先原子写出 .m1 再删 .tick，中途崩溃最多留下两份，下次只会补删原文件。"""
+        self.flush()
+        cutoff = day_of(time.time() if now is None else now) - keep_days
+        done = 0
+        try:
+            dirs = os.listdir(self.root)
+        except OSError:
+            return 0
+        for name in dirs:
+            d = os.path.join(self.root, name)
+            try:
+                files = os.listdir(d)
+            except OSError:
+                continue
+            for fn in files:
+                stem, ext = os.path.splitext(fn)
+                day = _parse_day(stem)
+                if ext != TICK_EXT or day is None or day >= cutoff:
+                    continue
+                raw = os.path.join(d, fn)
+                bars = os.path.join(d, stem + BAR_EXT)
+                try:
+                    if not os.path.exists(bars):
+                        out = self._downsample(raw, bar_s)
+                        if _BIG_ENDIAN:
+                            out.byteswap()
+                        tmp = bars + ".tmp"
+                        with open(tmp, "wb") as f:
+                            out.tofile(f)
+                            f.flush()
+                            os.fsync(f.fileno())
+                        os.replace(tmp, bars)
+                    with self._map_lock:
+                        self._drop(raw)
+                    os.remove(raw)
+                    self._checked.discard(raw)
+                    done += 1
+                except OSError:
+                    continue
+        return done
@@ -0,0 +1,235 @@
+# core/bars.py
+# 增量 K 线：每个品种按 1m/5m/15m/1h/1d 随 tick 实时聚合 OHLC，单 tick O(1)
+# 分桶遵循各市场交易时段：日内 K 线不跨时段（11:30 收盘、13:30 开盘各自截断），
+# 日线按交易日归属（SGE 夜盘算入下一交易日）；休市时段的 tick 不计入。
+from array import array
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from core.instruments import by_code, by_iid
+from core.sessions import MARKETS, session_at, sessions_of, sessions_between
+
+TIMEFRAMES: Tuple[Tuple[str, Optional[int]], ...] = (
+    ("1m", 60), ("5m", 300), ("15m", 900), ("1h", 3600), ("1d", None),   # None = 交易日
+)
+MAX_BARS = 2000                 # 每个周期在内存里保留的根数
+
+_DAY_S = 86400
+_CN_OFFSET_S = 8 * 3600         # 未知市场按北京时间自然日切日线
+
+
+class Bars(NamedTuple):
+    ts: array                   # 每根 K 线的开始时间（epoch 秒）
+    open: array
+    high: array
+    low: array
+    close: array
+
+
+class _SessionCursor:
+    """记住品种当前所在的时段，同一时段内的 tick 分桶不再查时段表。"""
+    __slots__ = ("market", "start", "end", "day_start")
+
+    def __init__(self, market: str):
+        self.market = market
+        self.start = self.end = self.day_start = 0.0
+
+    def locate(self, ts: float) -> bool:
+        """定位 ts 所在时段；休市返回 False。"""
+        if self.start <= ts < self.end:
+            return True
+        if self.market not in MARKETS:
+            s = ts - (ts + _CN_OFFSET_S) % _DAY_S
+            self.start, self.end, self.day_start = s, s + _DAY_S, s
+            return True
+        cur = session_at(self.market, ts)
+        if cur is None:
+            return False
+        a, b, day = cur
+        self.start, self.end = a, b
+        self.day_start = sessions_of(self.market, day)[0][0]
+        return True
+
+    def bucket(self, ts: float, tf: Optional[int]) -> float:
+        if tf is None:
+            return self.day_start
+        b = ts - ts % tf
+        return b if b > self.start else self.start
+
+
+class BarSeries:
+    """单品种单周期的 K 线列（array('d')），最后一根就地更新，超过 2 倍容量时批量裁掉最旧的。"""
+    __slots__ = ("tf", "cap", "ts", "o", "h", "l", "c")
+
+    def __init__(self, tf: Optional[int], cap: int = MAX_BARS):
+        self.tf = tf
+        self.cap = cap
+        self.ts, self.o, self.h, self.l, self.c = (array("d") for _ in range(5))
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    def update(self, bucket: float, px: float) -> bool:
+        """把一个 tick 计入 bucket 开始的 K 线；返回是否新开了一根。早于最后一根的 tick 丢弃。"""
+        ts = self.ts
+        if ts:
+            last = ts[-1]
+            if bucket == last:
+                if px > self.h[-1]:
+                    self.h[-1] = px
+                elif px < self.l[-1]:
+                    self.l[-1] = px
+                self.c[-1] = px
+                return False
+            if bucket < last:
+                return False
+        ts.append(bucket); self.o.append(px); self.h.append(px); self.l.append(px); self.c.append(px)
+        if len(ts) > 2 * self.cap:
+            self._trim(self.cap)
+        return True
+
+    def _trim(self, keep: int):
+        k = len(self.ts) - keep
+        if k > 0:
+            for col in (self.ts, self.o, self.h, self.l, self.c):
+                del col[:k]
+
+    def last(self) -> Optional[Tuple[float, float, float, float, float]]:
+        if not self.ts:
+            return None
+        return self.ts[-1], self.o[-1], self.h[-1], self.l[-1], self.c[-1]
+
+    def window(self, n: Optional[int] = None) -> Bars:
+        k = len(self.ts) if n is None else max(0, min(n, len(self.ts)))
+        s = len(self.ts) - k
+        return Bars(self.ts[s:], self.o[s:], self.h[s:], self.l[s:], self.c[s:])
+
+    def merge_before(self, b: Bars):
+        """把批量重建的历史 K 线接到实时 K 线前面；与第一根实时 K 线同桶时合并开/高/低。"""
+        if not self.ts:
+            self.ts, self.o, self.h, self.l, self.c = (array("d", col) for col in b)
+            self._trim(self.cap)
+            return
+        first = self.ts[0]
+        k = 0
+        while k < len(b.ts) and b.ts[k] < first:
+            k += 1
+        if k < len(b.ts) and b.ts[k] == first:
+            self.o[0] = b.open[k]
+            self.h[0] = max(self.h[0], b.high[k])
+            self.l[0] = min(self.l[0], b.low[k])
+        self.ts = b.ts[:k] + self.ts
+        self.o = b.open[:k] + self.o
+        self.h = b.high[:k] + self.h
+        self.l = b.low[:k] + self.l
+        self.c = b.close[:k] + self.c
+        self._trim(self.cap)
+
+
+def _session_table(market: str, t0: float, t1: float):
+    """[t0, t1] 覆盖的时段表：开始、结束、所属交易日首个时段的开始。"""
+    if market not in MARKETS:
+        d0 = t0 - (t0 + _CN_OFFSET_S) % _DAY_S
+        starts = [d0 + k * _DAY_S for k in range(int((t1 - d0) // _DAY_S) + 1)]
+        return starts, [s + _DAY_S for s in starts], starts
+    rows = sessions_between(market, t0, t1)
+    return ([a for a, _, _ in rows], [b for _, b, _ in rows],
+            [sessions_of(market, d)[0][0] for _, _, d in rows])
+
+
+def build_bars(ts, px, market: str, tf: Optional[int]) -> Bars:
+    """从按时间升序的 tick 批量生成 K 线（归档回补、回测用），结果与逐 tick 聚合一致。
+    有 NumPy 时全程向量化，否则逐条走与实时相同的分桶逻辑。"""
+    if not len(ts):
+        return Bars(*(array("d") for _ in range(5)))
+    if np is None:
+        cur, s = _SessionCursor(market), BarSeries(tf, cap=len(ts))
+        for t, p in zip(ts, px):
+            if cur.locate(t):
+                s.update(cur.bucket(t, tf), p)
+        return s.window()
+    t = np.asarray(ts, dtype=float)
+    p = np.asarray(px, dtype=float)
+    starts, ends, days = (np.asarray(x, dtype=float) for x in _session_table(market, t[0], t[-1]))
+    if not len(starts):
+        return Bars(*(array("d") for _ in range(5)))
+    k = np.searchsorted(starts, t, "right") - 1
+    ok = k >= 0
+    k = np.where(ok, k, 0)
+    ok &= t < ends[k]
+    t, p, k = t[ok], p[ok], k[ok]
+    if not len(t):
+        return Bars(*(array("d") for _ in range(5)))
+    if tf is None:
+        b = days[k]
+    else:
+        b = np.maximum(t - np.mod(t, tf), starts[k])
+    cut = np.flatnonzero(np.diff(b)) + 1
+    first = np.concatenate(([0], cut))
+    last = np.concatenate((cut - 1, [len(p) - 1]))
+    cols = (b[first], p[first], np.maximum.reduceat(p, first),
+            np.minimum.reduceat(p, first), p[last])
+    return Bars(*(array("d", c.tobytes()) for c in cols))
+
+
+class BarEngine:
+    """所有品种、所有周期的增量 K 线。on_tick 挂在 TickStore 监听上（取数线程），
+    UI 线程通过 bars() / last() 读取副本。"""
+    def __init__(self, timeframes=TIMEFRAMES, capacity: int = MAX_BARS):
+        self.timeframes = tuple(timeframes)
+        self.capacity = capacity
+        self._state: Dict[int, Tuple[_SessionCursor, List[Tuple[Optional[int], BarSeries]]]] = {}
+        self._series: Dict[Tuple[int, str], BarSeries] = {}
+        self._lock = threading.Lock()
+
+    def _new(self, iid: int):
+        inst = by_iid(iid)
+        cur = _SessionCursor(inst.market if inst else "")
+        rows = []
+        for name, tf in self.timeframes:
+            s = BarSeries(tf, self.capacity)
+            self._series[(iid, name)] = s
+            rows.append((tf, s))
+        st = self._state[iid] = (cur, rows)
+        return st
+
+    def on_tick(self, iid: int, ts: float, px: float):
+        with self._lock:
+            st = self._state.get(iid) or self._new(iid)
+            cur, rows = st
+            if not cur.locate(ts):
+                return
+            for tf, s in rows:
+                s.update(cur.bucket(ts, tf), px)
+
+    def _get(self, code: str, tf: str) -> Optional[BarSeries]:
+        inst = by_code(code)
+        return None if inst is None else self._series.get((inst.iid, tf))
+
+    def bars(self, code: str, tf: str = "1m", n: Optional[int] = None) -> Optional[Bars]:
+        with self._lock:
+            s = self._get(code, tf)
+            return None if s is None else s.window(n)
+
+    def last(self, code: str, tf: str = "1d") -> Optional[Tuple[float, float, float, float, float]]:
+        """当前（未收盘的）K 线 (开始, 开, 高, 低, 收)。"""
+        with self._lock:
+            s = self._get(code, tf)
+            return None if s is None else s.last()
+
+    def backfill(self, code: str, ts, px):
+        """用归档的 tick 批量重建各周期历史，并接到实时 K 线前面。"""
+        inst = by_code(code)
+        if inst is None or not len(ts):
+            return
+        built = [(name, build_bars(ts, px, inst.market, tf)) for name, tf in self.timeframes]
+        with self._lock:
+            if inst.iid not in self._state:
+                self._new(inst.iid)
+            for name, b in built:
+                self._series[(inst.iid, name)].merge_before(b)
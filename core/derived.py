@@ -0,0 +1,214 @@
+# core/derived.py
+# 衍生品种：价差、比值、境内外溢价等由表达式定义，解析一次成依赖图，只在输入变化时增量重算
+# 表达式为四则运算，标识符是品种 code（或上游展示名）与常量，例如 (NY_AU - LDN_AU) / LDN_AU * 100
+# 用户自定义放在数据目录的 derived.json：[{"code": "...", "name": "...", "expr": "...", "unit": "%"}]
+import ast, json, math, os, threading
+from typing import Callable, Dict, List, NamedTuple, Optional, Set
+
+from core.instruments import by_code, code_of, register
+from core.resource import data_dir_in_appdata, APP_DIR_NAME
+
+DERIVED_FILE = "derived.json"
+NAN = float("nan")
+
+CONSTANTS = {
+    "OZ_G": 31.1034768,         # 1 金衡盎司 = 31.1034768 克
+    "KG_G": 1000.0,
+}
+
+
+class Derived(NamedTuple):
+    code: str
+    name: str
+    expr: str
+    unit: str = ""
+    market: str = ""
+
+
+BUILTIN = (
+    Derived("SPREAD_LDN_NY", "伦-纽差价", "(NY_AU - LDN_AU) / LDN_AU * 100", "%", "SPOT"),
+    Derived("RATIO_AU_AG", "金银比", "LDN_AU / LDN_AG", "", "SPOT"),
+    # 境内 T+D（元/克）较伦敦金按美元人民币折算到元/克的溢价
+    Derived("PREMIUM_AUTD", "T+D溢价（较伦敦金）", "SGE_AUTD - LDN_AU * USDCNY / OZ_G", "g", "SGE"),
+)
+
+
+class ExprError(ValueError):
+    pass
+
+
+_BINOPS = {
+    ast.Add: lambda a, b: a + b,
+    ast.Sub: lambda a, b: a - b,
+    ast.Mult: lambda a, b: a * b,
+    ast.Div: lambda a, b: a / b if b else NAN,
+}
+
+
+def compile_expr(expr: str):
+    """表达式 → (求值函数 f(values), 依赖的品种 code 集合)。只允许数字、标识符、+ - * / 与括号。"""
+    try:
+        tree = ast.parse(expr, mode="eval").body
+    except SyntaxError as e:
+        raise ExprError(f"表达式语法错误：{expr}") from e
+    deps: Set[str] = set()
+
+    def build(node) -> Callable[[Dict[str, float]], float]:
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            v = float(node.value)
+            return lambda _vals: v
+        if isinstance(node, ast.Name):
+            if node.id in CONSTANTS:
+                v = CONSTANTS[node.id]
+                return lambda _vals: v
+            code = node.id if by_code(node.id) else code_of(node.id)
+            deps.add(code)
+            return lambda vals: vals.get(code, NAN)
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            f = build(node.operand)
+            if isinstance(node.op, ast.USub):
+                return lambda vals: -f(vals)
+            return f
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINOPS:
+            op, l, r = _BINOPS[type(node.op)], build(node.left), build(node.right)
+            return lambda vals: op(l(vals), r(vals))
+        raise ExprError(f"表达式不支持：{ast.dump(node)}")
+
+    return build(tree), deps
+
+
+def _same(a: float, b: float) -> bool:
+    return a == b or (a != a and b != b)
+
+
+class _Node:
+    __slots__ = ("d", "iid", "fn", "deps", "value", "line", "dirty")
+
+    def __init__(self, d: Derived, fn, deps: Set[str]):
+        self.d = d
+        self.iid = register(d.code, d.name, "derived", d.unit, "", d.market).iid
+        self.fn = fn
+        self.deps = deps
+        self.value = NAN
+        self.line = f"{d.name},"
+        self.dirty = True
+
+
+def _definitions_path() -> str:
+    return os.path.join(data_dir_in_appdata(APP_DIR_NAME), DERIVED_FILE)
+
+
+def load_definitions(path: Optional[str] = None) -> List[Derived]:
+    """内置定义 + 用户定义（同 code 时用户覆盖内置）；文件不存在或损坏时只用内置。"""
+    defs = {d.code: d for d in BUILTIN}
+    try:
+        with open(path or _definitions_path(), "r", encoding="utf-8") as f:
+            items = json.load(f)
+        for it in items if isinstance(items, list) else []:
+            code, expr = str(it.get("code") or "").strip(), str(it.get("expr") or "").strip()
+            if code and expr:
+                defs[code] = Derived(code, str(it.get("name") or code), expr,
+                                     str(it.get("unit") or ""), str(it.get("market") or ""))
+    except (OSError, ValueError, AttributeError):
+        pass
+    return list(defs.values())
+
+
+class DerivedEngine:
+    """衍生品种依赖图。apply(snap) 在取数线程里调用：对比输入价格找出变化的品种，
+    只按拓扑序重算受影响的节点，再把衍生行叠加进快照，UI 与上游行情一视同仁。
+    解析失败或循环依赖的定义记入 errors 并跳过。"""
+    def __init__(self, defs: Optional[List[Derived]] = None):
+        self._lock = threading.Lock()
+        self.errors: Dict[str, str] = {}
+        nodes: Dict[str, _Node] = {}
+        for d in (load_definitions() if defs is None else defs):
+            try:
+                fn, deps = compile_expr(d.expr)
+            except ExprError as e:
+                self.errors[d.code] = str(e)
+                continue
+            nodes[d.code] = _Node(d, fn, deps)
+        self.order = self._toposort(nodes)
+        self._nodes = {n.d.code: n for n in self.order}
+        self._inputs: Dict[int, str] = {}       # 上游品种 iid → code
+        for n in self.order:
+            for c in n.deps:
+                if c not in nodes:
+                    self._inputs[by_code(c).iid] = c
+        self._values: Dict[str, float] = {}
+
+    def _toposort(self, nodes: Dict[str, _Node]) -> List[_Node]:
+        out: List[_Node] = []
+        state: Dict[str, int] = {}          # 1 = 访问中，2 = 完成
+
+        def visit(code: str, path: List[str]) -> bool:
+            s = state.get(code)
+            if s == 2:
+                return code not in self.errors
+            if s == 1:
+                self.errors[code] = "循环依赖：" + " → ".join(path + [code])
+                return False
+            state[code] = 1
+            ok = all([visit(c, path + [code]) for c in nodes[code].deps if c in nodes])
+            state[code] = 2
+            if not ok:
+                self.errors.setdefault(code, "依赖的衍生品种无效")
+            elif code not in self.errors:
+                out.append(nodes[code])
+            return ok and code not in self.errors
+
+        for code in nodes:
+            visit(code, [])
+        return out
+
+    def codes(self) -> List[str]:
+        return [n.d.code for n in self.order]
+
+    def inputs(self, code: str) -> Set[str]:
+        """某衍生品种（递归展开后）依赖的上游品种 code；非衍生品种返回空集。"""
+        out: Set[str] = set()
+        todo = [code]
+        while todo:
+            n = self._nodes.get(todo.pop())
+            if n is None:
+                continue
+            for c in n.deps:
+                if c in self._nodes:
+                    todo.append(c)
+                else:
+                    out.add(c)
+        return out
+
+    def apply(self, snap):
+        if not self.order or not snap:
+            return snap
+        with self._lock:
+            vals, changed = self._values, set()
+            prices, ids = snap.prices, snap.ids
+            for iid, code in self._inputs.items():
+                i = ids.get(iid)
+                v = prices[i] if i is not None else NAN
+                if not _same(v, vals.get(code, NAN)):
+                    vals[code] = v
+                    changed.add(code)
+            lines = []
+            for n in self.order:
+                if n.dirty or not changed.isdisjoint(n.deps):
+                    n.dirty = False
+                    try:
+                        v = n.fn(vals)
+                    except ArithmeticError:
+                        v = NAN
+                    if not math.isfinite(v):
+                        v = NAN
+                    vals[n.d.code] = v
+                    if not _same(v, n.value):
+                        n.value = v
+                        n.line = f"{n.d.name}," if v != v else f"{n.d.name},{v:.4f}"
+                        changed.add(n.d.code)
+                        lines.append(n.line)
+                        continue
+                if n.d.name not in snap.index:
+                    lines.append(n.line)        # 全量快照里没有衍生行，补上缓存值
+            return snap.merged(lines, snap.ts) if lines else snap
@@ -0,0 +1,193 @@
+# core/importer.py
+# 批量导入对账单：流式读 CSV（银行积存金、金交所经纪商导出），按列映射逐批校验成流水。
+# 列映射：内置几种常见表头，数据目录的 import_mappings.json 可追加 / 覆盖：
+# {"名称": {"ts": "成交时间", "side": "买卖方向", "grams": "成交数量", "price": "成交价格", "fee": "手续费", ...}}
+import csv, json, os
+from datetime import datetime
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from core.resource import data_dir_in_appdata, APP_DIR_NAME
+from core.portfolio import new_pid
+
+MAPPINGS_FILE = "import_mappings.json"
+BATCH = 2000                    # 每批校验的行数
+ENCODINGS = ("utf-8-sig", "gb18030")
+BUY_WORDS = ("买", "买入", "BUY", "B", "申购", "主动积存", "定投", "开多")
+SELL_WORDS = ("卖", "卖出", "SELL", "S", "赎回", "平多")
+TS_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y/%m/%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y/%m/%d %H:%M",
+              "%Y%m%d %H:%M:%S", "%Y%m%d%H%M%S", "%Y-%m-%d", "%Y/%m/%d", "%Y%m%d")
+
+
+class ImportFailed(ValueError):
+    pass
+
+
+class ColumnMap(NamedTuple):
+    ts: str                     # 成交时间列（或只有日期）
+    side: str
+    grams: str
+    price: str
+    fee: str = ""               # 手续费金额列
+    fee_rate: str = ""          # 或手续费率(%)列
+    time: str = ""              # 日期、时间分两列时的时间列
+    qty_scale: float = 1.0      # 数量列 × 它 = 克（如按千克计填 1000）
+    price_scale: float = 1.0    # 价格列 × 它 = 元/克（如按元/千克计填 0.001）
+
+
+PRESETS: Dict[str, ColumnMap] = {
+    "通用": ColumnMap("时间", "类型", "数量", "价格", fee="手续费"),
+    "银行积存金": ColumnMap("交易时间", "交易类型", "交易克数", "成交价格", fee="手续费"),
+    "金交所经纪商": ColumnMap("成交日期", "买卖方向", "成交数量", "成交价格", fee="手续费", time="成交时间"),
+}
+
+
+def _mappings_path() -> str:
+    return os.path.join(data_dir_in_appdata(APP_DIR_NAME), MAPPINGS_FILE)
+
+
+def load_mappings(path: Optional[str] = None) -> Dict[str, ColumnMap]:
+    """内置映射 + 用户映射（同名时用户覆盖）；文件不存在或损坏时只用内置。"""
+    out = dict(PRESETS)
+    try:
+        with open(path or _mappings_path(), "r", encoding="utf-8") as f:
+            items = json.load(f)
+        for name, it in (items.items() if isinstance(items, dict) else ()):
+            try:
+                out[str(name)] = ColumnMap(**{k: (float(v) if k.endswith("_scale") else str(v))
+                                              for k, v in it.items() if k in ColumnMap._fields})
+            except (TypeError, ValueError, AttributeError):
+                continue
+    except (OSError, ValueError):
+        pass
+    return out
+
+
+def sniff(path: str) -> Tuple[str, List[str]]:
+    """识别编码并读表头，返回 (编码, 表头列名)。"""
+    for enc in ENCODINGS:
+        try:
+            with open(path, "r", encoding=enc, newline="") as f:
+                header = next(csv.reader(f), None)
+        except UnicodeDecodeError:
+            continue
+        if not header:
+            raise ImportFailed("文件为空")
+        return enc, [h.strip() for h in header]
+    raise ImportFailed("无法识别文件编码")
+
+
+def guess(header: List[str], mappings: Dict[str, ColumnMap]) -> Optional[str]:
+    """第一个所需列都在表头里的映射名。"""
+    cols = set(header)
+    for name, m in mappings.items():
+        need = [m.ts, m.side, m.grams, m.price] + [c for c in (m.fee, m.fee_rate, m.time) if c]
+        if all(c in cols for c in need):
+            return name
+    return None
+
+
+def _num(text: str) -> float:
+    return float(str(text).replace(",", "").replace("¥", "").replace("￥", "").strip())
+
+
+class _TsParser:
+    """记住上一次成功的格式，同一份文件基本只试一次。"""
+    def __init__(self):
+        self.fmt = TS_FORMATS[0]
+
+    def __call__(self, text: str) -> str:
+        text = " ".join(text.split())
+        for fmt in (self.fmt,) + TS_FORMATS:
+            try:
+                dt = datetime.strptime(text, fmt)
+            except ValueError:
+                continue
+            self.fmt = fmt
+            return dt.strftime("%Y-%m-%d %H:%M:%S")
+        raise ValueError(f"时间格式不认识：{text}")
+
+
+def _side(text: str) -> str:
+    t = text.strip().upper()
+    if t in BUY_WORDS or any(w in t for w in BUY_WORDS[:2]):
+        return "BUY"
+    if t in SELL_WORDS or any(w in t for w in SELL_WORDS[:2]):
+        return "SELL"
+    raise ValueError(f"买卖方向不认识：{text}")
+
+
+class ImportResult(NamedTuple):
+    txns: List[dict]                    # 已按时间排好序
+    errors: List[Tuple[int, str]]       # (文件行号, 原因)
+
+
+def _batches(path: str, enc: str, m: ColumnMap) -> Iterator[List[Tuple[int, List[str]]]]:
+    with open(path, "r", encoding=enc, newline="") as f:
+        reader = csv.reader(f)
+        header = [h.strip() for h in next(reader, [])]
+        pos = {c: i for i, c in enumerate(header)}
+        missing = [c for c in (m.ts, m.side, m.grams, m.price, m.fee, m.fee_rate, m.time) if c and c not in pos]
+        if missing:
+            raise ImportFailed("表头缺少列：" + "、".join(missing))
+        idx = [pos.get(c) if c else None for c in (m.ts, m.time, m.side, m.grams, m.price, m.fee, m.fee_rate)]
+        batch = []
+        for line, row in enumerate(reader, start=2):
+            if not any(cell.strip() for cell in row):
+                continue
+            batch.append((line, [row[i] if i is not None and i < len(row) else "" for i in idx]))
+            if len(batch) >= BATCH:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def _validate(batch, m: ColumnMap, ts_of: _TsParser, txns: List[dict], errors: List[Tuple[int, str]]):
+    for line, (ts, tm, side, q, px, fee, rate) in batch:
+        try:
+            t = ts_of(f"{ts} {tm}" if m.time else ts)
+            s = _side(side)
+            grams = _num(q) * m.qty_scale
+            price = _num(px) * m.price_scale
+            if grams <= 0 or price <= 0:
+                raise ValueError("数量和价格需大于 0")
+            amt = grams * price
+            if m.fee:
+                fee_amt = _num(fee) if fee.strip() else 0.0
+                fee_rate = fee_amt / amt * 100.0
+            elif m.fee_rate:
+                fee_rate = _num(rate) if rate.strip() else 0.0
+                fee_amt = amt * fee_rate / 100.0
+            else:
+                fee_amt = fee_rate = 0.0
+            if fee_amt < 0:
+                raise ValueError("手续费需为非负")
+        except ValueError as e:
+            errors.append((line, str(e)))
+            continue
+        txns.append({"id": new_pid(), "ts": t, "side": s, "grams": grams, "price": price,
+                     "fee_rate": fee_rate, "fee_amt": abs(fee_amt), "src": "import"})
+
+
+def _parse(path: str, m: ColumnMap, enc: str) -> ImportResult:
+    txns: List[dict] = []
+    errors: List[Tuple[int, str]] = []
+    ts_of = _TsParser()
+    for batch in _batches(path, enc, m):
+        _validate(batch, m, ts_of, txns, errors)
+    txns.sort(key=lambda t: t["ts"])
+    return ImportResult(txns, errors)
+
+
+def parse(path: str, m: ColumnMap, enc: Optional[str] = None) -> ImportResult:
+    """流式读取并逐批校验；无法识别的行记入 errors 跳过。结果按成交时间稳定排序（对账单常为倒序）。
+    sniff 只看表头：表头是 ASCII、正文是 GBK 的文件会在读到正文时解码失败，此时换下一种编码从头再读。"""
+    if enc is None:
+        enc, _header = sniff(path)
+    tried = [enc] + [e for e in ENCODINGS if e != enc]
+    for e in tried:
+        try:
+            return _parse(path, m, e)
+        except UnicodeDecodeError:
+            continue
+    raise ImportFailed("无法识别文件编码")
@@ -0,0 +1,282 @@
+# core/indicators.py
+# 流式技术指标：EMA、滑动窗口均值/标准差（Welford）、布林带、变化率、短期波动率
+# 每个 tick O(1) 更新，不重算整个窗口；*_batch 为同口径的 NumPy 批量版本（回测用），结果与逐 tick 一致。
+# 没装 numpy 时 *_batch 退回逐 tick 计算，返回 array('d')。
+# 约定：窗口类指标在样本不足一个窗口前为 NaN；标准差为总体标准差（ddof=0）。
+import math
+import threading
+from array import array
+from typing import Dict, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from core.instruments import by_code
+
+NAN = float("nan")
+EMA_PERIOD   = 20
+BOLL_WINDOW  = 20
+BOLL_K       = 2.0
+ROC_WINDOW   = 60
+VOL_WINDOW   = 60
+_RESYNC_EVERY = 64              # 每滑过 64 个窗口精确重算一次，抵消长时间运行的浮点漂移
+
+
+class EMA:
+    __slots__ = ("alpha", "value")
+
+    def __init__(self, period: int = EMA_PERIOD):
+        self.alpha = 2.0 / (period + 1)
+        self.value = NAN
+
+    def update(self, x: float) -> float:
+        v = self.value
+        self.value = x if v != v else v + self.alpha * (x - v)
+        return self.value
+
+
+class RollingStats:
+    """定长窗口的均值 / 方差：Welford 增量，进一个出一个，窗口存在环形 array 里。"""
+    __slots__ = ("n", "buf", "pos", "count", "mean", "m2", "_slid")
+
+    def __init__(self, n: int):
+        self.n = n
+        self.buf = array("d", bytes(8 * n))
+        self.pos = 0
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self._slid = 0
+
+    def update(self, x: float):
+        i = self.pos
+        if self.count < self.n:
+            self.count += 1
+            d = x - self.mean
+            self.mean += d / self.count
+            self.m2 += d * (x - self.mean)
+        else:
+            y = self.buf[i]
+            old = self.mean
+            self.mean = old + (x - y) / self.n
+            self.m2 += (x - y) * (x - self.mean + y - old)
+            self._slid += 1
+        self.buf[i] = x
+        self.pos = 0 if i + 1 == self.n else i + 1
+        if self._slid >= _RESYNC_EVERY * self.n:
+            self._resync()
+
+    def _resync(self):
+        self._slid = 0
+        m = sum(self.buf) / self.n
+        self.mean = m
+        self.m2 = sum((v - m) * (v - m) for v in self.buf)
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.n
+
+    def std(self) -> float:
+        if not self.full:
+            return NAN
+        return math.sqrt(max(self.m2, 0.0) / self.n)
+
+    def avg(self) -> float:
+        return self.mean if self.full else NAN
+
+
+class Bollinger:
+    __slots__ = ("k", "stats")
+
+    def __init__(self, n: int = BOLL_WINDOW, k: float = BOLL_K):
+        self.k = k
+        self.stats = RollingStats(n)
+
+    def update(self, x: float) -> Tuple[float, float, float]:
+        self.stats.update(x)
+        return self.bands()
+
+    def bands(self) -> Tuple[float, float, float]:
+        """(下轨, 中轨, 上轨)"""
+        m, s = self.stats.avg(), self.stats.std()
+        return m - self.k * s, m, m + self.k * s
+
+
+class ROC:
+    """变化率：x / x[n 个 tick 前] - 1。"""
+    __slots__ = ("n", "buf", "pos", "count", "value")
+
+    def __init__(self, n: int = ROC_WINDOW):
+        self.n = n
+        self.buf = array("d", bytes(8 * n))
+        self.pos = 0
+        self.count = 0
+        self.value = NAN
+
+    def update(self, x: float) -> float:
+        i = self.pos
+        if self.count >= self.n:
+            y = self.buf[i]
+            self.value = x / y - 1.0 if y else NAN
+        else:
+            self.count += 1
+        self.buf[i] = x
+        self.pos = 0 if i + 1 == self.n else i + 1
+        return self.value
+
+
+class Volatility:
+    """短期波动率：最近 n 个逐笔收益率（x / 上一个 x - 1）的标准差。"""
+    __slots__ = ("last", "stats")
+
+    def __init__(self, n: int = VOL_WINDOW):
+        self.last = NAN
+        self.stats = RollingStats(n)
+
+    def update(self, x: float) -> float:
+        last, self.last = self.last, x
+        if last == last and last:
+            self.stats.update(x / last - 1.0)
+        return self.stats.std()
+
+
+# ---------- 批量（NumPy） ----------
+def _stream(px, update) -> array:
+    """没有 numpy 时的批量版本：逐 tick 喂给流式指标。"""
+    return array("d", map(update, px))
+
+
+def ema_batch(px, period: int = EMA_PERIOD):
+    """与 EMA.update 逐点一致。分块用闭式解向量化，块长保证衰减因子的倒数不超过 1e6，避免精度损失。"""
+    if np is None:
+        return _stream(px, EMA(period).update)
+    x = np.asarray(px, dtype=float)
+    out = np.empty_like(x)
+    if not len(x):
+        return out
+    a = 2.0 / (period + 1)
+    d = 1.0 - a
+    block = max(1, int(math.log(1e6) / -math.log(d))) if d > 0 else 1
+    prev = x[0]
+    out[0] = prev
+    for s in range(1, len(x), block):
+        seg = x[s:s + block]
+        k = np.arange(1, len(seg) + 1)
+        w = d ** -k                              # d^-1 .. d^-m
+        acc = np.cumsum(a * seg * w)
+        out[s:s + len(seg)] = d ** k * (prev + acc)
+        prev = out[s + len(seg) - 1]
+    return out
+
+
+def _windows(x, n: int):
+    return np.lib.stride_tricks.sliding_window_view(x, n)
+
+
+def rolling_std_batch(px, n: int):
+    if np is None:
+        s = RollingStats(n)
+        return _stream(px, lambda x: (s.update(x), s.std())[1])
+    x = np.asarray(px, dtype=float)
+    out = np.full(len(x), np.nan)
+    if len(x) >= n:
+        out[n - 1:] = _windows(x, n).std(axis=1)
+    return out
+
+
+def bollinger_batch(px, n: int = BOLL_WINDOW, k: float = BOLL_K):
+    """返回 (下轨, 中轨, 上轨) 三列。"""
+    if np is None:
+        b = Bollinger(n, k)
+        rows = [b.update(x) for x in px]
+        return tuple(array("d", (r[j] for r in rows)) for j in range(3))
+    x = np.asarray(px, dtype=float)
+    mid = np.full(len(x), np.nan)
+    if len(x) >= n:
+        mid[n - 1:] = _windows(x, n).mean(axis=1)
+    s = rolling_std_batch(x, n)
+    return mid - k * s, mid, mid + k * s
+
+
+def roc_batch(px, n: int = ROC_WINDOW):
+    if np is None:
+        return _stream(px, ROC(n).update)
+    x = np.asarray(px, dtype=float)
+    out = np.full(len(x), np.nan)
+    if len(x) > n:
+        base = x[:-n]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out[n:] = np.where(base != 0, x[n:] / base - 1.0, np.nan)
+    return out
+
+
+def volatility_batch(px, n: int = VOL_WINDOW):
+    if np is None:
+        return _stream(px, Volatility(n).update)
+    x = np.asarray(px, dtype=float)
+    out = np.full(len(x), np.nan)
+    if len(x) > 1:
+        out[1:] = rolling_std_batch(x[1:] / x[:-1] - 1.0, n)
+    return out
+
+
+# ---------- 引擎 ----------
+class _Set:
+    __slots__ = ("last", "ema", "boll", "roc", "vol")
+
+    def __init__(self):
+        self.last = NAN
+        self.ema = EMA()
+        self.boll = Bollinger()
+        self.roc = ROC()
+        self.vol = Volatility()
+
+
+class IndicatorEngine:
+    """每个品种一组流式指标，on_tick 挂在 TickStore 监听上（取数线程）。
+    涨跌幅（较开盘）取 BarEngine 当前日线的开盘价。"""
+    def __init__(self, bars=None):
+        self.bars = bars
+        self._sets: Dict[int, _Set] = {}
+        self._lock = threading.Lock()
+
+    def on_tick(self, iid: int, ts: float, px: float):
+        with self._lock:
+            s = self._sets.get(iid)
+            if s is None:
+                s = self._sets[iid] = _Set()
+            s.last = px
+            s.ema.update(px)
+            s.boll.update(px)
+            s.roc.update(px)
+            s.vol.update(px)
+
+    def change_vs_open(self, code: str) -> float:
+        """最新价较当前交易日开盘价的涨跌幅；没有日线或最新价时为 NaN。"""
+        inst = by_code(code)
+        if inst is None or self.bars is None:
+            return NAN
+        with self._lock:
+            s = self._sets.get(inst.iid)
+            px = s.last if s else NAN
+        bar = self.bars.last(code, "1d")
+        if bar is None or px != px or not bar[1]:
+            return NAN
+        return px / bar[1] - 1.0
+
+    def values(self, code: str) -> Optional[Dict[str, float]]:
+        inst = by_code(code)
+        if inst is None:
+            return None
+        with self._lock:
+            s = self._sets.get(inst.iid)
+            if s is None:
+                return None
+            lo, mid, hi = s.boll.bands()
+            out = {"last": s.last, "ema": s.ema.value, "boll_lower": lo, "boll_mid": mid,
+                   "boll_upper": hi, "std": s.boll.stats.std(), "roc": s.roc.value,
+                   "vol": s.vol.stats.std()}
+        out["chg_open"] = self.change_vs_open(code)
+        return out
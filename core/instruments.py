@@ -0,0 +1,139 @@
+# core/instruments.py
+# 品种注册表：上游展示名 / 别名 → 稳定的品种 ID + 元数据
+# 上游中文名时常变化，落盘（display_quotes、仓绑定）一律存 code，不存展示名。
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+
+class Instrument(NamedTuple):
+    iid: int          # 稳定数字 ID（内存索引用）
+    code: str         # 稳定字符串 ID（落盘用）
+    name: str         # 默认展示名
+    source: str       # sina / jd / derived / unknown
+    unit: str         # oz / g / kg / USD / %
+    currency: str     # USD / CNY / ""
+    reco: bool = False
+    market: str = ""  # 交易时段表（core.sessions.MARKETS），空表示未知 / 全天
+
+
+# 目录：ID 一经发布不再改动，新品种只追加
+_CATALOG = (
+    Instrument(1,  "LDN_AU",        "伦敦金（现货黄金）", "sina", "oz", "USD", True,  "SPOT"),
+    Instrument(2,  "NY_AU",         "纽约黄金",           "sina", "oz", "USD", False, "COMEX"),
+    Instrument(3,  "SGE_AUTD",      "黄金延期",           "sina", "g",  "CNY", True,  "SGE"),
+    Instrument(4,  "JD_AUTD",       "黄金T+D",            "jd",   "g",  "CNY", False, "SGE"),
+    Instrument(5,  "SGE_AGTD",      "白银延期",           "sina", "kg", "CNY", False, "SGE"),
+    Instrument(6,  "JD_AGTD",       "白银T+D",            "jd",   "kg", "CNY", False, "SGE"),
+    Instrument(7,  "CZB_JCJ",       "浙商银行积存金",     "jd",   "g",  "CNY", False, "SGE"),
+    Instrument(8,  "LDN_AG",        "伦敦银（现货白银）", "sina", "oz", "USD", False, "SPOT"),
+    Instrument(9,  "NY_AG",         "纽约白银",           "sina", "oz", "USD", False, "COMEX"),
+    Instrument(10, "USDCNY",        "美元人民币",         "sina", "USD", "CNY", False, "CFETS"),
+    Instrument(11, "SPREAD_LDN_NY", "伦-纽差价",          "derived", "%", "", False, "SPOT"),
+    Instrument(12, "RATIO_AU_AG",   "金银比",             "derived", "",  "", False, "SPOT"),
+    Instrument(13, "PREMIUM_AUTD",  "T+D溢价（较伦敦金）", "derived", "g", "CNY", False, "SGE"),
+)
+
+# 精确别名
+_ALIASES = {
+    "伦敦金": "LDN_AU", "现货黄金": "LDN_AU", "XAU": "LDN_AU",
+    "纽约金": "NY_AU", "COMEX黄金": "NY_AU",
+    "Au(T+D)": "JD_AUTD",
+    "Ag(T+D)": "JD_AGTD",
+    "浙商积存金": "CZB_JCJ",
+    "伦敦银": "LDN_AG", "现货白银": "LDN_AG",
+    "USDCNY": "USDCNY", "在岸人民币": "USDCNY",
+}
+
+# 子串规则（按顺序匹配）：(code, 任一命中, 需同时包含, 不可包含)
+_RULES = (
+    ("JD_AUTD",  ("黄金T+D", "Au(T+D)"),   (),        ()),
+    ("CZB_JCJ",  ("积存金",),               ("浙商",), ()),
+    ("JD_AGTD",  ("白银T+D", "Ag(T+D)"),   ("(JD)",), ()),
+    ("SGE_AUTD", ("黄金延期",),             (),        ("(JD)",)),
+    ("SGE_AGTD", ("白银延期", "白银T+D"),  (),        ("(JD)",)),
+    ("LDN_AU",   ("伦敦金",),               (),        ("(JD)",)),
+    ("NY_AU",    ("纽约黄金", "纽约金"),    (),        ("(JD)",)),
+    ("LDN_AG",   ("伦敦银",),               (),        ("(JD)",)),
+    ("NY_AG",    ("纽约白银", "纽约银"),    (),        ("(JD)",)),
+    ("USDCNY",   ("美元人民币", "USDCNY"),  (),        ()),
+)
+
+_DYNAMIC_BASE = 10000      # 目录外品种的临时 ID 起点（仅进程内有效）
+
+_by_code: Dict[str, Instrument] = {i.code: i for i in _CATALOG}
+_by_iid:  Dict[int, Instrument] = {i.iid: i for i in _CATALOG}
+_by_name: Dict[str, Instrument] = {}
+_lock = threading.Lock()
+
+for _i in _CATALOG:
+    _by_name[_i.name] = _i
+for _alias, _code in _ALIASES.items():
+    _by_name[_alias] = _by_code[_code]
+
+
+def _match_rules(name: str) -> Optional[Instrument]:
+    for code, any_of, all_of, none_of in _RULES:
+        if any(k in name for k in any_of) and all(k in name for k in all_of) \
+                and not any(k in name for k in none_of):
+            return _by_code[code]
+    return None
+
+
+def resolve(name: str) -> Instrument:
+    """上游名称 → 品种。每个新名称只解析一次，之后走缓存。
+    目录外的名称登记为 source=unknown，code 即原名称。"""
+    name = (name or "").strip()
+    inst = _by_name.get(name)
+    if inst is not None:
+        return inst
+    with _lock:
+        inst = _by_name.get(name)
+        if inst is None:
+            inst = _by_code.get(name) or _match_rules(name)
+            if inst is None:
+                jd = "(JD)" in name
+                inst = Instrument(_DYNAMIC_BASE + len(_by_iid), name, name,
+                                  "jd" if jd else "unknown", "", "")
+                _by_code[inst.code] = inst
+                _by_iid[inst.iid] = inst
+            _by_name[name] = inst
+    return inst
+
+
+def register(code: str, name: str, source: str = "derived", unit: str = "", currency: str = "",
+             market: str = "") -> Instrument:
+    """登记目录外的品种（用户自定义的衍生品种等），已存在时原样返回。ID 仅进程内有效，落盘用 code。"""
+    with _lock:
+        inst = _by_code.get(code)
+        if inst is None:
+            inst = Instrument(_DYNAMIC_BASE + len(_by_iid), code, name or code, source, unit, currency,
+                              False, market)
+            _by_code[code] = inst
+            _by_iid[inst.iid] = inst
+        old = _by_name.get(inst.name)
+        if old is None or old.source == "unknown":     # 登记前已被当作未知名称解析过
+            _by_name[inst.name] = inst
+    return inst
+
+
+def by_code(code: str) -> Optional[Instrument]:
+    return _by_code.get(code)
+
+
+def by_iid(iid: int) -> Optional[Instrument]:
+    return _by_iid.get(iid)
+
+
+def code_of(name_or_code: str) -> str:
+    """兼容旧数据：已是 code 原样返回，否则按展示名解析。"""
+    if name_or_code in _by_code:
+        return name_or_code
+    return resolve(name_or_code).code
+
+
+def codes_of(items: Iterable[str]) -> List[str]:
+    return [code_of(x) for x in (items or [])]
+
+
+def catalog() -> List[Instrument]:
+    return list(_CATALOG)
@@ -0,0 +1,274 @@
+# core/ledger.py
+# 流水重放：由仓的流水（加上期初持仓）重算每笔之后的持仓克数、持仓总成本（加权平均成本法）、累计手续费与累计已实现盈亏。
+# 买入：手续费计入成本；卖出：均价不变，已实现 = (成交价 − 均价) × 克数 − 手续费，卖光时成本归零；ADJ：直接校正为记录的克数 / 均价。
+# 重放结果的各列同时是每一行的检查点：改 / 删第 i 笔时只从第 i 行往后重放；新成交只算一步。
+from array import array
+from typing import List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+EPS = 1e-9                  # 克数小于它视为清仓
+BAND = 3.0                  # 一段内成本缩减的对数跨度上限：限制 exp 的放大倍数，累加误差保持在 1e-9 量级
+BUY, SELL, ADJ, NOP = 0.0, 1.0, 2.0, 3.0
+_KINDS = {"BUY": BUY, "SELL": SELL, "ADJ": ADJ}
+
+
+def _inputs(t: dict) -> Tuple[float, float, float, float, float, float]:
+    """一笔流水 → (类型, 克数, 价格, 手续费, 校正克数, 校正均价)。"""
+    kind = _KINDS.get(t.get("side"), NOP)
+    if kind == NOP:
+        return NOP, 0.0, 0.0, 0.0, 0.0, 0.0
+    if kind == ADJ:
+        return ADJ, 0.0, 0.0, 0.0, float(t.get("post_grams") or 0.0), float(t.get("post_avg") or 0.0)
+    return (kind, float(t.get("grams") or 0.0), float(t.get("price") or 0.0),
+            float(t.get("fee_amt") or 0.0), 0.0, 0.0)
+
+
+def infer_opening(txns: List[dict]) -> Tuple[float, float]:
+    """旧数据没有记期初持仓：由第一笔流水记下的成交后克数 / 均价倒推。"""
+    if not txns:
+        return 0.0, 0.0
+    t = txns[0]
+    kind, q, px, fee, _g, _a = _inputs(t)
+    g1, a1 = float(t.get("post_grams") or 0.0), float(t.get("post_avg") or 0.0)
+    if kind == BUY:
+        g0 = g1 - q
+        return (g0, (g1 * a1 - px * q - fee) / g0) if g0 > EPS else (0.0, 0.0)
+    if kind == SELL:
+        return g1 + q, (a1 if g1 > EPS else px)
+    return 0.0, 0.0
+
+
+def _step(kind, q, px, fee, adj_g, adj_a, g, c, rz, fs):
+    """逐笔重放一步：(克数, 总成本, 累计已实现, 累计手续费) → 下一行。"""
+    if kind == BUY:
+        return g + q, c + px * q + fee, rz, fs + fee
+    if kind == SELL:
+        g1 = g - q
+        avg = c / g if g > EPS else 0.0
+        rz += (px - avg) * q - fee
+        return g1, (0.0 if g1 <= EPS else c * g1 / g), rz, fs + fee
+    if kind == ADJ:
+        return adj_g, (adj_g * adj_a if adj_g > EPS else 0.0), rz, fs
+    return g, c, rz, fs
+
+
+def _replay_py(cols, state):
+    g, c, rz, fs = state
+    out = (array("d"), array("d"), array("d"), array("d"))
+    for row in zip(*cols):
+        g, c, rz, fs = _step(*row, g, c, rz, fs)
+        for a, v in zip(out, (g, c, rz, fs)):
+            a.append(v)
+    return out
+
+
+def _replay_np(cols, state):
+    """向量化重放。克数 = 最近一次 ADJ 的克数 + 之后的净买卖；
+    总成本满足 C_k = r_k·C_{k−1} + b_k（买入 r=1、b=成交额+手续费；卖出 r=剩余/原持仓、b=0；清仓与 ADJ r=0），
+    以 r=0 处为段首分段，段内按对数累积乘积化成 cumsum 闭式解；缩减超过 BAND 的长段再切开，
+    切口处带过来的余额 K_i = r·(C⁰ + K_{i−1}·衰减) 是切口个数长度的标量递推，算完再整体补回。"""
+    kind, q, px, fee, adj_g, adj_a = (np.frombuffer(c, dtype=float) for c in cols)
+    g0, c0, rz0, fs0 = state
+    n = len(kind)
+    idx = np.arange(n)
+    is_adj = kind == ADJ
+    signed = np.where(kind == BUY, q, np.where(kind == SELL, -q, 0.0))
+    raw = np.cumsum(signed)
+    last = np.maximum.accumulate(np.where(is_adj, idx, -1))
+    at = np.maximum(last, 0)
+    g = np.where(last >= 0, adj_g[at] + raw - raw[at], g0 + raw)
+    g_prev = np.concatenate(([g0], g[:-1]))
+
+    sell = kind == SELL
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r = np.where(sell, np.where(g_prev > EPS, g / g_prev, 0.0), 1.0)
+    r = np.where((sell & (g <= EPS)) | is_adj, 0.0, r)
+    b = np.where(kind == BUY, px * q + fee, np.where(is_adj & (adj_g > EPS), adj_g * adj_a, 0.0))
+    b[0] += r[0] * c0
+
+    L = np.cumsum(np.log(np.where(r > 0, r, 1.0)))
+    reset = (r == 0) | (idx == 0)
+    seg = np.maximum.accumulate(np.where(reset, idx, 0))
+    drop = L[seg] - L
+    band = np.floor(drop / BAND)
+    pseudo = np.zeros(n, dtype=bool)
+    pseudo[1:] = (band[1:] != band[:-1]) & ~reset[1:]
+    start = reset | pseudo
+    seg = np.maximum.accumulate(np.where(start, idx, 0))
+    E = np.exp(L - L[seg])                  # 段首到第 k 笔的成本缩减比例，(e^-BAND, 1]
+    cs = np.cumsum(b / E)
+    before = np.where(seg > 0, cs[np.maximum(seg - 1, 0)], 0.0)
+    c = E * (cs - before)
+    ps = np.flatnonzero(pseudo)
+    if len(ps):
+        prev = seg[ps - 1]
+        alpha = (r[ps] * np.exp(L[ps - 1] - L[prev]) * pseudo[prev]).tolist()
+        beta = (r[ps] * c[ps - 1]).tolist()
+        K, k = [], 0.0
+        for a, b_ in zip(alpha, beta):
+            k = b_ + a * k
+            K.append(k)
+        kid = np.searchsorted(ps, seg, side="right") - 1
+        c += np.asarray(K)[np.maximum(kid, 0)] * E * pseudo[seg]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        c_prev = np.concatenate(([c0], c[:-1]))
+        avg_prev = np.where(g_prev > EPS, c_prev / g_prev, 0.0)
+    rz = rz0 + np.cumsum(np.where(sell, (px - avg_prev) * q - fee, 0.0))
+    fs = fs0 + np.cumsum(np.where(is_adj, 0.0, fee))
+    g = np.where(np.abs(g) <= EPS, 0.0, g)
+    return tuple(array("d", x.tobytes()) for x in (g, c, rz, fs))
+
+
+class Ledger:
+    """一个仓的重放账本。输入列在载入时从流水抽取一次，之后的重放只在数组上算。
+    bad 为第一笔卖出超过持仓的流水下标（-1 表示没有）；edit / delete 新出现超卖时会回滚并返回 False，
+    旧数据里原有的超卖行不挡修改。"""
+    def __init__(self, txns: List[dict], opening: Optional[Tuple[float, float]] = None):
+        g, a = opening if opening is not None else infer_opening(txns)
+        self.opening = (float(g), float(a))
+        self._cols = tuple(array("d") for _ in range(6))
+        self.grams, self.cost, self.realized, self.fees = (array("d") for _ in range(4))
+        self.bad = -1
+        for t in txns:
+            for col, v in zip(self._cols, _inputs(t)):
+                col.append(v)
+        self.replay(0)
+
+    def __len__(self):
+        return len(self._cols[0])
+
+    def _state(self, i: int):
+        """第 i 笔之前的状态。"""
+        if i <= 0:
+            g, a = self.opening
+            return g, (g * a if g > EPS else 0.0), 0.0, 0.0
+        return self.grams[i - 1], self.cost[i - 1], self.realized[i - 1], self.fees[i - 1]
+
+    def _oversold(self, start: int) -> List[int]:
+        """第 start 笔起所有卖出超过持仓的流水下标。"""
+        kind, g = self._cols[0], self.grams
+        if np is not None:
+            k, x = np.frombuffer(kind, dtype=float)[start:], np.frombuffer(g, dtype=float)[start:]
+            return (start + np.flatnonzero((k == SELL) & (x < -EPS))).tolist()
+        return [i for i in range(start, len(g)) if kind[i] == SELL and g[i] < -EPS]
+
+    def _scan(self, start: int) -> int:
+        """第 start 笔起第一笔超卖的下标，没有为 -1。"""
+        hit = self._oversold(start)
+        return hit[0] if hit else -1
+
+    def _find_bad(self, start: int):
+        if 0 <= self.bad < start:
+            return
+        self.bad = self._scan(start)
+
+    def replay(self, start: int = 0):
+        """从第 start 笔往后重放（之前的行即检查点，不动）。"""
+        n = len(self)
+        state = self._state(start)
+        for out in (self.grams, self.cost, self.realized, self.fees):
+            del out[start:]
+        if start >= n:
+            self._find_bad(start)
+            return
+        cols = tuple(c[start:] for c in self._cols)
+        res = _replay_np(cols, state) if np is not None else _replay_py(cols, state)
+        for out, part in zip((self.grams, self.cost, self.realized, self.fees), res):
+            out.extend(part)
+        if self.bad >= start:
+            self.bad = -1
+        self._find_bad(start)
+
+    # ---------- 变更 ----------
+    def append(self, t: dict):
+        """新成交：只算一步。"""
+        row = _inputs(t)
+        for col, v in zip(self._cols, row):
+            col.append(v)
+        i = len(self) - 1
+        res = _step(*row, *self._state(i))
+        for out, v in zip((self.grams, self.cost, self.realized, self.fees), res):
+            out.append(v)
+        if self.bad < 0 and row[0] == SELL and res[0] < -EPS:
+            self.bad = i
+
+    def extend(self, txns: List[dict]) -> int:
+        """批量追加（导入）：抽取输入列后只从原末尾重放一次。
+        返回 -1 表示成功；导入部分出现超卖时截回原长度，返回超卖那笔在 txns 里的下标。"""
+        n = len(self)
+        for t in txns:
+            for col, v in zip(self._cols, _inputs(t)):
+                col.append(v)
+        self.replay(n)
+        hit = self._scan(n)             # 只看导入部分；原有的超卖（旧数据）不算导入的问题
+        if hit < 0:
+            return -1
+        for a in self._cols + (self.grams, self.cost, self.realized, self.fees):
+            del a[n:]
+        self._find_bad(n)
+        return hit - n
+
+    def _change(self, start: int, apply, undo, moved) -> bool:
+        """改动输入列后从 start 重放；出现改动前没有的超卖行就撤销。moved 把改动前的下标映射到改动后（删掉的为 None）。"""
+        before = {moved(k) for k in self._oversold(start)}
+        apply()
+        self.replay(start)
+        if all(k in before for k in self._oversold(start)):
+            return True
+        undo()
+        self.replay(start)
+        return False
+
+    def _move(self, src: int, dst: int, row):
+        for col, v in zip(self._cols, row):
+            del col[src]
+            col.insert(dst, v)
+
+    def edit(self, i: int, t: dict, j: Optional[int] = None) -> bool:
+        """第 i 笔改成 t；改了时间需要挪位时 j 为它在新顺序里的下标。"""
+        j = i if j is None else j
+        old = tuple(c[i] for c in self._cols)
+
+        def moved(k):
+            if k == i:
+                return j
+            if i < k <= j:
+                return k - 1
+            if j <= k < i:
+                return k + 1
+            return k
+        return self._change(min(i, j), lambda: self._move(i, j, _inputs(t)),
+                            lambda: self._move(j, i, old), moved)
+
+    def delete(self, i: int) -> bool:
+        old = tuple(c[i] for c in self._cols)
+
+        def apply():
+            for col in self._cols:
+                del col[i]
+
+        def undo():
+            for col, v in zip(self._cols, old):
+                col.insert(i, v)
+        return self._change(i, apply, undo, lambda k: None if k == i else (k - 1 if k > i else k))
+
+    # ---------- 查询 ----------
+    def avg_at(self, i: int) -> float:
+        g = self.grams[i]
+        return self.cost[i] / g if g > EPS else 0.0
+
+    def position(self) -> Tuple[float, float]:
+        """最新的 (克数, 均价)。"""
+        g, c, _rz, _fs = self._state(len(self))
+        return g, (c / g if g > EPS else 0.0)
+
+    def realized_pnl(self) -> float:
+        return self._state(len(self))[2]
+
+    def fees_paid(self) -> float:
+        return self._state(len(self))[3]
@@ -0,0 +1,220 @@
+# core/lots.py
+# 批次成本：每笔买入是一个批次（克数、含手续费的每克成本），卖出按 FIFO / LIFO / 指定批次消耗，已实现盈亏逐批结算。
+# 批次队列带下标：先进先出从队首、后进先出从队尾取，指定批次按 id 直取；取空的批次惰性跳过，卖出只碰到被消耗的批次。
+# PnlBook 汇总各仓批次口径的持仓成本与已实现盈亏（随仓摘要保存在 p["lots"]），气泡与仓库列表读它的缓存结果。
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from core.ledger import EPS
+
+METHODS = ("FIFO", "LIFO", "SPEC")
+METHOD_NAMES = {"FIFO": "先进先出", "LIFO": "后进先出", "SPEC": "指定批次"}
+DEFAULT_METHOD = "FIFO"
+
+
+class Lot:
+    __slots__ = ("lid", "ts", "grams", "cost")
+
+    def __init__(self, lid: str, ts: str, grams: float, cost: float):
+        self.lid = lid
+        self.ts = ts
+        self.grams = grams          # 剩余克数
+        self.cost = cost            # 每克成本（含买入手续费）
+
+
+class LotQueue:
+    """按买入顺序排列的批次。_head 之前的都已取空；队尾取空的直接弹出。"""
+    def __init__(self):
+        self._lots: List[Lot] = []
+        self._head = 0
+        self._by_id: Dict[str, Lot] = {}
+        self.grams = 0.0
+        self.basis = 0.0            # 未平批次的总成本
+
+    def push(self, lot: Lot):
+        self._lots.append(lot)
+        self._by_id[lot.lid] = lot
+        self.grams += lot.grams
+        self.basis += lot.grams * lot.cost
+
+    def clear(self):
+        self._lots.clear(); self._by_id.clear()
+        self._head = 0
+        self.grams = self.basis = 0.0
+
+    def _consume(self, lot: Lot, q: float) -> Tuple[float, float]:
+        take = min(q, lot.grams)
+        lot.grams -= take
+        if lot.grams <= EPS:
+            take += lot.grams
+            lot.grams = 0.0
+            self._by_id.pop(lot.lid, None)
+        self.grams -= take
+        self.basis -= take * lot.cost
+        return take, take * lot.cost
+
+    def _front(self) -> Optional[Lot]:
+        lots = self._lots
+        while self._head < len(lots) and lots[self._head].grams <= 0.0:
+            self._head += 1
+        if self._head > 64 and self._head * 2 > len(lots):
+            del lots[:self._head]
+            self._head = 0
+        return lots[self._head] if self._head < len(lots) else None
+
+    def _back(self) -> Optional[Lot]:
+        lots = self._lots
+        while len(lots) > self._head and lots[-1].grams <= 0.0:
+            lots.pop()
+        return lots[-1] if len(lots) > self._head else None
+
+    def take(self, q: float, method: str = DEFAULT_METHOD) -> Tuple[float, float]:
+        """按 FIFO / LIFO 消耗 q 克，返回 (实际消耗克数, 消耗的成本)。"""
+        pick = self._back if method == "LIFO" else self._front
+        got = cost = 0.0
+        while q - got > EPS:
+            lot = pick()
+            if lot is None:
+                break
+            g, c = self._consume(lot, q - got)
+            got += g; cost += c
+        return got, cost
+
+    def take_lot(self, lid: str, q: float) -> Tuple[float, float]:
+        lot = self._by_id.get(lid)
+        if lot is None:
+            return 0.0, 0.0
+        return self._consume(lot, q)
+
+    def get(self, lid: str) -> Optional[Lot]:
+        return self._by_id.get(lid)
+
+    def open_lots(self) -> Iterator[Lot]:
+        for i in range(self._head, len(self._lots)):
+            lot = self._lots[i]
+            if lot.grams > 0.0:
+                yield lot
+
+
+def lot_id(t: dict) -> str:
+    """批次 id 即买入流水的 id（旧流水由 store 载入时补齐并落盘），不随流水下标变化。"""
+    return str(t.get("id", ""))
+
+
+class LotBook:
+    """一个仓按批次口径的持仓与已实现盈亏。由期初持仓 + 流水构建，之后每笔成交 apply 一次。
+    指定批次（SPEC）的卖出流水带 "lots": [[批次 id, 克数], ...]；没带时按先进先出。ADJ 把所有批次合成一个。"""
+    def __init__(self, txns: List[dict], opening: Tuple[float, float] = (0.0, 0.0), method: str = DEFAULT_METHOD):
+        self.method = method if method in METHODS else DEFAULT_METHOD
+        self.opening = opening
+        self.queue = LotQueue()
+        self.realized = 0.0
+        self.rebuild(txns)
+
+    def rebuild(self, txns: List[dict]):
+        self.queue.clear()
+        self.realized = 0.0
+        g, avg = self.opening
+        if g > EPS:
+            self.queue.push(Lot("open", "期初", float(g), float(avg)))
+        for t in txns:
+            self.apply(t)
+
+    def apply(self, t: dict):
+        side = t.get("side")
+        q = float(t.get("grams") or 0.0)
+        px = float(t.get("price") or 0.0)
+        fee = float(t.get("fee_amt") or 0.0)
+        if side == "BUY" and q > EPS:
+            self.queue.push(Lot(lot_id(t), t.get("ts", ""), q, (px * q + fee) / q))
+        elif side == "SELL":
+            got = cost = 0.0
+            if self.method == "SPEC":
+                for lid, lq in t.get("lots") or ():
+                    g, c = self.queue.take_lot(str(lid), float(lq))
+                    got += g; cost += c
+            if q - got > EPS:
+                g, c = self.queue.take(q - got, "LIFO" if self.method == "LIFO" else "FIFO")
+                got += g; cost += c
+            self.realized += px * got - cost - fee
+        elif side == "ADJ":
+            g, avg = float(t.get("post_grams") or 0.0), float(t.get("post_avg") or 0.0)
+            self.queue.clear()
+            if g > EPS:
+                self.queue.push(Lot(lot_id(t), t.get("ts", ""), g, avg))
+
+    @property
+    def grams(self) -> float:
+        return self.queue.grams
+
+    @property
+    def basis(self) -> float:
+        return self.queue.basis
+
+    def unrealized(self, price: Optional[float]) -> Optional[float]:
+        return None if price is None else price * self.queue.grams - self.queue.basis
+
+    def summary(self) -> dict:
+        return {"method": self.method, "basis": self.queue.basis, "realized": self.realized}
+
+
+class PnlReport(NamedTuple):
+    per_pid: Dict[str, Tuple[float, Optional[float]]]      # pid → (已实现, 浮动盈亏；无价为 None)
+    realized: float
+    unrealized: Optional[float]                             # 任一有持仓的仓无价时为 None
+
+
+class PnlBook:
+    """所有仓批次口径的盈亏汇总。各仓摘要 p["lots"] = {"method", "basis", "realized"}；
+    旧仓的摘要由 store.load 读一次分片补齐；只有刚新建、还没有流水的仓没有摘要，按 克数 × 均价 作成本、已实现记 0。
+    已实现总额随 update 按差量维护；report(prices) 对同一份价格表和同一版本直接复用上次结果。"""
+    def __init__(self, portfolios: Optional[List[dict]] = None):
+        self._ps: List[dict] = []
+        self.realized = 0.0
+        self._version = 0
+        self._key = None
+        self._report: Optional[PnlReport] = None
+        self.sync(portfolios or [])
+
+    @staticmethod
+    def _summary(p: dict) -> dict:
+        s = p.get("lots")
+        if not isinstance(s, dict):
+            s = {"method": DEFAULT_METHOD, "basis": float(p.get("grams") or 0.0) * float(p.get("cost_per_g") or 0.0),
+                 "realized": 0.0}
+        return s
+
+    def sync(self, portfolios: List[dict]):
+        self._ps = portfolios
+        self.realized = sum(float(self._summary(p).get("realized") or 0.0) for p in portfolios)
+        self._version += 1
+
+    def method_of(self, p: dict) -> str:
+        return self._summary(p).get("method") or DEFAULT_METHOD
+
+    def update(self, p: dict, lots: LotBook):
+        """一个仓的批次变化后调用：写回摘要，已实现总额按差量调整。"""
+        old = float(self._summary(p).get("realized") or 0.0)
+        p["lots"] = lots.summary()
+        self.realized += lots.realized - old
+        self._version += 1
+
+    def report(self, prices: Dict[str, Optional[float]]) -> PnlReport:
+        """prices：计价品种 code → 元/克（PortfolioBook.valuate 的结果）。"""
+        if self._report is not None and self._key[0] is prices and self._key[1] == self._version:
+            return self._report
+        per: Dict[str, Tuple[float, Optional[float]]] = {}
+        total, missing = 0.0, False
+        for p in self._ps:
+            s = self._summary(p)
+            g = float(p.get("grams") or 0.0)
+            px = prices.get(p.get("instrument"))
+            if g <= EPS:
+                un = 0.0
+            else:
+                un = None if px is None else px * g - float(s.get("basis") or 0.0)
+            if un is None and g > EPS:
+                missing = True
+            total += un or 0.0
+            per[p.get("pid")] = (float(s.get("realized") or 0.0), un)
+        self._key, self._report = (prices, self._version), PnlReport(per, self.realized, None if missing else total)
+        return self._report
@@ -0,0 +1,189 @@
+# core/portfolio.py
+# 仓估值：按计价品种汇总所有仓的持仓克数与成本，行情每跳只做 O(品种数) 的总盈亏计算；
+# 买卖 / 校正按差量更新汇总 O(1)，不再逐仓循环。仓 dict（app.portfolios）仍是落盘的唯一来源，这里只做镜像。
+import uuid
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from core.instruments import by_code
+from core.units import UnitConverter
+
+DEFAULT_CODE = "JD_AUTD"        # 未绑定品种的仓按黄金T+D计价
+PRICE_UNIT = "CNY/g"            # 仓的克数、均价口径；绑定品种的报价统一换算到 元/克
+BINDABLE = ("JD_AUTD", "SGE_AUTD", "CZB_JCJ", "JD_AGTD", "SGE_AGTD", "LDN_AU", "NY_AU", "LDN_AG", "NY_AG")
+
+
+def new_pid() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+class _Agg:
+    __slots__ = ("grams", "cost", "count")
+
+    def __init__(self):
+        self.grams = 0.0
+        self.cost = 0.0         # 持仓总成本 = Σ 克数 × 均价
+        self.count = 0
+
+
+class Valuation(NamedTuple):
+    prices: Dict[str, Optional[float]]      # 计价品种 code → 元/克
+    total_pnl: Optional[float]
+    value: float
+    cost: float
+
+
+class PortfolioBook:
+    """所有仓的估值汇总。pid → 仓 dict；计价品种 code → 汇总。
+    valuate(snap) 对一份共享快照一次算出所有计价品种的 元/克 价格与总盈亏，同一快照重复调用直接复用。"""
+    def __init__(self, portfolios: Optional[List[dict]] = None):
+        self._by_pid: Dict[str, dict] = {}
+        self._code: Dict[str, str] = {}         # pid → 计价品种 code
+        self._aggs: Dict[str, _Agg] = {}
+        self._version = 0                       # 任何持仓变化 +1，作废估值缓存
+        self._conv: Optional[UnitConverter] = None
+        self._conv_codes: Tuple[str, ...] = ()
+        self._val_key = None
+        self._val: Optional[Valuation] = None
+        self.rebuild(portfolios or [])
+
+    # ---------- 结构变化（新建 / 删除 / 载入），O(仓数) ----------
+    def rebuild(self, portfolios: Iterable[dict]):
+        self._by_pid.clear(); self._code.clear(); self._aggs.clear()
+        for p in portfolios:
+            self.add(p)
+
+    def sync(self, portfolios: List[dict]):
+        """与仓列表对齐：只处理新增 / 删除的仓，已登记的仓不重算。"""
+        seen = set()
+        for p in portfolios:
+            pid = p.get("pid")
+            if pid is None or self._by_pid.get(pid) is not p:
+                if pid in self._by_pid:
+                    self.remove(pid)
+                self.add(p)
+            seen.add(p["pid"])
+        for pid in [x for x in self._by_pid if x not in seen]:
+            self.remove(pid)
+
+    def add(self, p: dict):
+        pid = p.get("pid") or new_pid()
+        p["pid"] = pid
+        code = p.get("instrument") or DEFAULT_CODE
+        p["instrument"] = code
+        self._by_pid[pid] = p
+        self._code[pid] = code
+        a = self._aggs.get(code)
+        if a is None:
+            a = self._aggs[code] = _Agg()
+        a.grams += float(p.get("grams") or 0.0)
+        a.cost += float(p.get("grams") or 0.0) * float(p.get("cost_per_g") or 0.0)
+        a.count += 1
+        self._version += 1
+
+    def remove(self, pid: str):
+        p = self._by_pid.pop(pid, None)
+        if p is None:
+            return
+        a = self._aggs[self._code.pop(pid)]
+        a.grams -= float(p.get("grams") or 0.0)
+        a.cost -= float(p.get("grams") or 0.0) * float(p.get("cost_per_g") or 0.0)
+        a.count -= 1
+        self._version += 1
+
+    # ---------- 持仓变化，O(1) ----------
+    def get(self, pid: str) -> Optional[dict]:
+        return self._by_pid.get(pid)
+
+    def instrument_of(self, pid: str) -> str:
+        return self._code.get(pid, DEFAULT_CODE)
+
+    def set_position(self, pid: str, grams: float, cost_per_g: float):
+        """把仓的持仓改成 (grams, cost_per_g)，按差量更新汇总。"""
+        p = self._by_pid[pid]
+        a = self._aggs[self._code[pid]]
+        g0, c0 = float(p["grams"]), float(p["cost_per_g"])
+        a.grams += grams - g0
+        a.cost += grams * cost_per_g - g0 * c0
+        p["grams"] = grams
+        p["cost_per_g"] = cost_per_g
+        self._version += 1
+
+    def rebind(self, pid: str, code: str):
+        """改绑计价品种：把仓从旧品种的汇总挪到新品种，O(1)。"""
+        p = self._by_pid[pid]
+        if self._code[pid] == code:
+            return
+        self.remove(pid)
+        p["instrument"] = code
+        self.add(p)
+
+    def buy(self, pid: str, qty: float, price: float, fee_amt: float = 0.0) -> Tuple[float, float]:
+        """买入：手续费计入成本。返回成交后的 (克数, 均价)。"""
+        p = self._by_pid[pid]
+        g0, c0 = float(p["grams"]), float(p["cost_per_g"])
+        g1 = g0 + qty
+        c1 = (g0 * c0 + price * qty + fee_amt) / g1 if g1 > 0 else 0.0
+        self.set_position(pid, g1, c1)
+        return g1, c1
+
+    def sell(self, pid: str, qty: float) -> Tuple[float, float]:
+        """卖出：均价不变，清仓时归零。返回成交后的 (克数, 均价)。"""
+        p = self._by_pid[pid]
+        g0, c0 = float(p["grams"]), float(p["cost_per_g"])
+        if qty > g0:
+            raise ValueError("卖出克数不可大于持仓")
+        g1 = g0 - qty
+        c1 = c0 if g1 > 0 else 0.0
+        self.set_position(pid, g1, c1)
+        return g1, c1
+
+    # ---------- 估值 ----------
+    def codes(self) -> List[str]:
+        """有持仓的计价品种。"""
+        return [c for c, a in self._aggs.items() if a.count]
+
+    def pnl(self, pid: str, price: Optional[float]) -> Optional[float]:
+        p = self._by_pid.get(pid)
+        if p is None or price is None:
+            return None
+        return (price - float(p["cost_per_g"])) * float(p["grams"])
+
+    def _converter(self) -> UnitConverter:
+        codes = tuple(sorted(self.codes()))
+        if self._conv is None or codes != self._conv_codes:
+            self._conv = UnitConverter({c: PRICE_UNIT for c in codes})
+            self._conv_codes = codes
+        return self._conv
+
+    def valuate(self, snap) -> Valuation:
+        """所有仓对同一份快照的估值：整份快照一次换算到 元/克，再按品种汇总。"""
+        key = (snap.prices, self._version)
+        if self._val is not None and self._val_key[0] is key[0] and self._val_key[1] == key[1]:
+            return self._val
+        conv = self._converter()
+        prices: Dict[str, Optional[float]] = {}
+        for code in self._conv_codes:
+            prices[code] = conv.value(snap, code)
+        pnl, value, cost = self.totals(prices.get)
+        self._val_key, self._val = key, Valuation(prices, pnl, value, cost)
+        return self._val
+
+    def price_of(self, pid: str, snap) -> Optional[float]:
+        """仓的计价品种在该快照下的 元/克 价格。"""
+        return self.valuate(snap).prices.get(self.instrument_of(pid))
+
+    def totals(self, quote) -> Tuple[Optional[float], float, float]:
+        """所有仓的 (总盈亏, 总市值, 总成本)。quote(code) 取计价品种现价；
+        任一有持仓的品种没有价格时总盈亏为 None。"""
+        pnl, value, cost, missing = 0.0, 0.0, 0.0, False
+        for code, a in self._aggs.items():
+            if not a.count or not a.grams:
+                continue
+            cost += a.cost
+            px = quote(code) if by_code(code) else None
+            if px is None:
+                missing = True
+                continue
+            value += px * a.grams
+            pnl += px * a.grams - a.cost
+        return (None if missing else pnl), value, cost
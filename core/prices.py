@@ -1,20 +1,203 @@
 # 抓包逻辑，需要自己写
-import time, json, random, traceback
-from typing import List, Optional
+import os, time, json, math, random, traceback, threading, queue
+from array import array
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
 import requests
 from requests.adapters import HTTPAdapter, Retry
 import certifi
 
+from core.instruments import resolve, by_code, catalog
+from core.sessions import PollScheduler
+from core.ticks import TickStore
+from core.archive import TickArchive
+from core.bars import BarEngine
+from core.indicators import IndicatorEngine
+from core.derived import DerivedEngine
+from core.resource import data_dir_in_appdata, APP_DIR_NAME
+
 SERVER_URL  = "your url"                # 你的服务端地址
+SERVER_URLS: List[str] = []             # 多个上游副本（可选），为空时只用 SERVER_URL
+HEDGE_DELAY_S = 0.3                     # 主上游超过该时长未返回时，向次优上游补发一次
+EWMA_ALPHA    = 0.2                     # 上游延迟 EWMA 平滑系数
 API_KEY     = "changeme"                # 你的 API key
 TIMEOUT_S   = 5.0
+DEADLINE_S  = 3.0                       # 单次取数的总时限：连接、读取、重试合计
+RETRIES     = 2
+BACKOFF_S   = 0.2
+RETRY_STATUS = (429, 500, 502, 503, 504)
+BREAKER_FAILS   = 3                     # 连续失败多少次后熔断
+BREAKER_RESET_S = 10.0                  # 熔断后多久放一个探测请求（失败则翻倍）
+BREAKER_MAX_S   = 120.0
 MAX_STALE   = 8
+SNAPSHOT_FILE    = "last_quotes.json"   # 最近一次成功的快照，冷启动时先显示它
+PERSIST_EVERY_S  = 30.0                 # 快照落盘最小间隔
+BAR_BACKFILL_DAYS = 30                  # 启动时用归档回补 K 线的天数
 DEBUG_MODE  = False
+POLL_INTERVAL_S = 1.0                   # 开市时的轮询间隔
+IDLE_INTERVAL_S = 300.0                 # 关注品种全部休市时的轮询间隔（开盘时刻会提前唤醒）
+CONDITIONAL = True                      # ETag / If-None-Match，未变化时服务端回 304
+DELTA_MODE  = False                     # 带 since=seq 只取变化的品种（服务端需支持）
+STREAM_MODE = False                     # SSE 推送（/api/v1/stream），断开时自动回落到轮询
+STREAM_IDLE_S     = 30.0                # 超过该时长既无数据也无心跳视为断线
+STREAM_RETRY_S    = 2.0                 # 推送断开后，轮询多久再尝试重连
+STREAM_FALLBACK_S = 60.0                # 推送连不上时，轮询多久再尝试
+STOP_JOIN_S       = 3.0                 # 退出时最多等取数线程收尾（快照、归档落盘）这么久
 
 _session: Optional[requests.Session] = None
 _last_lines: List[str] = []
 _last_ok_ts: float = 0.0
+_feed: Optional["QuoteFeed"] = None
+
+NAN = float("nan")
+
+
+def _parse_line(s: str) -> Tuple[Optional[str], float]:
+    n, sep, p = s.partition(",")
+    if not sep:
+        return None, NAN
+    try:
+        v = float(p) if p.strip() else NAN
+    except ValueError:
+        v = NAN
+    return n.strip(), v
+
+
+class QuoteSnapshot:
+    """一次取数解析后的只读快照：名称元组 + 名称→下标字典 + 品种 ID→下标字典 + 价格数组（无价为 NaN）。
+    每次取数只解析一遍，调用方按名称或品种 code O(1) 取价，不再各自 split 字符串。"""
+    __slots__ = ("names", "index", "ids", "prices", "raw", "ts", "stale")
+
+    def __init__(self, names: Tuple[str, ...], prices: array, raw: Tuple[str, ...] = (),
+                 ts: float = 0.0, stale: bool = False):
+        self.names  = names
+        self.index: Dict[str, int] = {n: i for i, n in enumerate(names)}
+        self.ids: Dict[int, int] = {}
+        for i, n in enumerate(names):
+            self.ids.setdefault(resolve(n).iid, i)     # 同一品种多条时取第一条
+        self.prices = prices
+        self.raw    = raw
+        self.ts     = ts
+        self.stale  = stale
+
+    @classmethod
+    def parse(cls, lines: List[str], ts: Optional[float] = None) -> "QuoteSnapshot":
+        names, prices, raw = [], array("d"), []
+        for s in lines:
+            n, v = _parse_line(s)
+            if n is None:
+                continue
+            names.append(n); prices.append(v); raw.append(s)
+        return cls(tuple(names), prices, tuple(raw), time.time() if ts is None else ts)
+
+    def merged(self, lines: List[str], ts: Optional[float] = None) -> "QuoteSnapshot":
+        """在本快照上叠加增量行，返回新快照；没有新品种时复用名称索引。"""
+        prices, raw, extra = array("d", self.prices), list(self.raw), []
+        for s in lines:
+            n, v = _parse_line(s)
+            if n is None:
+                continue
+            i = self.index.get(n)
+            if i is None:
+                extra.append((n, v, s))
+            else:
+                prices[i] = v; raw[i] = s
+        ts = time.time() if ts is None else ts
+        if extra:
+            for n, v, s in extra:
+                prices.append(v); raw.append(s)
+            return QuoteSnapshot(self.names + tuple(n for n, _, _ in extra), prices, tuple(raw), ts)
+        return self._share(prices, tuple(raw), ts, False)
+
+    def touched(self, ts: Optional[float] = None) -> "QuoteSnapshot":
+        """数据未变（304），只刷新时间戳。"""
+        return self._share(self.prices, self.raw, time.time() if ts is None else ts, False)
+
+    def _share(self, prices: array, raw: Tuple[str, ...], ts: float, stale: bool) -> "QuoteSnapshot":
+        snap = QuoteSnapshot.__new__(QuoteSnapshot)
+        snap.names, snap.index, snap.ids = self.names, self.index, self.ids
+        snap.prices, snap.raw, snap.ts, snap.stale = prices, raw, ts, stale
+        return snap
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __bool__(self) -> bool:
+        return bool(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.index
+
+    def price(self, name: str) -> Optional[float]:
+        i = self.index.get(name)
+        if i is None:
+            return None
+        v = self.prices[i]
+        return None if math.isnan(v) else v
+
+    def _code_index(self, code: str) -> Optional[int]:
+        inst = by_code(code)
+        return None if inst is None else self.ids.get(inst.iid)
+
+    def quote(self, code: str) -> Optional[float]:
+        """按品种 code 取价。"""
+        i = self._code_index(code)
+        if i is None:
+            return None
+        v = self.prices[i]
+        return None if math.isnan(v) else v
+
+    def name_of(self, code: str) -> Optional[str]:
+        """品种 code 在本快照里的上游展示名。"""
+        i = self._code_index(code)
+        return None if i is None else self.names[i]
+
+    def items(self) -> Iterator[Tuple[str, Optional[float]]]:
+        for n, v in zip(self.names, self.prices):
+            yield n, (None if math.isnan(v) else v)
+
+    def lines(self) -> List[str]:
+        return list(self.raw)
+
+    def age(self, now: Optional[float] = None) -> float:
+        return (time.time() if now is None else now) - self.ts
+
+    def as_stale(self) -> "QuoteSnapshot":
+        if self.stale:
+            return self
+        return self._share(self.prices, self.raw, self.ts, True)
+
+
+EMPTY_SNAPSHOT = QuoteSnapshot((), array("d"))
+
+def _snapshot_path() -> str:
+    return os.path.join(data_dir_in_appdata(APP_DIR_NAME), SNAPSHOT_FILE)
+
+def save_last_good(snap: QuoteSnapshot, path: Optional[str] = None):
+    """原子写入（临时文件 + rename），中途崩溃不会留下半个文件。"""
+    if not snap or snap.stale:
+        return
+    path = path or _snapshot_path()
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"ts": snap.ts, "lines": list(snap.raw)}, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def load_last_good(path: Optional[str] = None) -> QuoteSnapshot:
+    """读取上次落盘的快照，一律标记为 stale；没有或损坏时返回空快照。"""
+    try:
+        with open(path or _snapshot_path(), "r", encoding="utf-8") as f:
+            js = json.load(f)
+        lines = [str(x) for x in (js.get("lines") or []) if isinstance(x, str)]
+        if not lines:
+            return EMPTY_SNAPSHOT
+        return QuoteSnapshot.parse(lines, float(js.get("ts") or 0.0)).as_stale()
+    except Exception:
+        return EMPTY_SNAPSHOT
 
 def _build_session() -> requests.Session:
     s = requests.Session()
@@ -22,13 +205,8 @@ def _build_session() -> requests.Session:
     s.verify = certifi.where()
     s.headers.update({"User-Agent": "GoldPriceBubble/Client"})
 
-    retries = Retry(
-        total=2, connect=2, read=2,
-        backoff_factor=0.2,
-        status_forcelist=(429, 500, 502, 503, 504),
-        allowed_methods=frozenset(["GET"]),
-        raise_on_status=False,
-    )
+    # 重试由 _fetch_lines 在总时限内自己做，这里不再叠加
+    retries = Retry(total=0, raise_on_status=False)
     adapter = HTTPAdapter(pool_connections=8, pool_maxsize=8, max_retries=retries)
     s.mount("https://", adapter)
     s.mount("http://", adapter)
@@ -40,37 +218,555 @@ def _get_session() -> requests.Session:
         _session = _build_session()
     return _session
 
-def _lines_url() -> str:
-    base = SERVER_URL.rstrip("/")
-    return f"{base}/api/v1/lines?key={API_KEY}&t={int(time.time()*1000)}{random.randint(10,99)}"
+class FetchState:
+    """条件请求 / 增量请求的客户端状态，每个取数线程各持一份。"""
+    __slots__ = ("etag", "seq")
 
-def probe_all_lines() -> List[str]:
-    global _last_lines, _last_ok_ts
+    def __init__(self):
+        self.etag: Optional[str] = None
+        self.seq: Optional[int] = None
 
-    url = _lines_url()
-    s = _get_session()
-    try:
-        r = s.get(url, timeout=TIMEOUT_S)
-        if DEBUG_MODE:
-            print(f"[price client] GET {url} -> {r.status_code} {r.headers.get('content-type')}")
+    def reset(self):
+        self.etag = None; self.seq = None
+
+    def copy(self) -> "FetchState":
+        c = FetchState(); c.etag = self.etag; c.seq = self.seq
+        return c
+
+    def update(self, other: "FetchState"):
+        self.etag = other.etag; self.seq = other.seq
+
+
+def _lines_url(st: Optional[FetchState] = None, base: Optional[str] = None) -> str:
+    base = (base or SERVER_URL).rstrip("/")
+    url = f"{base}/api/v1/lines?key={API_KEY}"
+    if st is None or not CONDITIONAL:
+        # 无条件请求才需要防缓存参数；带 ETag 时随机参数会让 304 永远不命中
+        return f"{url}&t={int(time.time()*1000)}{random.randint(10,99)}"
+    if DELTA_MODE and st.seq is not None:
+        url += f"&since={st.seq}"
+    return url
+
+def _stream_url(st: FetchState, base: Optional[str] = None) -> str:
+    base = (base or SERVER_URL).rstrip("/")
+    url = f"{base}/api/v1/stream?key={API_KEY}"
+    if st.seq is not None:
+        url += f"&since={st.seq}"
+    return url
+
+def _stream_events(s: requests.Session, st: FetchState, base: Optional[str] = None,
+                   on_open: Optional[Callable] = None) -> Iterator[Tuple[List[str], bool]]:
+    """SSE 推送：逐个产出 (行, 是否增量)；心跳产出 ([], True)。
+    断线重连时带 Last-Event-ID / since 从上次的 seq 续传。连接或读取失败时抛异常。
+    on_open(r) 在连上后拿到响应对象，别的线程可以 r.close() 打断阻塞中的读取。"""
+    headers = {"Accept": "text/event-stream"}
+    if st.seq is not None:
+        headers["Last-Event-ID"] = str(st.seq)
+    with s.get(_stream_url(st, base), headers=headers, stream=True,
+               timeout=(TIMEOUT_S, STREAM_IDLE_S)) as r:
         r.raise_for_status()
-        js = r.json()
-        lines = js.get("lines") or []
-        lines = [str(x) for x in lines if isinstance(x, str)]
-        if lines:
-            _last_lines = lines
-            _last_ok_ts = time.time()
-            return lines
-    except Exception as e:
-        if DEBUG_MODE:
-            print("[price client] fetch error:", repr(e))
+        if on_open is not None:
+            on_open(r)
+        ev_id, data = None, []
+        for line in r.iter_lines(decode_unicode=True):
+            if line is None:
+                continue
+            if line == "":
+                if data:
+                    js = json.loads("\n".join(data))
+                    lines = [str(x) for x in (js.get("lines") or []) if isinstance(x, str)]
+                    seq = js.get("seq", ev_id)
+                    try: st.seq = int(seq)
+                    except (TypeError, ValueError): pass
+                    yield lines, bool(js.get("delta"))
+                ev_id, data = None, []
+            elif line.startswith(":"):
+                yield [], True                  # 心跳
+            elif line.startswith("id:"):
+                ev_id = line[3:].strip()
+            elif line.startswith("data:"):
+                data.append(line[5:].lstrip())
+
+def _fetch_lines(s: requests.Session, st: Optional[FetchState] = None, base: Optional[str] = None,
+                 deadline: Optional[float] = None) -> Tuple[int, List[str], bool]:
+    """返回 (HTTP 状态码, 行, 是否增量)。失败时状态码为最后一次的 HTTP 状态或 0（响应解析失败也为 0）；
+    304 时行为空，200 时行也可能为空（增量里没有变化）。
+    deadline 为 time.monotonic() 口径的截止时刻，连接、读取与重试都不会越过它。"""
+    url = _lines_url(st, base)
+    headers = {"If-None-Match": st.etag} if (st is not None and CONDITIONAL and st.etag) else None
+    deadline = time.monotonic() + DEADLINE_S if deadline is None else deadline
+    code = 0
+    for attempt in range(RETRIES + 1):
+        left = deadline - time.monotonic()
+        if left <= 0:
+            break
+        retry = True
+        try:
+            r = s.get(url, timeout=min(TIMEOUT_S, left), headers=headers)
+            code = r.status_code
+            if DEBUG_MODE:
+                print(f"[price client] GET {url} -> {r.status_code} {r.headers.get('content-type')}")
+            if code == 304:
+                return 304, [], False
+            if code not in RETRY_STATUS:
+                retry = False
+                r.raise_for_status()
+                js = r.json()
+                lines = js.get("lines") or []
+                lines = [str(x) for x in lines if isinstance(x, str)]
+                delta = bool(js.get("delta"))
+                if st is not None:
+                    st.etag = r.headers.get("ETag")
+                    seq = js.get("seq")
+                    st.seq = int(seq) if isinstance(seq, int) else None
+                return code, lines, delta
+        except requests.RequestException as e:
+            if DEBUG_MODE:
+                print("[price client] fetch error:", repr(e))
+            retry = not isinstance(e, requests.HTTPError)
+        except Exception as e:
+            retry = False
+            code = 0                    # 200 但解析失败：不算成功
+            if DEBUG_MODE:
+                print("[price client] fetch error:", repr(e))
+                try:
+                    txt = r.text if 'r' in locals() else ""
+                    snippet = txt[:200].replace("\n", " ")
+                    print("[price client] resp snippet:", snippet + (" ..." if len(txt) > 200 else ""))
+                except Exception:
+                    pass
+                traceback.print_exc()
+        if not retry or attempt >= RETRIES:
+            break
+        pause = BACKOFF_S * (2 ** attempt)
+        if time.monotonic() + pause >= deadline:
+            break
+        time.sleep(pause)
+    return code, [], False
+
+
+class CircuitBreaker:
+    """熔断器：连续失败 fail_threshold 次后打开，期间直接快速失败；
+    每隔 reset_s（失败则翻倍，至多 max_reset_s）放行一个半开探测，成功即闭合。"""
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, fail_threshold: int = BREAKER_FAILS, reset_s: float = BREAKER_RESET_S,
+                 max_reset_s: float = BREAKER_MAX_S):
+        self.fail_threshold = fail_threshold
+        self.reset_s = reset_s
+        self.max_reset_s = max_reset_s
+        self.state = self.CLOSED
+        self.failures = 0
+        self.last_error = ""
+        self._cooldown = reset_s
+        self._probe_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and now >= self._probe_at:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def retry_in(self, now: Optional[float] = None) -> float:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            return max(0.0, self._probe_at - now) if self.state == self.OPEN else 0.0
+
+    def record(self, ok: bool, error: str = "", now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if ok:
+                self.state = self.CLOSED
+                self.failures = 0
+                self.last_error = ""
+                self._cooldown = self.reset_s
+                return
+            self.failures += 1
+            self.last_error = error
+            if self.state == self.HALF_OPEN:
+                self._cooldown = min(self.max_reset_s, self._cooldown * 2)
+            if self.state == self.HALF_OPEN or self.failures >= self.fail_threshold:
+                self.state = self.OPEN
+                self._probe_at = now + self._cooldown
+
+
+class Endpoint:
+    """一个上游副本及其延迟 EWMA（失败按超时计，便于自动降级）。"""
+    __slots__ = ("url", "ewma", "calls", "fails")
+
+    def __init__(self, url: str):
+        self.url = url
+        self.ewma = 0.0
+        self.calls = 0
+        self.fails = 0
+
+    def observe(self, dt: float, ok: bool):
+        x = dt if ok else max(dt, TIMEOUT_S)
+        self.ewma = x if self.calls == 0 else self.ewma + EWMA_ALPHA * (x - self.ewma)
+        self.calls += 1
+        if not ok:
+            self.fails += 1
+
+
+class HedgedFetcher:
+    """多上游对冲请求：先发给 EWMA 最低的上游，超过 hedge_delay 未返回（或已失败）时
+    再发给次优上游，取先成功的一个。只有慢请求才补发，稳态负载基本不变。"""
+    def __init__(self, urls: Optional[List[str]] = None, hedge_delay: float = HEDGE_DELAY_S):
+        urls = [u for u in (urls if urls is not None else (SERVER_URLS or [SERVER_URL])) if u]
+        self.endpoints = [Endpoint(u) for u in urls]
+        self.hedge_delay = hedge_delay
+        self.hedges = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=2 * max(1, len(self.endpoints)),
+                                        thread_name_prefix="hedge") if len(self.endpoints) > 1 else None
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+
+    def ranked(self) -> List[Endpoint]:
+        with self._lock:
+            # 未测过的上游排在前面，保证每个上游都有样本
+            return sorted(self.endpoints, key=lambda e: (e.calls > 0, e.ewma))
+
+    def primary(self) -> str:
+        return self.ranked()[0].url
+
+    def _call(self, s: requests.Session, st: Optional[FetchState], ep: Endpoint, deadline: float):
+        mine = st.copy() if st is not None else None
+        t0 = time.perf_counter()
+        code, lines, delta = _fetch_lines(s, mine, ep.url, deadline)
+        ok = code in (200, 304)
+        with self._lock:
+            ep.observe(time.perf_counter() - t0, ok)
+        return ok, (code, lines, delta), mine
+
+    def fetch(self, s: requests.Session, st: Optional[FetchState] = None,
+              deadline: Optional[float] = None) -> Tuple[int, List[str], bool]:
+        eps = self.ranked()
+        deadline = time.monotonic() + DEADLINE_S if deadline is None else deadline
+        if self._pool is None:
+            ep = eps[0]
+            t0 = time.perf_counter()
+            out = _fetch_lines(s, st, ep.url, deadline)
+            with self._lock:
+                ep.observe(time.perf_counter() - t0, out[0] in (200, 304))
+            return out
+
+        pending = {self._pool.submit(self._call, s, st, eps[0], deadline)}
+        backups = list(eps[1:])
+        step = self.hedge_delay
+        last = (0, [], False)
+        while pending:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                break                   # 总时限已到，未完成的请求结果直接丢弃
+            done, pending = wait(pending, timeout=left if step is None else min(step, left),
+                                 return_when=FIRST_COMPLETED)
+            for f in done:
+                ok, out, mine = f.result()
+                if ok:
+                    if st is not None and mine is not None:
+                        st.update(mine)
+                    return out
+                last = out
+            if backups and (not done or not pending):
+                # 主请求超时未回或已失败：补发到下一个上游
+                pending.add(self._pool.submit(self._call, s, st, backups.pop(0), deadline))
+                with self._lock:
+                    self.hedges += 1
+            step = None if not backups else self.hedge_delay
+        return last
+
+
+class QuoteFeed:
+    """后台取数：独占一个 Session 的轮询线程，发布不可变的 QuoteSnapshot。
+    UI 线程不做网络请求，只在 after() 里调用 drain() 取最新快照，或直接读 latest()。"""
+    def __init__(self, interval: float = POLL_INTERVAL_S, idle_interval: float = IDLE_INTERVAL_S,
+                 seed: Optional[QuoteSnapshot] = None, persist: bool = True):
+        self.interval = interval
+        self.persist = persist
+        self._persisted_at = 0.0
+        self.scheduler = PollScheduler(interval, idle_interval)
+        self.fetcher: Optional[HedgedFetcher] = None   # 线程启动时按当前配置创建
+        self.breaker = CircuitBreaker()
+        self.derived = DerivedEngine()      # 衍生品种（价差、比值、溢价），叠加进每个快照
+        self.ticks = TickStore()            # 逐品种 tick 历史，取数线程写入
+        self.bars = BarEngine()             # 增量 K 线
+        self.ticks.add_listener(self.bars.on_tick)
+        self.indicators = IndicatorEngine(self.bars)    # 流式指标（较开盘涨跌、波动率等）
+        self.ticks.add_listener(self.indicators.on_tick)
+        self.archive: Optional[TickArchive] = None
+        if persist:
+            self.archive = TickArchive()    # 落盘归档，挂在 tick 监听上
+            self.ticks.add_listener(self.archive.add)
+        self.last_ok_ts = 0.0
+        self.mode = "poll"                  # 当前取数方式：poll / stream
+        self._watch: Tuple[str, ...] = ()   # 关注的品种 code，决定轮询节奏
+        self._next_delay = interval
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._latest: QuoteSnapshot = seed.as_stale() if seed else EMPTY_SNAPSHOT
+        self._q: "queue.Queue[QuoteSnapshot]" = queue.Queue(maxsize=4)
+        if self._latest:
+            self._q.put_nowait(self._latest)    # 冷启动：先把上次的快照（stale）交给 UI
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._resp = None                   # 推送模式下正在读的响应，stop() 时关掉它
+
+    def start(self) -> "QuoteFeed":
+        if self._thread and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="QuoteFeed", daemon=True)
+        self._thread.start()
+        if self.archive is not None:
+            threading.Thread(target=self._maintain, name="TickMaintain", daemon=True).start()
+        return self
+
+    def _maintain(self):
+        """后台维护：压缩旧归档，再用归档回补各品种的 K 线历史。"""
+        try:
+            self.archive.compact()
+            now = time.time()
+            for inst in catalog():
+                if self._stop.is_set():
+                    return
+                ts, px = self.archive.query(inst.code, now - BAR_BACKFILL_DAYS * 86400, now)
+                self.bars.backfill(inst.code, ts, px)
+        except Exception as e:
+            if DEBUG_MODE:
+                print("[price client] archive maintenance error:", repr(e))
+
+    def stop(self, timeout: Optional[float] = STOP_JOIN_S):
+        """通知取数线程退出并等它收尾（finally 里的快照落盘、归档 flush），最多等 timeout 秒。
+        推送模式下线程可能正阻塞在读取上，关掉当前响应让它立刻返回。"""
+        self._stop.set()
+        self._wake.set()
+        r = self._resp
+        if r is not None:
+            try: r.close()
+            except Exception: pass
+        t = self._thread
+        if timeout and t is not None and t is not threading.current_thread():
+            t.join(timeout)
+
+    def watch(self, codes):
+        """设置关注品种（展示项、仓绑定等）；变化后立即按新节奏重新排期。衍生品种按其输入品种排期。"""
+        expanded = []
+        for c in codes or ():
+            if c:
+                expanded.append(c)
+                expanded.extend(sorted(self.derived.inputs(c)))
+        codes = tuple(dict.fromkeys(expanded))
+        if codes != self._watch:
+            self._watch = codes
+            self._wake.set()
+
+    def latest(self) -> QuoteSnapshot:
+        """最新快照；熔断中，或超过 MAX_STALE（休市时再加上当前轮询间隔）未更新时带 stale 标记返回。"""
+        with self._lock:
+            snap = self._latest
+        if snap and not snap.stale and (self.breaker.state == CircuitBreaker.OPEN
+                                        or snap.age() > MAX_STALE + self._next_delay):
+            return snap.as_stale()
+        return snap
+
+    def health(self) -> dict:
+        """上游健康状况，供 UI 显示“行情停滞于 …”。stale_since 为最后一次成功取数的时间（正常时为 None）。"""
+        snap = self.latest()
+        b = self.breaker
+        stale = snap.stale or b.state != CircuitBreaker.CLOSED
+        return {
+            "state": b.state, "failures": b.failures, "last_error": b.last_error,
+            "retry_in": b.retry_in(), "last_ok_ts": self.last_ok_ts,
+            "stale_since": (self.last_ok_ts or snap.ts or None) if stale else None,
+        }
+
+    def drain(self) -> Optional[QuoteSnapshot]:
+        """取出队列里最新的一个快照（丢弃更旧的），无新数据返回 None。仅在 Tk 线程调用。"""
+        snap = None
+        while True:
             try:
-                txt = r.text if 'r' in locals() else ""
-                snippet = txt[:200].replace("\n", " ")
-                print("[price client] resp snippet:", snippet + (" ..." if len(txt) > 200 else ""))
-            except Exception:
-                pass
-            traceback.print_exc()
+                snap = self._q.get_nowait()
+            except queue.Empty:
+                return snap
+
+    def history(self, code: str, t0: float, t1: Optional[float] = None) -> Tuple[array, array]:
+        """[t0, t1] 的 tick：内存环覆盖的部分直接取，更早的从磁盘归档读。"""
+        t1 = time.time() if t1 is None else t1
+        rts, rpx = self.ticks.since(code, t0)
+        k = bisect_right(rts, t1)
+        rts, rpx = rts[:k], rpx[:k]
+        r = self.ticks.get(code)
+        first = r.first() if r is not None else None
+        if self.archive is None or (first is not None and first[0] <= t0):
+            return rts, rpx
+        edge = rts[0] if rts else t1
+        ats, apx = self.archive.query(code, t0, edge)
+        if rts:
+            k = bisect_left(ats, edge)
+            ats, apx = ats[:k], apx[:k]
+        return ats + rts, apx + rpx
+
+    def _touch(self):
+        with self._lock:
+            if self._latest:
+                self._latest = self._latest.touched()
+
+    def _publish(self, snap: QuoteSnapshot):
+        with self._lock:
+            self._latest = snap
+        try:
+            self._q.put_nowait(snap)
+        except queue.Full:
+            try: self._q.get_nowait()
+            except queue.Empty: pass
+            try: self._q.put_nowait(snap)
+            except queue.Full: pass
+
+    def _apply(self, st: FetchState, lines: List[str], delta: bool):
+        base = self._latest
+        if delta and not base:
+            st.reset()                  # 没有基准快照，下一轮取全量
+            return
+        snap = base.merged(lines) if delta else QuoteSnapshot.parse(lines)
+        snap = self.derived.apply(snap)
+        self._publish(snap)
+        self.ticks.ingest(snap)
+        self._maybe_persist(snap)
+
+    def _maybe_persist(self, snap: QuoteSnapshot, force: bool = False):
+        if not self.persist:
+            return
+        now = time.time()
+        if not force and now - self._persisted_at < PERSIST_EVERY_S:
+            return
+        self._persisted_at = now
+        try:
+            save_last_good(snap)
+        except Exception as e:
+            if DEBUG_MODE:
+                print("[price client] persist error:", repr(e))
+
+    def _ok(self):
+        self.breaker.record(True)
+        self.last_ok_ts = time.time()
+
+    def _poll_once(self, s: requests.Session, st: FetchState):
+        if not self.breaker.allow():
+            return                      # 熔断中：快速失败，不占网络
+        code, lines, delta = self.fetcher.fetch(s, st, time.monotonic() + DEADLINE_S)
+        if code == 304:
+            self._ok()
+            self._touch()
+        elif code == 200:
+            self._ok()                  # 空增量（行情没变、又没带 ETag）也是成功，不能算进熔断
+            if lines:
+                self._apply(st, lines, delta)
+            elif delta:
+                self._touch()
+        else:
+            self.breaker.record(False, f"HTTP {code}" if code else "网络错误")
+
+    def _stream_once(self, s: requests.Session, st: FetchState) -> bool:
+        """推送直到断开；返回本次是否收到过数据。"""
+        got = False
+        try:
+            for lines, delta in _stream_events(s, st, self.fetcher.primary(),
+                                               on_open=lambda r: setattr(self, "_resp", r)):
+                if self._stop.is_set():
+                    break
+                if lines:
+                    self._ok()
+                    self._apply(st, lines, delta)
+                    got = True
+                elif delta:
+                    self._ok()
+                    self._touch()
+        except Exception as e:
+            if DEBUG_MODE:
+                print("[price client] stream closed:", repr(e))
+        finally:
+            self._resp = None
+        return got
+
+    def _wait_next(self, t0: float, until: Optional[float] = None):
+        """按交易时段排下一次取数；关注品种变化或退出时提前唤醒。
+        until 为下一次重连推送的时刻：休市时的长间隔不能把重连推迟到它之后。"""
+        delay = self.scheduler.next_delay(self._watch, t0) if self._watch else self.interval
+        self._next_delay = delay
+        if self.breaker.state == CircuitBreaker.OPEN:
+            delay = max(delay, self.breaker.retry_in())
+        if until is not None:
+            delay = min(delay, until - t0)
+        self._wake.clear()
+        self._wake.wait(max(0.0, delay - (time.time() - t0)))
+
+    def _run(self):
+        s = _build_session()      # 该线程独占
+        st = FetchState()
+        self.fetcher = HedgedFetcher()
+        stream_at = 0.0
+        try:
+            while not self._stop.is_set():
+                if STREAM_MODE and time.time() >= stream_at:
+                    self.mode = "stream"
+                    got = self._stream_once(s, st)
+                    stream_at = time.time() + (STREAM_RETRY_S if got else STREAM_FALLBACK_S)
+                    continue
+                self.mode = "poll"
+                t0 = time.time()
+                self._poll_once(s, st)
+                self._wait_next(t0, stream_at if STREAM_MODE else None)
+        finally:
+            try: self._maybe_persist(self._latest, force=True)
+            except Exception: pass
+            try:
+                if self.archive is not None: self.archive.close()
+            except Exception: pass
+            try: self.fetcher.close()
+            except Exception: pass
+            try: s.close()
+            except Exception: pass
+
+
+def start_feed(interval: float = POLL_INTERVAL_S, seed: Optional[QuoteSnapshot] = None) -> QuoteFeed:
+    global _feed
+    if _feed is None:
+        _feed = QuoteFeed(interval, seed=seed)
+    return _feed.start()
+
+def get_feed() -> Optional[QuoteFeed]:
+    return _feed
+
+def latest_snapshot() -> QuoteSnapshot:
+    return _feed.latest() if _feed is not None else EMPTY_SNAPSHOT
+
+def stop_feed():
+    global _feed
+    if _feed is not None:
+        _feed.stop()
+        _feed = None
+
+def probe_all_lines() -> List[str]:
+    """后台线程已启动时直接返回最新快照（不发请求）；否则同步取一次（脚本/调试用）。"""
+    global _last_lines, _last_ok_ts
+
+    if _feed is not None:
+        snap = _feed.latest()
+        return [] if snap.stale else snap.lines()
+
+    _, lines, _ = _fetch_lines(_get_session())
+    if lines:
+        _last_lines = lines
+        _last_ok_ts = time.time()
+        return lines
 
     if _last_lines and (time.time() - _last_ok_ts) <= MAX_STALE:
         return list(_last_lines)
@@ -1,6 +1,8 @@
 # core/resource.py
 import os, sys, ctypes
 
+APP_DIR_NAME = "GoldPriceBubble"      # %APPDATA% 下的数据目录名
+
 def is_frozen():
     return hasattr(sys, "_MEIPASS")
 
@@ -0,0 +1,268 @@
+# core/sessions.py
+# 交易时段表 + 自适应轮询节奏：开市快轮询，全部休市时退到分钟级，并在开盘时刻准时唤醒
+import datetime as _dt
+import json, os, time
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from core.instruments import by_code
+from core.resource import data_dir_in_appdata, APP_DIR_NAME
+
+# 时段：(锚定日, 开始分钟, 结束分钟)，分钟相对锚定日 0 点（当地时间），可跨过 24:00
+#   锚定日 0 = 交易日当天；-1 = 交易日前一自然日；"pb" = 前一个交易日（SGE 夜盘归属下一交易日）
+# tz: CN = 北京时间；ET = 美东时间（按美国夏令时规则换算）
+MARKETS = {
+    # 上海金交所 T+D：夜盘 20:00-02:30，日盘 09:00-11:30、13:30-15:30
+    "SGE":   {"tz": "CN", "sessions": (("pb", 1200, 1590), (0, 540, 690), (0, 810, 930))},
+    # 在岸人民币：09:30-次日 03:00
+    "CFETS": {"tz": "CN", "sessions": ((0, 570, 1620),)},
+    # COMEX Globex：前一日 18:00-当日 17:00（美东），每日 17:00-18:00 休息
+    "COMEX": {"tz": "ET", "sessions": ((-1, 1080, 2460),)},
+    # 伦敦现货（OTC）报价跟随 Globex 周内连续时段
+    "SPOT":  {"tz": "ET", "sessions": ((-1, 1080, 2460),)},
+}
+
+# 休市日（交易日口径，YYYY-MM-DD，只列工作日；周末本来就休市，调休上班的周末也不开市）
+# 国内按国务院放假安排，金交所与外汇交易中心同步休市；新一年的安排公布后补进来，
+# 或写在数据目录的 holidays.json：{"SGE": ["2027-01-01", ...], ...}，启动时并入
+_CN_HOLIDAYS = {
+    # 2025：元旦 1/1；春节 1/28-2/4；清明 4/4；劳动节 5/1-5/5；端午 6/2；国庆中秋 10/1-10/8
+    "2025-01-01",
+    "2025-01-28", "2025-01-29", "2025-01-30", "2025-01-31", "2025-02-03", "2025-02-04",
+    "2025-04-04",
+    "2025-05-01", "2025-05-02", "2025-05-05",
+    "2025-06-02",
+    "2025-10-01", "2025-10-02", "2025-10-03", "2025-10-06", "2025-10-07", "2025-10-08",
+    # 2026：元旦 1/1-1/3；春节 2/15-2/23；清明 4/4-4/6；劳动节 5/1-5/5；端午 6/19-6/21；中秋 9/25-9/27；国庆 10/1-10/7
+    "2026-01-01", "2026-01-02",
+    "2026-02-16", "2026-02-17", "2026-02-18", "2026-02-19", "2026-02-20", "2026-02-23",
+    "2026-04-06",
+    "2026-05-01", "2026-05-04", "2026-05-05",
+    "2026-06-19",
+    "2026-09-25",
+    "2026-10-01", "2026-10-02", "2026-10-05", "2026-10-06", "2026-10-07",
+}
+
+HOLIDAYS_FILE = "holidays.json"
+_LOOKAHEAD_DAYS = 16        # 向后找开盘的最长天数（覆盖长假）
+
+
+def _easter(year: int) -> _dt.date:
+    """公历复活节（Anonymous Gregorian 算法）。"""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return _dt.date(year, month, day + 1)
+
+
+def _us_closures(year: int) -> Set[str]:
+    """CME 金属全天休市的日子：元旦、耶稣受难日、圣诞（逢周日顺延到周一，圣诞逢周六提前到周五）。其余美国假日只是提前收盘，按开市处理。"""
+    out = {(_easter(year) - _dt.timedelta(days=2)).isoformat()}
+    for d in (_dt.date(year, 1, 1), _dt.date(year, 12, 25)):
+        if d.weekday() == 6:
+            d += _dt.timedelta(days=1)
+        elif d.weekday() == 5:
+            d = d - _dt.timedelta(days=1) if d.month == 12 else None
+        if d is not None:
+            out.add(d.isoformat())
+    return out
+
+
+def _us_holidays() -> Set[str]:
+    y = _dt.date.today().year
+    out: Set[str] = set()
+    for year in range(y - 1, y + 3):
+        out |= _us_closures(year)
+    return out
+
+
+HOLIDAYS: Dict[str, Set[str]] = {
+    "SGE":   set(_CN_HOLIDAYS),
+    "CFETS": set(_CN_HOLIDAYS),
+    "COMEX": _us_holidays(),
+    "SPOT":  _us_holidays(),
+}
+
+
+def load_holidays(path: Optional[str] = None) -> int:
+    """把 holidays.json 里的休市日并入 HOLIDAYS；返回并入的条数。文件不存在或损坏时不变。"""
+    try:
+        with open(path or os.path.join(data_dir_in_appdata(APP_DIR_NAME), HOLIDAYS_FILE), "r", encoding="utf-8") as f:
+            items = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    n = 0
+    for market, days in (items.items() if isinstance(items, dict) else ()):
+        if market not in HOLIDAYS or not isinstance(days, list):
+            continue
+        for d in days:
+            try:
+                HOLIDAYS[market].add(_dt.date.fromisoformat(str(d)).isoformat())
+                n += 1
+            except ValueError:
+                continue
+    if n:
+        sessions_of.cache_clear()
+    return n
+
+
+def _us_dst(d: _dt.date) -> bool:
+    """美国夏令时：3 月第二个周日至 11 月第一个周日。"""
+    if d.month < 3 or d.month > 11:
+        return False
+    if 3 < d.month < 11:
+        return True
+    first = _dt.date(d.year, d.month, 1)
+    first_sun = first + _dt.timedelta(days=(6 - first.weekday()) % 7)
+    if d.month == 3:
+        return d >= first_sun + _dt.timedelta(days=7)
+    return d < first_sun
+
+
+def _utc_offset_min(tz: str, d: _dt.date) -> int:
+    if tz == "CN":
+        return 8 * 60
+    return (-4 if _us_dst(d) else -5) * 60
+
+
+def _local_date(tz: str, ts: float) -> _dt.date:
+    d = _dt.datetime.fromtimestamp(ts + 8 * 3600, _dt.timezone.utc).date()   # 先按北京时间粗定日期
+    return _dt.datetime.fromtimestamp(ts + _utc_offset_min(tz, d) * 60, _dt.timezone.utc).date()
+
+
+def _is_business_day(market: str, d: _dt.date) -> bool:
+    return d.weekday() < 5 and d.isoformat() not in HOLIDAYS.get(market, ())
+
+
+def _prev_business_day(market: str, d: _dt.date) -> Tuple[_dt.date, bool]:
+    """前一个交易日，以及中间是否隔着节假日（隔着节假日时 SGE 不开夜盘）。"""
+    p = d - _dt.timedelta(days=1); gap_holiday = False
+    while not _is_business_day(market, p):
+        if p.weekday() < 5:
+            gap_holiday = True
+        p -= _dt.timedelta(days=1)
+    return p, gap_holiday
+
+
+@lru_cache(maxsize=512)
+def sessions_of(market: str, day: _dt.date) -> Tuple[Tuple[float, float], ...]:
+    """某交易日的全部时段（epoch 秒），非交易日返回空。"""
+    spec = MARKETS.get(market)
+    if spec is None or not _is_business_day(market, day):
+        return ()
+    out: List[Tuple[float, float]] = []
+    for anchor, a, b in spec["sessions"]:
+        if anchor == "pb":
+            base, gap = _prev_business_day(market, day)
+            if gap:
+                continue
+        else:
+            base = day + _dt.timedelta(days=anchor)
+        off = _utc_offset_min(spec["tz"], base)
+        t0 = _dt.datetime(base.year, base.month, base.day, tzinfo=_dt.timezone.utc).timestamp() - off * 60
+        out.append((t0 + a * 60, t0 + b * 60))
+    out.sort()
+    return tuple(out)
+
+
+load_holidays()
+
+
+def _days_around(market: str, ts: float, back: int, ahead: int) -> Iterable[_dt.date]:
+    d0 = _local_date(MARKETS[market]["tz"], ts)
+    for k in range(-back, ahead + 1):
+        yield d0 + _dt.timedelta(days=k)
+
+
+def session_at(market: str, ts: Optional[float] = None) -> Optional[Tuple[float, float, _dt.date]]:
+    """ts 所在的时段 (开始, 结束, 交易日)；休市时返回 None。未知市场没有时段表，也返回 None（is_open 对它视为全天开市）。"""
+    ts = time.time() if ts is None else ts
+    if market not in MARKETS:
+        return None
+    for day in _days_around(market, ts, 1, 4):
+        for a, b in sessions_of(market, day):
+            if a <= ts < b:
+                return a, b, day
+    return None
+
+
+def sessions_between(market: str, t0: float, t1: float) -> List[Tuple[float, float, _dt.date]]:
+    """与 [t0, t1] 有交集的全部时段 (开始, 结束, 交易日)，按开始时间升序。未知市场返回空。"""
+    if market not in MARKETS:
+        return []
+    tz = MARKETS[market]["tz"]
+    d0, d1 = _local_date(tz, t0), _local_date(tz, t1)
+    out = []
+    for k in range(-1, (d1 - d0).days + 5):
+        day = d0 + _dt.timedelta(days=k)
+        for a, b in sessions_of(market, day):
+            if a <= t1 and b > t0:
+                out.append((a, b, day))
+    out.sort()
+    return out
+
+
+def is_open(market: str, ts: Optional[float] = None) -> bool:
+    if market not in MARKETS:
+        return True
+    return session_at(market, ts) is not None
+
+
+def next_open(market: str, ts: Optional[float] = None) -> Optional[float]:
+    """ts 之后最近一次开盘时刻（epoch 秒）；已开市返回 ts。"""
+    ts = time.time() if ts is None else ts
+    if market not in MARKETS:
+        return ts
+    # 各交易日的时段按日期单调递增，按日顺序找到的第一个即最近的
+    for day in _days_around(market, ts, 1, _LOOKAHEAD_DAYS):
+        for a, b in sessions_of(market, day):
+            if a <= ts < b:
+                return ts
+            if a > ts:
+                return a
+    return None
+
+
+def trading_day(market: str, ts: Optional[float] = None) -> Optional[_dt.date]:
+    """ts 归属的交易日：开市时为当前时段的交易日，休市时为下一个时段的交易日。"""
+    ts = time.time() if ts is None else ts
+    if market not in MARKETS:
+        return _local_date("CN", ts)
+    cur = session_at(market, ts)
+    if cur is not None:
+        return cur[2]
+    nxt = next_open(market, ts)
+    return None if nxt is None else session_at(market, nxt)[2]
+
+
+def market_of(code: str) -> str:
+    inst = by_code(code)
+    return inst.market if inst else ""
+
+
+class PollScheduler:
+    """按关注品种的交易时段决定下一次取数间隔。
+    任一品种开市：fast 秒；全部休市：slow 秒，但不晚于最近的开盘时刻。"""
+    def __init__(self, fast: float = 1.0, slow: float = 300.0):
+        self.fast = fast
+        self.slow = slow
+
+    def next_delay(self, codes: Iterable[str], now: Optional[float] = None) -> float:
+        now = time.time() if now is None else now
+        markets = {market_of(c) for c in codes} or {""}
+        wake = None
+        for m in markets:
+            t = next_open(m, now)
+            if t is None:
+                continue
+            if t <= now:
+                return self.fast
+            wake = t if wake is None else min(wake, t)
+        if wake is None:
+            return self.slow
+        return max(self.fast, min(self.slow, wake - now))
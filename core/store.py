@@ -0,0 +1,505 @@
+# core/store.py
+# 本地存储（schema 2）：store.json 只存仓摘要与设置（小文件，原子整写），启动时只读它；
+# 每个仓的流水是一个只追加的分片 txns/<pid>.jsonl（批量 fsync），打开该仓详情时才读进内存。
+# 旧格式（store.json 内联 txns，或 txns.json 快照 + txns.jsonl 日志）启动时一次性迁移成分片。
+# store.json 的整写交给后台 StoreWriter：一次操作里连续几次保存合并成一次，不占 Tk 线程。
+import json, os, threading, time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from core.resource import data_dir_in_appdata, APP_DIR_NAME
+from core.portfolio import new_pid
+from core.ledger import infer_opening
+from core.lots import LotBook
+
+SCHEMA        = 2                   # 无 schema 字段的 store.json 视为 1（流水内联或集中存放）
+STORE_FILE    = "store.json"
+SHARD_DIR     = "txns"              # 每仓一个分片，每行 {"op": "add", "txn": {...}}；改 / 删为 {"op": "edit"/"delete", "i": 下标, ...}
+                                    # 批量导入为一行 {"op": "batch", "txns": [...]}：写坏的尾行整行丢弃，导入要么全在要么全无
+                                    # 改时间挪位为 {"op": "move", "i", "j"}；改删后重放出的成交后持仓为 {"op": "post", "i": 起始下标, "rows": [[克数, 均价], ...]}
+LEGACY_TXNS   = "txns.json"         # 旧版流水快照：{"seq": n, "txns": {pid: [txn, ...]}}
+LEGACY_LOG    = "txns.jsonl"        # 旧版集中日志：每行 {"seq": n, "op": "add", "pid": ..., "txn": {...}}
+FSYNC_EVERY_S = 1.0                 # 分片最多攒这么久再 fsync
+FSYNC_BATCH   = 32                  # 或攒够这么多条
+REWRITE_AT    = 256                 # 分片里的改 / 删记录攒到这么多条，载入时由后台线程整写成只含 add 的分片
+DEBOUNCE_S    = 0.5                 # 最后一次保存请求后静默这么久才落盘
+MAX_DELAY_S   = 2.0                 # 请求持续不断时，距第一次请求最多等这么久
+
+
+def _path(name: str) -> str:
+    return os.path.join(data_dir_in_appdata(APP_DIR_NAME), name)
+
+
+def _shard_path(pid: str) -> str:
+    d = _path(SHARD_DIR)
+    os.makedirs(d, exist_ok=True)
+    return os.path.join(d, pid + ".jsonl")
+
+
+def _atomic_write_json(path: str, obj):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _read_json(path: str, default):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def _write_shard(path: str, txns: List[dict]):
+    """整写一个分片：先写临时文件再替换。"""
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for t in txns:
+            f.write(json.dumps({"op": "add", "txn": t}, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class TxnJournal:
+    """只追加的流水日志。append() 写入并 flush 到系统缓存，fsync 按条数 / 时间批量做。"""
+    def __init__(self, path: str):
+        self.path = path
+        self._f = None
+        self._dirty = 0
+        self._synced_at = time.monotonic()
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+        self.appends = 0            # 追加过的记录数：后台整写据此判断读入之后分片是否又变过
+
+    @staticmethod
+    def read(path: str) -> Iterator[dict]:
+        """逐行读日志；遇到解析失败的行（崩溃留下的半行）即停止，并截掉它及之后的内容。"""
+        try:
+            f = open(path, "r+b")
+        except OSError:
+            return
+        with f:
+            good = 0
+            for raw in f:
+                try:
+                    rec = json.loads(raw.decode("utf-8"))
+                    if not raw.endswith(b"\n"):
+                        raise ValueError("torn")
+                except ValueError:
+                    f.truncate(good)
+                    return
+                good += len(raw)
+                yield rec
+
+    def records(self) -> Iterator[dict]:
+        with self._lock:
+            self._sync_locked()
+        return self.read(self.path)
+
+    def append(self, op: str, **fields):
+        rec = {"op": op}
+        rec.update(fields)
+        line = json.dumps(rec, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._f is None:
+                self._f = open(self.path, "a", encoding="utf-8")
+            self._f.write(line)
+            self._f.flush()
+            self._dirty += 1
+            self.appends += 1
+            if self._dirty >= FSYNC_BATCH or time.monotonic() - self._synced_at >= FSYNC_EVERY_S:
+                self._sync_locked()
+            elif self._timer is None:
+                self._timer = threading.Timer(FSYNC_EVERY_S, self.sync)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _sync_locked(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._f is not None and self._dirty:
+            os.fsync(self._f.fileno())
+        self._dirty = 0
+        self._synced_at = time.monotonic()
+
+    def sync(self):
+        with self._lock:
+            try:
+                self._sync_locked()
+            except (OSError, ValueError):
+                pass
+
+    def close(self):
+        with self._lock:
+            try:
+                self._sync_locked()
+            finally:
+                if self._f is not None:
+                    self._f.close()
+                    self._f = None
+
+    def rewrite(self, txns: List[dict], seen: Optional[int] = None) -> bool:
+        """折叠改 / 删记录：关掉追加句柄后整写，下次 append 重新打开。
+        seen 为读入 txns 时的 appends；之后又追加过记录则放弃（txns 已过时），返回 False。"""
+        with self._lock:
+            if seen is not None and seen != self.appends:
+                return False
+            self._sync_locked()
+            if self._f is not None:
+                self._f.close()
+                self._f = None
+            _write_shard(self.path, txns)
+            return True
+
+    def rewrite_later(self, txns: List[dict]):
+        """后台整写（折叠改删记录不必挡住打开详情的 Tk 线程）；txns 为读入时的快照。"""
+        seen = self.appends
+
+        def _run():
+            try:
+                self.rewrite(txns, seen)
+            except (OSError, ValueError, RuntimeError):
+                pass            # 下次载入再折叠
+        threading.Thread(target=_run, name="shard-rewrite", daemon=True).start()
+
+
+_shards: Dict[str, TxnJournal] = {}
+_dropped = set()                    # 已删除的仓：store.json 不再引用后才删分片
+_lock = threading.Lock()
+
+
+def shard(pid: str) -> TxnJournal:
+    with _lock:
+        j = _shards.get(pid)
+        if j is None:
+            j = _shards[pid] = TxnJournal(_shard_path(pid))
+        return j
+
+
+def _ensure_ids(txns: List[dict]) -> bool:
+    """旧流水没有 id：补上持久 id（批次身份不能依赖下标，删除 / 按时间并入都会挪动下标）；
+    指定批次卖出里按下标记的 "#i" 换成当前第 i 笔的 id。有补写时返回 True，调用方负责落盘。"""
+    if all(t.get("id") for t in txns):
+        return False
+    for t in txns:
+        if not t.get("id"):
+            t["id"] = new_pid()
+    for t in txns:
+        lots = t.get("lots")
+        if not lots:
+            continue
+        fixed = []
+        for lid, q in lots:
+            lid = str(lid)
+            if lid.startswith("#") and lid[1:].isdigit() and int(lid[1:]) < len(txns):
+                lid = txns[int(lid[1:])]["id"]
+            fixed.append([lid, q])
+        t["lots"] = fixed
+    return True
+
+
+def _migrate(st: dict) -> dict:
+    """schema 1 → 2：收集内联流水 / 旧快照 + 旧日志，按仓写分片，再写带 schema 的 store.json，最后删旧文件。
+    中途崩溃时旧文件都还在，下次启动重新迁移（分片整写，可重复）。"""
+    portfolios = [p for p in (st.get("portfolios") or []) if isinstance(p, dict)]
+    snap = _read_json(_path(LEGACY_TXNS), {})
+    snap = snap if isinstance(snap, dict) else {}
+    stored = snap.get("txns") if isinstance(snap.get("txns"), dict) else {}
+    after = int(snap.get("seq") or 0)
+    by_pid: Dict[str, List[dict]] = {}
+    for p in portfolios:
+        p.setdefault("pid", new_pid())
+        txns = p.pop("txns", None)
+        by_pid[p["pid"]] = list(txns if isinstance(txns, list) else (stored.get(p["pid"]) or []))
+    log = _path(LEGACY_LOG)
+    for path in (log + ".old", log):
+        for rec in TxnJournal.read(path):
+            txns = by_pid.get(rec.get("pid"))
+            if (txns is not None and int(rec.get("seq") or 0) > after
+                    and rec.get("op") == "add" and isinstance(rec.get("txn"), dict)):
+                txns.append(rec["txn"])
+    for pid, txns in by_pid.items():
+        if txns:
+            _ensure_ids(txns)
+            _write_shard(_shard_path(pid), txns)
+    st["portfolios"] = portfolios
+    st["schema"] = SCHEMA
+    _atomic_write_json(_path(STORE_FILE), st)
+    for name in (LEGACY_TXNS, LEGACY_LOG, LEGACY_LOG + ".old"):
+        _remove(_path(name))
+    return st
+
+
+def load() -> dict:
+    """只读 store.json（仓摘要与设置）；各仓流水不读，用 txns(p) 按需载入。旧格式先迁移。"""
+    st = _read_json(_path(STORE_FILE), {})
+    if not isinstance(st, dict):
+        st = {}
+    if int(st.get("schema") or 1) < SCHEMA:
+        st = _migrate(st)
+    portfolios = [p for p in (st.get("portfolios") or []) if isinstance(p, dict)]
+    filled = False
+    for p in portfolios:
+        p.setdefault("pid", new_pid())
+        p.pop("txns", None)
+        if not isinstance(p.get("lots"), dict):
+            _fill_lots(p)
+            filled = True
+    st["portfolios"] = portfolios
+    if filled:
+        try:
+            _atomic_write_json(_path(STORE_FILE), st)
+        except OSError:
+            pass
+    return st
+
+
+def _fill_lots(p: dict):
+    """没有批次摘要的仓（迁移来的旧仓、从未打开过详情）：读一次分片算出摘要，随 store.json 保存，之后启动不再读分片。"""
+    txns = read_txns(p["pid"])
+    if "opening" not in p:
+        p["opening"] = (list(infer_opening(txns)) if txns else
+                        [float(p.get("grams") or 0.0), float(p.get("cost_per_g") or 0.0)])
+    p["lots"] = LotBook(txns, tuple(p["opening"])).summary()
+
+
+def save(portfolios: List[dict], active_index, display_quotes, **extra):
+    """写仓摘要与设置（不含流水）；未知字段（minimal_mode、unit_overrides 等）沿用文件里已有的值。
+    写完后删掉已不再被引用的已删除仓的分片。"""
+    path = _path(STORE_FILE)
+    st = _read_json(path, {})
+    if not isinstance(st, dict):
+        st = {}
+    st.update(extra)
+    st["schema"] = SCHEMA
+    st["portfolios"] = [{k: v for k, v in p.items() if k != "txns"} for p in portfolios]
+    st["active_index"] = active_index
+    st["display_quotes"] = list(display_quotes or [])
+    _atomic_write_json(path, st)
+    live = {p.get("pid") for p in portfolios}
+    with _lock:
+        gone = [pid for pid in _dropped if pid not in live]
+        _dropped.difference_update(gone)
+    for pid in gone:
+        _remove(_shard_path(pid))
+
+
+# ---------- 流水（按仓分片） ----------
+def read_txns(pid: str) -> List[dict]:
+    """按顺序重放分片里的 add / edit / delete。给旧流水补了 id 时当场整写；改删记录过多时交给后台线程折叠。"""
+    out: List[dict] = []
+    j = shard(pid)
+    ops = 0
+    for rec in j.records():
+        op, t, i = rec.get("op"), rec.get("txn"), rec.get("i")
+        if op == "add" and isinstance(t, dict):
+            out.append(t)
+        elif op == "batch" and isinstance(rec.get("txns"), list):
+            out.extend(x for x in rec["txns"] if isinstance(x, dict))
+        elif op == "edit" and isinstance(t, dict) and isinstance(i, int) and 0 <= i < len(out):
+            out[i] = t
+            ops += 1
+        elif op == "delete" and isinstance(i, int) and 0 <= i < len(out):
+            del out[i]
+            ops += 1
+        elif op == "move" and isinstance(i, int) and 0 <= i < len(out) and isinstance(rec.get("j"), int):
+            out.insert(min(max(rec["j"], 0), len(out) - 1), out.pop(i))
+            ops += 1
+        elif op == "post" and isinstance(i, int) and isinstance(rec.get("rows"), list):
+            _set_posts(out, i, rec["rows"])
+            ops += 1
+    if _ensure_ids(out):
+        # 新补的 id 会被之后的指定批次卖出引用，必须先落盘，同步整写（每个旧分片只有一次）
+        try:
+            j.rewrite(out)
+        except OSError:
+            pass
+    elif ops >= REWRITE_AT:
+        j.rewrite_later(list(out))
+    return out
+
+
+def txns(p: dict) -> List[dict]:
+    """仓的流水列表，首次访问时从分片读入并挂在 p["txns"] 上。"""
+    if "txns" not in p:
+        p["txns"] = read_txns(p["pid"])
+    return p["txns"]
+
+
+def release(p: dict):
+    """详情窗口关闭后释放流水，常驻内存只剩仓摘要。"""
+    p.pop("txns", None)
+
+
+def append_txn(p: dict, txn: dict):
+    """记一笔流水：追加到该仓分片；流水已载入时同步进内存列表。磁盘开销与历史长度无关。"""
+    if "txns" in p:
+        p["txns"].append(txn)
+    shard(p["pid"]).append("add", txn=txn)
+
+
+def edit_txn(p: dict, i: int, txn: dict):
+    """改第 i 笔流水：内存列表就地替换，分片追加一条 edit 记录。"""
+    txns(p)[i] = txn
+    shard(p["pid"]).append("edit", i=i, txn=txn)
+
+
+def delete_txn(p: dict, i: int):
+    del txns(p)[i]
+    shard(p["pid"]).append("delete", i=i)
+
+
+def move_txn(p: dict, i: int, j: int):
+    """改了时间的流水从第 i 位挪到第 j 位（按时间重新排好）。"""
+    cur = txns(p)
+    cur.insert(j, cur.pop(i))
+    shard(p["pid"]).append("move", i=i, j=j)
+
+
+def _set_posts(out: List[dict], start: int, rows: list):
+    for t, row in zip(out[start:], rows):
+        if t.get("side") != "ADJ":          # ADJ 的成交后克数 / 均价是校正目标，是输入不是结果
+            t["post_grams"], t["post_avg"] = float(row[0]), float(row[1])
+
+
+def set_posts(p: dict, start: int, rows: List[Tuple[float, float]]):
+    """改删历史流水后，第 start 笔往后的成交后克数 / 均价按重放结果整体更新，分片只追加一条 post 记录。"""
+    rows = [[g, a] for g, a in rows]
+    _set_posts(txns(p), start, rows)
+    shard(p["pid"]).append("post", i=start, rows=rows)
+
+
+def import_txns(p: dict, new: List[dict], merged: Optional[List[dict]] = None):
+    """批量导入，一次落盘：
+    merged 为空时 new 接在现有流水之后，作为一条 batch 记录追加并立即 fsync；
+    导入的流水早于已有流水、需要按时间并入时传合并后的完整列表 merged，分片原子整写成它。"""
+    cur = txns(p)
+    j = shard(p["pid"])
+    if merged is None:
+        j.append("batch", txns=new)
+        j.sync()
+        cur.extend(new)
+    else:
+        j.rewrite(merged)
+        p["txns"] = merged
+
+
+def drop_txns(pid: str):
+    """仓被删除：关掉分片句柄，等下一次保存 store.json 之后再删文件。"""
+    with _lock:
+        j = _shards.pop(pid, None)
+        _dropped.add(pid)
+    if j is not None:
+        j.close()
+
+
+class StoreWriter:
+    """store.json 的后台写线程。request() 在 Tk 线程里只拍一份仓摘要的浅拷贝就返回；
+    防抖窗口内的多次请求合并成一次原子整写（只写最后一份）。flush() 立即写掉待写的请求。"""
+    def __init__(self, debounce_s: float = DEBOUNCE_S, max_delay_s: float = MAX_DELAY_S):
+        self.debounce_s = debounce_s
+        self.max_delay_s = max_delay_s
+        self.requests = 0
+        self.writes = 0
+        self._cv = threading.Condition()
+        self._pending = None            # (args, kwargs)
+        self._first = 0.0
+        self._last = 0.0
+        self._busy = False
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="StoreWriter", daemon=True)
+        self._thread.start()
+
+    def request(self, portfolios: List[dict], active_index, display_quotes, **extra):
+        state = ([dict(p) for p in portfolios], active_index, list(display_quotes or []))
+        now = time.monotonic()
+        with self._cv:
+            if self._pending is None:
+                self._first = now
+            self._pending = (state, extra if self._pending is None else {**self._pending[1], **extra})
+            self._last = now
+            self.requests += 1
+            self._cv.notify()
+
+    def _due(self) -> float:
+        return min(self._last + self.debounce_s, self._first + self.max_delay_s)
+
+    def _run(self):
+        while True:
+            with self._cv:
+                while not self._stop and (self._pending is None or time.monotonic() < self._due()):
+                    self._cv.wait(None if self._pending is None else max(self._due() - time.monotonic(), 0.0))
+                if self._pending is None:
+                    return
+                job, self._pending = self._pending, None
+                self._busy = True
+            self._write(job)
+            with self._cv:
+                self._busy = False
+                self._cv.notify_all()
+
+    def _write(self, job):
+        state, extra = job
+        try:
+            save(*state, **extra)
+            self.writes += 1
+        except Exception:
+            pass
+
+    def flush(self):
+        """同步写掉待写的请求，并等进行中的写完成。"""
+        with self._cv:
+            while self._busy:
+                self._cv.wait()
+            job, self._pending = self._pending, None
+            if job is not None:
+                self._busy = True
+        if job is not None:
+            self._write(job)
+            with self._cv:
+                self._busy = False
+                self._cv.notify_all()
+
+    def close(self):
+        with self._cv:
+            self._stop = True
+            self._cv.notify_all()
+        self._thread.join()
+        self.flush()
+
+
+_writer: Optional[StoreWriter] = None
+
+
+def writer() -> StoreWriter:
+    global _writer
+    if _writer is None:
+        _writer = StoreWriter()
+    return _writer
+
+
+def save_later(portfolios: List[dict], active_index, display_quotes, **extra):
+    """合并、防抖后由后台线程保存；退出时 close() 会写掉未落盘的请求。"""
+    writer().request(portfolios, active_index, display_quotes, **extra)
+
+
+def close():
+    """退出前：写掉待保存的 store.json，各分片 fsync 并关闭。"""
+    if _writer is not None:
+        _writer.close()
+    with _lock:
+        shards = list(_shards.values())
+        _shards.clear()
+    for j in shards:
+        j.close()
@@ -0,0 +1,172 @@
+# core/ticks.py
+# 逐品种的定长环形缓冲：时间戳与价格各一条 array('d')，追加 O(1)、内存有上限
+# 图表、指标、提醒都从这里读最近的行情，不再各自保存历史。
+import math
+import threading
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from core.instruments import by_iid, by_code
+
+DEFAULT_CAPACITY = 4096       # 每个品种保留的最近 tick 数（1 秒一次约 1 小时）
+
+
+class TickRing:
+    """单品种环形缓冲。容量固定，满了覆盖最旧的一条；追加不分配新的 Python 对象。"""
+    __slots__ = ("capacity", "ts", "px", "head", "count")
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.ts = array("d", bytes(8 * capacity))
+        self.px = array("d", bytes(8 * capacity))
+        self.head = 0           # 下一次写入的位置
+        self.count = 0
+
+    def append(self, ts: float, px: float):
+        i = self.head
+        self.ts[i] = ts
+        self.px[i] = px
+        i += 1
+        self.head = 0 if i == self.capacity else i
+        if self.count < self.capacity:
+            self.count += 1
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _start(self) -> int:
+        return (self.head - self.count) % self.capacity
+
+    def last(self) -> Optional[Tuple[float, float]]:
+        if not self.count:
+            return None
+        i = self.head - 1
+        return self.ts[i], self.px[i]
+
+    def first(self) -> Optional[Tuple[float, float]]:
+        if not self.count:
+            return None
+        i = self._start()
+        return self.ts[i], self.px[i]
+
+    def window(self, n: Optional[int] = None) -> Tuple[array, array]:
+        """最近 n 条（默认全部），按时间升序，返回新的 array 副本。"""
+        n = self.count if n is None else max(0, min(n, self.count))
+        start = (self.head - n) % self.capacity
+        end = start + n
+        if end <= self.capacity:
+            return self.ts[start:end], self.px[start:end]
+        k = end - self.capacity
+        return self.ts[start:] + self.ts[:k], self.px[start:] + self.px[:k]
+
+    def since(self, t0: float) -> Tuple[array, array]:
+        """时间戳 >= t0 的全部 tick（环内按时间有序，二分查找起点）。"""
+        lo, hi = 0, self.count
+        start, cap = self._start(), self.capacity
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.ts[(start + mid) % cap] < t0:
+                lo = mid + 1
+            else:
+                hi = mid
+        return self.window(self.count - lo)
+
+    def __iter__(self) -> Iterator[Tuple[float, float]]:
+        start, cap = self._start(), self.capacity
+        for k in range(self.count):
+            i = (start + k) % cap
+            yield self.ts[i], self.px[i]
+
+
+class TickStore:
+    """所有品种的 tick 历史，按品种数字 ID 索引。
+    喂入快照时只追加价格有变化（或距上次超过 keepalive 秒）的品种，NaN 不入库。
+    由取数线程写入，其他线程通过 window() / since() 读取（加锁拷贝）。"""
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, keepalive_s: float = 60.0):
+        self.capacity = capacity
+        self.keepalive_s = keepalive_s
+        self._rings: Dict[int, TickRing] = {}
+        self._lock = threading.RLock()
+        self._listeners: List = []
+
+    def ring(self, iid: int) -> TickRing:
+        r = self._rings.get(iid)
+        if r is None:
+            with self._lock:
+                r = self._rings.setdefault(iid, TickRing(self.capacity))
+        return r
+
+    def get(self, code: str) -> Optional[TickRing]:
+        inst = by_code(code)
+        return None if inst is None else self._rings.get(inst.iid)
+
+    def window(self, code: str, n: Optional[int] = None) -> Tuple[array, array]:
+        r = self.get(code)
+        if r is None:
+            return array("d"), array("d")
+        with self._lock:
+            return r.window(n)
+
+    def since(self, code: str, t0: float) -> Tuple[array, array]:
+        r = self.get(code)
+        if r is None:
+            return array("d"), array("d")
+        with self._lock:
+            return r.since(t0)
+
+    def last(self, code: str) -> Optional[Tuple[float, float]]:
+        r = self.get(code)
+        if r is None:
+            return None
+        with self._lock:
+            return r.last()
+
+    def add_listener(self, cb):
+        """cb(iid, ts, px)：每条新 tick 回调一次（K 线、指标等增量计算挂在这里）。"""
+        if cb not in self._listeners:
+            self._listeners.append(cb)
+
+    def remove_listener(self, cb):
+        try: self._listeners.remove(cb)
+        except ValueError: pass
+
+    def append(self, iid: int, ts: float, px: float) -> bool:
+        r = self.ring(iid)
+        if r.count:
+            j = r.head - 1
+            lt = r.ts[j]
+            if ts <= lt:
+                return False        # 乱序 / 重复的时间戳丢弃，保证环内有序
+            if r.px[j] == px and ts - lt < self.keepalive_s:
+                return False
+        r.append(ts, px)
+        for cb in self._listeners:
+            try: cb(iid, ts, px)
+            except Exception: pass
+        return True
+
+    def ingest(self, snap) -> int:
+        """把一个 QuoteSnapshot 追加进各品种的环；返回新增 tick 数。stale 快照不入库。"""
+        if not snap or snap.stale:
+            return 0
+        n = 0
+        prices, ts = snap.prices, snap.ts
+        with self._lock:
+            for iid, i in snap.ids.items():
+                px = prices[i]
+                if math.isnan(px):
+                    continue
+                if self.append(iid, ts, px):
+                    n += 1
+        return n
+
+    def codes(self) -> List[str]:
+        out = []
+        for iid in list(self._rings):
+            inst = by_iid(iid)
+            if inst is not None:
+                out.append(inst.code)
+        return out
+
+    def memory_bytes(self) -> int:
+        return sum(16 * r.capacity for r in self._rings.values())
@@ -0,0 +1,135 @@
+# core/units.py
+# 单位 / 币种换算：按 unit_overrides 把品种报价换成目标口径（USD/oz、CNY/g、CNY/kg…）
+# 每个品种的换算预编译成「质量系数 × 汇率的幂」，对整份快照一次性按数组相乘；
+# 换算系数只在汇率 tick 变化（或快照品种列表变化）时重建。
+import operator
+from array import array
+from typing import Dict, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from core.instruments import Instrument, by_code, code_of
+
+FX_CODE = "USDCNY"              # 美元兑人民币，1 USD = x CNY
+NAN = float("nan")
+
+GRAMS = {"g": 1.0, "kg": 1000.0, "oz": 31.1034768}     # 每单位的克数（金衡盎司）
+CURRENCIES = ("USD", "CNY")
+
+UNIT_LABELS = {
+    ("CNY", "g"): "元/克", ("CNY", "kg"): "元/千克", ("CNY", "oz"): "元/盎司",
+    ("USD", "g"): "美元/克", ("USD", "kg"): "美元/千克", ("USD", "oz"): "美元/盎司",
+}
+
+
+def parse_unit(text: str) -> Optional[Tuple[str, str]]:
+    """"CNY/g"、"usd/oz" → ("CNY", "g")；不认识返回 None。"""
+    cur, sep, unit = str(text or "").strip().partition("/")
+    cur, unit = cur.strip().upper(), unit.strip().lower()
+    if not sep or cur not in CURRENCIES or unit not in GRAMS:
+        return None
+    return cur, unit
+
+
+def convertible(inst: Instrument) -> bool:
+    return inst.currency in CURRENCIES and inst.unit in GRAMS
+
+
+def compile_factor(inst: Instrument, target: Tuple[str, str]) -> Tuple[float, int]:
+    """品种报价 → 目标口径的 (质量系数, 汇率幂)：目标价 = 原价 × 质量系数 × USDCNY^幂。"""
+    cur, unit = target
+    mass = GRAMS[unit] / GRAMS[inst.unit]
+    if inst.currency == cur:
+        return mass, 0
+    return mass, (1 if inst.currency == "USD" else -1)
+
+
+def _same(a: float, b: float) -> bool:
+    return a == b or (a != a and b != b)
+
+
+class UnitConverter:
+    """按 unit_overrides（品种 code 或旧展示名 → "CNY/g" 这类目标口径）批量换算快照。
+    在 Tk 线程里使用；convert(snap) 返回与 snap.names 对齐的换算后价格数组。"""
+    def __init__(self, overrides: Optional[Dict[str, str]] = None):
+        self.set_overrides(overrides)
+
+    def set_overrides(self, overrides: Optional[Dict[str, str]]):
+        self._plans: Dict[int, Tuple[float, int]] = {}
+        self._targets: Dict[str, Tuple[str, str]] = {}
+        for key, val in (overrides or {}).items():
+            target = parse_unit(val)
+            inst = by_code(code_of(key)) if target else None
+            if inst is None or not convertible(inst):
+                continue
+            self._plans[inst.iid] = compile_factor(inst, target)
+            self._targets[inst.code] = target
+        self._names = None
+        self._fx = NAN
+        self._factors = array("d")
+        self._src = None
+        self._out = array("d")
+
+    def _rebuild(self, snap, fx: float):
+        f = array("d", [1.0]) * len(snap.names)
+        for iid, (mass, power) in self._plans.items():
+            i = snap.ids.get(iid)
+            if i is not None:
+                f[i] = mass * (fx ** power if power else 1.0)
+        self._names, self._fx, self._factors = snap.names, fx, f
+        self._src = None
+
+    def factors(self, snap) -> array:
+        fx = NAN
+        if self._plans:
+            fx = snap.quote(FX_CODE)
+            fx = NAN if fx is None else fx
+        if not _same(fx, self._fx) or not self._same_names(snap.names):
+            self._rebuild(snap, fx)
+        return self._factors
+
+    def _same_names(self, names) -> bool:
+        """全量取数每次都是新的 names 元组，按值比较（先比长度）；相等时记下新元组，之后同一份快照走身份比较。"""
+        old = self._names
+        if names is old:
+            return True
+        if old is None or len(names) != len(old) or names != old:
+            return False
+        self._names = names
+        return True
+
+    def convert(self, snap) -> array:
+        """整份快照一次相乘；同一份价格数组（304 刷新时间戳）直接复用上次结果。"""
+        f = self.factors(snap)
+        if snap.prices is self._src:
+            return self._out
+        if not self._plans:
+            out = snap.prices
+        elif np is not None:
+            out = array("d", (np.frombuffer(snap.prices, dtype=float) * np.frombuffer(f, dtype=float)).tobytes())
+        else:
+            out = array("d", map(operator.mul, snap.prices, f))
+        self._src, self._out = snap.prices, out
+        return out
+
+    def value(self, snap, code: str) -> Optional[float]:
+        """单个品种换算后的价格；无价返回 None。"""
+        inst = by_code(code)
+        i = None if inst is None else snap.ids.get(inst.iid)
+        if i is None:
+            return None
+        v = self.convert(snap)[i]
+        return None if v != v else v
+
+    def unit_label(self, code: str) -> str:
+        """品种当前展示口径的中文单位（未换算时按原口径），不认识的返回空串。"""
+        t = self._targets.get(code)
+        if t is None:
+            inst = by_code(code)
+            if inst is None or not convertible(inst):
+                return ""
+            t = (inst.currency, inst.unit)
+        return UNIT_LABELS.get(t, "")
@@ -0,0 +1,14 @@
+# tests/conftest.py
+import pytest
+
+from core import store
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """存储目录指到临时目录，分片句柄每个用例独立。"""
+    monkeypatch.setattr(store, "_path", lambda name: str(tmp_path / name))
+    monkeypatch.setattr(store, "_shards", {})
+    yield tmp_path
+    for j in list(store._shards.values()):
+        j.close()
@@ -0,0 +1,58 @@
+# tests/test_archive.py
+import os
+
+import pytest
+
+from core import archive
+from core.archive import TickArchive, day_of
+from core.instruments import by_code
+
+CODE = "SGE_AUTD"
+DAY0 = 1767225600.0                 # 2026-01-01 08:00 北京时间
+
+
+@pytest.fixture
+def arc(tmp_path):
+    a = TickArchive(str(tmp_path))
+    yield a
+    a.close()
+
+
+def _feed(a, ticks):
+    iid = by_code(CODE).iid
+    for ts, px in ticks:
+        a.add(iid, ts, px)
+    a.flush()
+
+
+def test_torn_record_truncated_on_next_flush(tmp_path, arc):
+    _feed(arc, [(DAY0 + k, 600.0 + k) for k in range(3)])
+    path = arc.path(CODE, day_of(DAY0))
+    with open(path, "ab") as f:
+        f.write(b"\x01\x02\x03\x04\x05")           # 崩溃留下的半条记录
+    assert list(arc.query(CODE, DAY0, DAY0 + 10)[0]) == [DAY0, DAY0 + 1, DAY0 + 2]   # 读时忽略半条
+    fresh = TickArchive(str(tmp_path))
+    _feed(fresh, [(DAY0 + 3, 603.0)])
+    assert os.path.getsize(path) == 4 * 8 * archive.TICK_FIELDS
+    ts, px = fresh.query(CODE, DAY0, DAY0 + 10)
+    assert list(ts) == [DAY0 + k for k in range(4)]
+    assert list(px) == [600.0 + k for k in range(4)]
+    fresh.close()
+
+
+def test_compact_then_query_returns_bar_closes(arc):
+    base = DAY0 - DAY0 % 60
+    ticks = [(base + 5, 600.0), (base + 30, 605.0), (base + 50, 598.0),
+             (base + 65, 601.0), (base + 119, 603.0), (base + 130, 610.0)]
+    _feed(arc, ticks)
+    recent = DAY0 + 30 * 86400
+    _feed(arc, [(recent, 700.0)])
+    assert arc.compact(now=recent, keep_days=7) == 1
+    assert not os.path.exists(arc.path(CODE, day_of(DAY0)))
+    assert os.path.exists(arc.path(CODE, day_of(DAY0), archive.BAR_EXT))
+    ts, px = arc.query(CODE, base, base + 3600)
+    assert list(ts) == [base, base + 60, base + 120]
+    assert list(px) == [598.0, 603.0, 610.0]
+    assert list(arc.query(CODE, recent, recent)[1]) == [700.0]      # 近几天的原始 tick 不动
+    assert arc.days(CODE) == [day_of(DAY0), day_of(recent)]
+    assert arc.compact(now=recent, keep_days=7) == 0
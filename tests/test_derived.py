@@ -0,0 +1,55 @@
+# tests/test_derived.py
+import pytest
+
+from core.derived import Derived, DerivedEngine, ExprError, compile_expr
+from core.prices import QuoteSnapshot
+
+
+def _snap(**px) -> QuoteSnapshot:
+    return QuoteSnapshot.parse([f"{code},{v}" for code, v in px.items()])
+
+
+@pytest.mark.parametrize("expr", [
+    "__import__('os').system('x')", "LDN_AU ** 2", "LDN_AU.real", "[LDN_AU]",
+    "LDN_AU if NY_AU else 0", "lambda: 1", "'abc'", "LDN_AU // 2",
+])
+def test_compile_rejects_non_whitelisted(expr):
+    with pytest.raises(ExprError):
+        compile_expr(expr)
+
+
+def test_compile_collects_deps_and_constants():
+    fn, deps = compile_expr("-(NY_AU - LDN_AU) / OZ_G * 2")
+    assert deps == {"NY_AU", "LDN_AU"}
+    assert fn({"NY_AU": 3.0, "LDN_AU": 1.0}) == pytest.approx(-2.0 / 31.1034768 * 2)
+    assert fn({"NY_AU": 3.0}) != fn({"NY_AU": 3.0})                   # 缺价为 NaN
+
+
+def test_cycles_reported_and_skipped():
+    eng = DerivedEngine([Derived("T_CYC_A", "环A", "T_CYC_B + 1"), Derived("T_CYC_B", "环B", "T_CYC_A * 2"),
+                         Derived("T_CYC_C", "环C", "T_CYC_A - LDN_AU"), Derived("T_OK", "正常", "LDN_AU * 2")])
+    assert eng.codes() == ["T_OK"]
+    assert "循环依赖" in eng.errors["T_CYC_A"] or "循环依赖" in eng.errors["T_CYC_B"]
+    assert "T_CYC_C" in eng.errors
+
+
+def test_apply_recomputes_only_affected_nodes():
+    eng = DerivedEngine([Derived("T_SPREAD", "测差", "NY_AU - LDN_AU"),
+                         Derived("T_HALF", "测半", "SGE_AUTD / 2"),
+                         Derived("T_DBL", "测倍", "T_SPREAD * 2")])
+    calls = []
+    for n in eng.order:
+        n.fn = (lambda f, c: lambda vals: (calls.append(c), f(vals))[1])(n.fn, n.d.code)
+    s1 = eng.apply(_snap(NY_AU=3010.0, LDN_AU=3000.0, SGE_AUTD=700.0))
+    assert sorted(calls) == ["T_DBL", "T_HALF", "T_SPREAD"]
+    assert s1.price("测倍") == pytest.approx(20.0) and s1.price("测半") == pytest.approx(350.0)
+    calls.clear()
+    s2 = eng.apply(_snap(NY_AU=3010.0, LDN_AU=3000.0, SGE_AUTD=702.0))
+    assert calls == ["T_HALF"]
+    assert s2.price("测倍") == pytest.approx(20.0)                    # 没重算的行用缓存值补上
+    calls.clear()
+    eng.apply(_snap(NY_AU=3020.0, LDN_AU=3000.0, SGE_AUTD=702.0))
+    assert calls == ["T_SPREAD", "T_DBL"]
+    calls.clear()
+    eng.apply(_snap(NY_AU=3020.0, LDN_AU=3000.0, SGE_AUTD=702.0))
+    assert calls == []
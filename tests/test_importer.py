@@ -0,0 +1,17 @@
+# tests/test_importer.py
+from core import importer
+
+
+def test_ascii_header_gbk_body(tmp_path):
+    """表头和前面几千行是 ASCII、后面出现 GBK：sniff 判成 utf-8，parse 读到 GBK 时应换编码重读，而不是抛 UnicodeDecodeError。"""
+    path = tmp_path / "mixed.csv"
+    rows = ["ts,side,grams,price,fee"]
+    rows += [f"2024-05-06 10:00:{k % 60:02d},BUY,1,500,0" for k in range(2000)]
+    rows += ["2024-05-07 10:00:00,卖出,1,510,0.5"]
+    path.write_bytes(("\r\n".join(rows) + "\r\n").encode("gbk"))
+    m = importer.ColumnMap("ts", "side", "grams", "price", fee="fee")
+    enc, _header = importer.sniff(str(path))
+    assert enc == "utf-8-sig"
+    res = importer.parse(str(path), m, enc)
+    assert len(res.txns) == 2001 and not res.errors
+    assert res.txns[-1]["side"] == "SELL"
@@ -0,0 +1,59 @@
+# tests/test_indicators.py
+import random
+
+import pytest
+
+from core import indicators as ind
+
+N = 3000
+
+
+def _walk(n=N, seed=7):
+    rnd = random.Random(seed)
+    px, x = [], 3000.0
+    for _ in range(n):
+        x *= 1.0 + rnd.gauss(0.0, 0.002)
+        px.append(x)
+    return px
+
+
+def _close(a, b, tol=1e-9):
+    assert len(a) == len(b)
+    for i, (x, y) in enumerate(zip(a, b)):
+        if x != x or y != y:
+            assert x != x and y != y, i
+        else:
+            assert abs(x - y) <= tol * max(1.0, abs(x)), (i, x, y)
+
+
+def _streamed(px):
+    ema, boll, roc, vol = ind.EMA(), ind.Bollinger(), ind.ROC(), ind.Volatility()
+    out = {"ema": [], "lo": [], "mid": [], "hi": [], "roc": [], "vol": []}
+    for x in px:
+        out["ema"].append(ema.update(x))
+        lo, mid, hi = boll.update(x)
+        out["lo"].append(lo); out["mid"].append(mid); out["hi"].append(hi)
+        out["roc"].append(roc.update(x))
+        out["vol"].append(vol.update(x))
+    return out
+
+
+def _check(px):
+    s = _streamed(px)
+    _close(s["ema"], ind.ema_batch(px))
+    lo, mid, hi = ind.bollinger_batch(px)
+    _close(s["lo"], lo); _close(s["mid"], mid); _close(s["hi"], hi)
+    _close(s["roc"], ind.roc_batch(px))
+    _close(s["vol"], ind.volatility_batch(px))
+
+
+def test_batch_matches_streaming_numpy():
+    pytest.importorskip("numpy")
+    _check(_walk())
+
+
+def test_batch_falls_back_without_numpy(monkeypatch):
+    monkeypatch.setattr(ind, "np", None)
+    px = _walk(500)
+    _check(px)
+    assert len(ind.rolling_std_batch(px, 20)) == len(px)
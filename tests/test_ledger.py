@@ -0,0 +1,85 @@
+# tests/test_ledger.py
+import random
+
+import pytest
+
+from core import ledger as lg
+from core.ledger import Ledger
+
+
+def _txns(n=2000, seed=3):
+    rnd = random.Random(seed)
+    out, g = [], 0.0
+    for k in range(n):
+        ts = f"2025-01-01 00:{k // 60:02d}:{k % 60:02d}"
+        r = rnd.random()
+        if r < 0.02:
+            g = rnd.choice((0.0, rnd.uniform(1, 50)))
+            out.append({"ts": ts, "side": "ADJ", "post_grams": g, "post_avg": rnd.uniform(400, 700)})
+        elif r < 0.5 or g <= 0:
+            q = rnd.uniform(0.1, 10)
+            g += q
+            out.append({"ts": ts, "side": "BUY", "grams": q, "price": rnd.uniform(400, 700), "fee_amt": rnd.uniform(0, 2)})
+        else:
+            q = g if rnd.random() < 0.1 else rnd.uniform(0, g)      # 时不时卖光
+            g -= q
+            out.append({"ts": ts, "side": "SELL", "grams": q, "price": rnd.uniform(400, 700), "fee_amt": rnd.uniform(0, 2)})
+    return out
+
+
+def _cols(txns):
+    led = Ledger([], (0.0, 0.0))
+    led.extend(txns)
+    return led._cols
+
+
+def test_replay_np_matches_py():
+    pytest.importorskip("numpy")
+    cols = _cols(_txns())
+    state = (5.0, 2500.0, 0.0, 0.0)
+    fast, slow = lg._replay_np(cols, state), lg._replay_py(cols, state)
+    for a, b in zip(fast, slow):
+        assert len(a) == len(b)
+        for x, y in zip(a, b):
+            assert x == pytest.approx(y, rel=1e-9, abs=1e-6)
+
+
+def _buy(ts, q, px=500.0):
+    return {"ts": ts, "side": "BUY", "grams": q, "price": px, "fee_amt": 0.0}
+
+
+def _sell(ts, q, px=520.0):
+    return {"ts": ts, "side": "SELL", "grams": q, "price": px, "fee_amt": 0.0}
+
+
+def test_edit_and_delete_roll_back_on_new_oversell():
+    txns = [_buy("01", 10), _sell("02", 4), _sell("03", 5)]
+    led = Ledger(txns, (0.0, 0.0))
+    assert not led.edit(1, _sell("02", 8))              # 第 3 笔会超卖
+    assert list(led.grams) == [10, 6, 1]
+    assert not led.delete(0)
+    assert list(led.grams) == [10, 6, 1]
+    assert led.edit(1, _sell("02", 5))
+    assert list(led.grams) == [10, 5, 0]
+    assert led.delete(2)
+    assert list(led.grams) == [10, 5]
+
+
+def test_legacy_oversell_does_not_block_later_changes():
+    txns = [_buy("01", 1), _sell("02", 3), _buy("03", 10), _sell("04", 2)]
+    led = Ledger(txns, (0.0, 0.0))
+    assert led.bad == 1
+    assert led.edit(3, _sell("04", 4))
+    assert not led.edit(2, _buy("03", 5))               # 第 4 笔会新出现超卖
+    assert led.delete(3)
+    assert led.extend([_sell("05", 20)]) == 0           # 旧超卖行不掩盖导入部分的超卖
+    assert len(led) == 3
+
+
+def test_edit_moves_row_by_time():
+    txns = [_buy("01", 10), _sell("02", 4), _buy("03", 2)]
+    led = Ledger(txns, (0.0, 0.0))
+    assert not led.edit(0, _buy("04", 10), 2)           # 挪到最后：第一笔卖出超卖
+    assert list(led.grams) == [10, 6, 8]
+    assert led.edit(2, _buy("00", 2), 0)
+    assert list(led.grams) == [2, 12, 8]
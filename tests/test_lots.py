@@ -0,0 +1,54 @@
+# tests/test_lots.py
+import json
+
+import pytest
+
+from core import store
+from core.lots import LotBook
+
+OPENING = (2.0, 400.0)
+
+
+def _txns(sell_lots=None):
+    sell = {"id": "s1", "ts": "2025-01-03", "side": "SELL", "grams": 4.0, "price": 700.0, "fee_amt": 4.0}
+    if sell_lots:
+        sell["lots"] = sell_lots
+    return [{"id": "t1", "ts": "2025-01-01", "side": "BUY", "grams": 3.0, "price": 500.0, "fee_amt": 3.0},   # 501/g
+            {"id": "t2", "ts": "2025-01-02", "side": "BUY", "grams": 5.0, "price": 600.0, "fee_amt": 5.0},   # 601/g
+            sell]
+
+
+@pytest.mark.parametrize("method, lots, realized, basis", [
+    ("FIFO", None, 2800 - (2 * 400 + 2 * 501) - 4, 1 * 501 + 5 * 601),          # 期初 2 g + t1 的 2 g
+    ("LIFO", None, 2800 - 4 * 601 - 4, 2 * 400 + 3 * 501 + 1 * 601),             # t2 的 4 g
+    ("SPEC", [["t2", 3.0]], 2800 - (3 * 601 + 400) - 4, 1 * 400 + 3 * 501 + 2 * 601),   # 指定 3 g，余下 1 g 先进先出
+])
+def test_realized_with_partial_fills_and_fees(method, lots, realized, basis):
+    book = LotBook(_txns(lots), OPENING, method)
+    assert book.realized == pytest.approx(realized)
+    assert book.basis == pytest.approx(basis)
+    assert book.grams == pytest.approx(6.0)
+
+
+def test_apply_matches_rebuild():
+    txns = _txns([["t1", 1.0], ["open", 1.0]])
+    book = LotBook([], OPENING, "SPEC")
+    for t in txns:
+        book.apply(t)
+    assert book.summary() == LotBook(txns, OPENING, "SPEC").summary()
+
+
+def test_legacy_spec_sell_by_index_survives_migration(data_dir):
+    legacy = [{k: v for k, v in t.items() if k != "id"} for t in _txns([["#1", 3.0]])]
+    st = {"portfolios": [{"pid": "p1", "name": "旧仓", "grams": 6.0, "cost_per_g": 500.0,
+                          "opening": list(OPENING), "txns": legacy}]}
+    (data_dir / store.STORE_FILE).write_text(json.dumps(st, ensure_ascii=False), encoding="utf-8")
+    store.load()
+    txns = store.read_txns("p1")
+    assert all(t.get("id") for t in txns)
+    assert txns[2]["lots"] == [[txns[1]["id"], 3.0]]        # "#1" 换成第 2 笔买入的 id
+    book = LotBook(txns, OPENING, "SPEC")
+    assert book.realized == pytest.approx(2800 - (3 * 601 + 400) - 4)
+    store.shard("p1").close()
+    store._shards.clear()
+    assert store.read_txns("p1") == txns                    # id 已落盘，重读不变
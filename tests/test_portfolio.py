@@ -0,0 +1,53 @@
+# tests/test_portfolio.py
+import pytest
+
+from core.portfolio import PortfolioBook
+from core.prices import QuoteSnapshot
+
+
+def _snap(**px) -> QuoteSnapshot:
+    return QuoteSnapshot.parse([f"{code},{v}" for code, v in px.items()])
+
+
+def _book():
+    ps = [{"pid": "a", "name": "A", "instrument": "SGE_AUTD", "grams": 10.0, "cost_per_g": 500.0},
+          {"pid": "b", "name": "B", "instrument": "SGE_AUTD", "grams": 5.0, "cost_per_g": 520.0},
+          {"pid": "c", "name": "C", "instrument": "JD_AGTD", "grams": 0.0, "cost_per_g": 0.0}]
+    return PortfolioBook(ps), ps
+
+
+def _agg(book, code):
+    a = book._aggs[code]
+    return a.grams, a.cost, a.count
+
+
+def test_buy_sell_set_position_rebind_keep_aggregates():
+    book, ps = _book()
+    assert _agg(book, "SGE_AUTD") == (15.0, 7600.0, 2)
+    assert book.buy("a", 10.0, 600.0, fee_amt=10.0) == (20.0, pytest.approx(550.5))
+    assert _agg(book, "SGE_AUTD")[:2] == (25.0, pytest.approx(13610.0))
+    assert book.sell("b", 5.0) == (0.0, 0.0)
+    assert ps[1]["grams"] == 0.0 and ps[1]["cost_per_g"] == 0.0
+    with pytest.raises(ValueError):
+        book.sell("a", 100.0)
+    book.set_position("c", 2.0, 8.0)
+    assert _agg(book, "JD_AGTD") == (2.0, 16.0, 1)
+    book.rebind("a", "JD_AGTD")
+    assert ps[0]["instrument"] == "JD_AGTD"
+    assert _agg(book, "SGE_AUTD") == (0.0, pytest.approx(0.0), 1)
+    assert _agg(book, "JD_AGTD")[:2] == (22.0, pytest.approx(11026.0))
+    assert book.codes() == ["SGE_AUTD", "JD_AGTD"]
+
+
+def test_valuate_cached_until_version_changes():
+    book, _ps = _book()
+    snap = _snap(SGE_AUTD=550.0, JD_AGTD=8.0)
+    v1 = book.valuate(snap)
+    assert v1.total_pnl == pytest.approx(10 * 50.0 + 5 * 30.0)
+    assert book.valuate(snap) is v1                     # 同一快照、持仓没变：复用
+    book.set_position("b", 5.0, 540.0)
+    v2 = book.valuate(snap)
+    assert v2 is not v1
+    assert v2.total_pnl == pytest.approx(10 * 50.0 + 5 * 10.0)
+    assert book.valuate(_snap(SGE_AUTD=560.0)).total_pnl == pytest.approx(10 * 60.0 + 5 * 20.0)
+    assert book.valuate(_snap(JD_AGTD=8.0)).total_pnl is None      # 有持仓的品种没价
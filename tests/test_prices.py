@@ -0,0 +1,81 @@
+# tests/test_prices.py
+import time
+
+import pytest
+
+from core.prices import CircuitBreaker, FetchState, QuoteFeed, QuoteSnapshot
+
+
+class _Wake:
+    def __init__(self):
+        self.waited = None
+
+    def clear(self):
+        pass
+
+    def wait(self, timeout):
+        self.waited = timeout
+
+
+def test_closed_market_wait_capped_at_stream_retry():
+    feed = QuoteFeed(persist=False)
+    feed._watch = ("SGE_AUTD",)
+    feed.scheduler.next_delay = lambda watch, now: 300.0          # 休市：下一次轮询在 5 分钟后
+    feed._wake = _Wake()
+    t0 = time.time()
+    feed._wait_next(t0, t0 + 20.0)
+    assert feed._wake.waited == pytest.approx(20.0, abs=0.5)
+    feed._wait_next(t0)
+    assert feed._wake.waited == pytest.approx(300.0, abs=0.5)
+
+
+def test_merged_reuses_index_without_new_names():
+    base = QuoteSnapshot.parse(["LDN_AU,3100", "NY_AU,3110"], ts=1.0)
+    same = base.merged(["NY_AU,3120", "bad line"], ts=2.0)
+    assert same.index is base.index and same.names is base.names
+    assert same.price("NY_AU") == 3120.0 and base.price("NY_AU") == 3110.0    # 原快照不变
+    grown = base.merged(["LDN_AG,38.5", "LDN_AU,3101"], ts=3.0)
+    assert grown.index is not base.index
+    assert grown.names == ("LDN_AU", "NY_AU", "LDN_AG")
+    assert grown.price("LDN_AG") == 38.5 and grown.price("LDN_AU") == 3101.0
+    assert grown.ts == 3.0
+
+
+class _Fetcher:
+    def __init__(self, *results):
+        self.results = list(results)
+
+    def fetch(self, s, st, deadline):
+        return self.results.pop(0)
+
+
+def test_empty_200_counts_as_success():
+    feed = QuoteFeed(persist=False)
+    feed.breaker = CircuitBreaker(fail_threshold=2)
+    feed.fetcher = _Fetcher((0, [], False), (200, [], False), (0, [], False), (200, [], True))
+    st = FetchState()
+    for want in (1, 0, 1, 0):                           # 两次失败之间隔着空 200，熔断器不打开
+        feed._poll_once(None, st)
+        assert feed.breaker.failures == want
+        assert feed.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_open_half_open_closed_with_doubling():
+    b = CircuitBreaker(fail_threshold=2, reset_s=10.0, max_reset_s=30.0)
+    b.record(False, "x", now=0.0)
+    assert b.state == b.CLOSED and b.allow(now=0.0)
+    b.record(False, "x", now=1.0)
+    assert b.state == b.OPEN and not b.allow(now=5.0)
+    assert b.retry_in(now=5.0) == pytest.approx(6.0)
+    assert b.allow(now=11.0) and b.state == b.HALF_OPEN
+    assert not b.allow(now=11.0)                        # 半开只放行一个探测
+    b.record(False, "x", now=11.0)                      # 探测失败：冷却翻倍
+    assert b.state == b.OPEN and b.retry_in(now=11.0) == pytest.approx(20.0)
+    assert b.allow(now=31.0)
+    b.record(False, "x", now=31.0)
+    assert b.retry_in(now=31.0) == pytest.approx(30.0)   # 封顶 max_reset_s
+    assert b.allow(now=61.0)
+    b.record(True, now=61.0)
+    assert b.state == b.CLOSED and b.failures == 0 and b.last_error == ""
+    b.record(False, "x", now=62.0); b.record(False, "x", now=63.0)
+    assert b.retry_in(now=63.0) == pytest.approx(10.0)   # 闭合后冷却回到 reset_s
@@ -0,0 +1,40 @@
+# tests/test_sessions.py
+import datetime as _dt
+
+from core import sessions
+
+
+def _cn(*args) -> float:
+    return _dt.datetime(*args, tzinfo=_dt.timezone(_dt.timedelta(hours=8))).timestamp()
+
+
+def _et_winter(*args) -> float:
+    return _dt.datetime(*args, tzinfo=_dt.timezone(_dt.timedelta(hours=-5))).timestamp()
+
+
+def test_spring_festival_closed():
+    assert sessions.is_open("SGE", _cn(2026, 2, 12, 10, 0))           # 节前最后一个交易日
+    assert not sessions.is_open("SGE", _cn(2026, 2, 18, 10, 0))       # 春节
+    assert not sessions.is_open("CFETS", _cn(2026, 10, 5, 10, 0))     # 国庆
+
+
+def test_no_sge_night_session_before_holiday():
+    assert sessions.is_open("SGE", _cn(2026, 2, 11, 21, 0))           # 平常夜盘
+    assert not sessions.is_open("SGE", _cn(2026, 2, 13, 21, 0))       # 长假前不开夜盘
+    assert sessions.next_open("SGE", _cn(2026, 2, 13, 21, 0)) == _cn(2026, 2, 24, 9, 0)
+
+
+def test_comex_christmas_closed():
+    assert not sessions.is_open("COMEX", _et_winter(2026, 12, 25, 12, 0))
+    assert sessions.is_open("COMEX", _et_winter(2026, 12, 28, 12, 0))
+
+
+def test_scheduler_slow_through_holiday():
+    s = sessions.PollScheduler(fast=1.0, slow=300.0)
+    assert s.next_delay(["SGE_AUTD"], _cn(2026, 2, 18, 10, 0)) == 300.0
+
+
+def test_unknown_market_has_no_session_but_counts_as_open():
+    ts = _cn(2026, 2, 18, 10, 0)
+    assert sessions.session_at("NOPE", ts) is None
+    assert sessions.is_open("NOPE", ts)
@@ -0,0 +1,106 @@
+# tests/test_store.py
+import json
+import os
+import threading
+
+from core import store
+
+
+def _t(tid, ts, side="BUY", grams=1.0):
+    return {"id": tid, "ts": ts, "side": side, "grams": grams, "price": 500.0,
+            "fee_rate": 0.0, "fee_amt": 0.0, "post_grams": 0.0, "post_avg": 0.0}
+
+
+def test_move_and_post_replay_from_shard(data_dir):
+    p = {"pid": "p1", "txns": []}
+    for k, ts in enumerate(("01", "02", "03")):
+        store.append_txn(p, _t(f"t{k}", ts))
+    adj = dict(_t("adj", "04", "ADJ"), post_grams=7.0, post_avg=510.0)
+    store.append_txn(p, adj)
+    store.edit_txn(p, 0, _t("t0", "05"))
+    store.move_txn(p, 0, 3)
+    store.set_posts(p, 0, [(1.0, 500.0), (2.0, 500.0), (3.0, 500.0), (4.0, 500.0)])
+    store.shard("p1").sync()
+    got = store.read_txns("p1")
+    assert got == p["txns"]
+    assert [t["id"] for t in got] == ["t1", "t2", "adj", "t0"]
+    assert [t["post_grams"] for t in got] == [1.0, 2.0, 7.0, 4.0]     # ADJ 的校正目标不被覆盖
+
+
+def _write_lines(path, recs, tail=""):
+    with open(path, "w", encoding="utf-8") as f:
+        for r in recs:
+            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+        f.write(tail)
+
+
+def test_migrate_schema1_round_trip(data_dir):
+    inline = [_t("a0", "01"), _t("a1", "02")]
+    st = {"portfolios": [{"pid": "pa", "name": "内联", "grams": 2.0, "cost_per_g": 500.0, "txns": inline},
+                         {"pid": "pb", "name": "快照", "grams": 3.0, "cost_per_g": 500.0}],
+          "active_index": 1, "display_quotes": ["SGE_AUTD", "LDN_AU"], "minimal_mode": True}
+    (data_dir / store.STORE_FILE).write_text(json.dumps(st, ensure_ascii=False), encoding="utf-8")
+    (data_dir / store.LEGACY_TXNS).write_text(json.dumps({"seq": 2, "txns": {"pb": [_t("b0", "01")]}}), encoding="utf-8")
+    _write_lines(data_dir / store.LEGACY_LOG, [
+        {"seq": 2, "op": "add", "pid": "pb", "txn": _t("old", "00")},         # 快照里已有，跳过
+        {"seq": 3, "op": "add", "pid": "pb", "txn": _t("b1", "02")},
+        {"seq": 4, "op": "add", "pid": "pb", "txn": _t("b2", "03")},
+    ])
+    got = store.load()
+    assert got["schema"] == store.SCHEMA
+    assert [p["pid"] for p in got["portfolios"]] == ["pa", "pb"]
+    assert all("txns" not in p for p in got["portfolios"])
+    assert got["minimal_mode"] is True and got["active_index"] == 1
+    for name in (store.LEGACY_TXNS, store.LEGACY_LOG):
+        assert not (data_dir / name).exists()
+    assert store.read_txns("pa") == inline
+    assert [t["id"] for t in store.read_txns("pb")] == ["b0", "b1", "b2"]
+    assert store.load()["portfolios"] == got["portfolios"]            # 已是 schema 2，不再迁移
+
+
+def test_torn_tail_is_truncated(data_dir):
+    path = store._shard_path("p1")
+    _write_lines(path, [{"op": "add", "txn": _t("t0", "01")}, {"op": "add", "txn": _t("t1", "02")}],
+                 tail='{"op": "add", "txn": {"id": "t2", "ts"')
+    good = sum(len(json.dumps(r, ensure_ascii=False)) + 1 for r in (
+        {"op": "add", "txn": _t("t0", "01")}, {"op": "add", "txn": _t("t1", "02")}))
+    assert [t["id"] for t in store.read_txns("p1")] == ["t0", "t1"]
+    assert os.path.getsize(path) == good
+    p = {"pid": "p1"}
+    store.append_txn(p, _t("t3", "03"))                 # 截断后追加的记录接在完整行之后
+    store.shard("p1").sync()
+    assert [t["id"] for t in store.read_txns("p1")] == ["t0", "t1", "t3"]
+
+
+def _wait_rewrite():
+    for th in threading.enumerate():
+        if th.name == "shard-rewrite":
+            th.join(5)
+
+
+def test_deferred_rewrite_folds_edits(data_dir, monkeypatch):
+    monkeypatch.setattr(store, "REWRITE_AT", 3)
+    p = {"pid": "p1", "txns": []}
+    for k in range(4):
+        store.append_txn(p, _t(f"t{k}", f"0{k}"))
+    for k in range(3):
+        store.edit_txn(p, k, _t(f"t{k}", f"0{k}", grams=2.0))
+    store.delete_txn(p, 3)
+    store.shard("p1").sync()
+    want = store.read_txns("p1")
+    _wait_rewrite()
+    with open(store._shard_path("p1"), encoding="utf-8") as f:
+        recs = [json.loads(line) for line in f]
+    assert [r["op"] for r in recs] == ["add"] * 3
+    assert [r["txn"] for r in recs] == want
+
+
+def test_deferred_rewrite_skipped_after_new_append(data_dir):
+    j = store.shard("p1")
+    p = {"pid": "p1", "txns": []}
+    store.append_txn(p, _t("t0", "01"))
+    seen = j.appends
+    store.append_txn(p, _t("t1", "02"))
+    assert not j.rewrite([_t("t0", "01")], seen)         # 读入之后又追加过：快照已过时，不整写
+    j.sync()
+    assert [t["id"] for t in store.read_txns("p1")] == ["t0", "t1"]
@@ -0,0 +1,29 @@
+# tests/test_ticks.py
+from core.ticks import TickRing
+
+
+def _ring(n, cap=8):
+    r = TickRing(cap)
+    for k in range(n):
+        r.append(float(k), 100.0 + k)
+    return r
+
+
+def test_wraparound_keeps_latest_in_order():
+    r = _ring(20)
+    assert len(r) == 8
+    ts, px = r.window()
+    assert list(ts) == [float(k) for k in range(12, 20)]
+    assert list(px) == [100.0 + k for k in range(12, 20)]
+    assert r.first() == (12.0, 112.0) and r.last() == (19.0, 119.0)
+    assert list(r.window(3)[0]) == [17.0, 18.0, 19.0]
+    assert [t for t, _ in r] == list(ts)
+
+
+def test_since_bisects_across_the_seam():
+    r = _ring(13)                                   # head 在 5，最旧的在环尾
+    for t0, want in ((0.0, 5), (5.0, 5), (6.5, 7), (9.0, 9), (12.0, 12), (12.5, None)):
+        ts, _px = r.since(t0)
+        assert list(ts) == ([] if want is None else [float(k) for k in range(want, 13)]), t0
+    assert list(_ring(3).since(1.0)[0]) == [1.0, 2.0]             # 未写满
+    assert list(TickRing(4).since(0.0)[0]) == []
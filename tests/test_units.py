@@ -0,0 +1,28 @@
+# tests/test_units.py
+import pytest
+
+from core.prices import QuoteSnapshot
+from core.units import GRAMS, UnitConverter
+
+
+def _snap(**px) -> QuoteSnapshot:
+    return QuoteSnapshot.parse([f"{code},{v}" for code, v in px.items()])
+
+
+def test_usd_oz_to_cny_g_and_cny_g_to_cny_kg():
+    conv = UnitConverter({"LDN_AU": "CNY/g", "SGE_AUTD": "CNY/kg"})
+    snap = _snap(LDN_AU=3100.0, SGE_AUTD=700.0, USDCNY=7.2, NY_AU=3110.0)
+    assert conv.value(snap, "LDN_AU") == pytest.approx(3100.0 * 7.2 / GRAMS["oz"])
+    assert conv.value(snap, "SGE_AUTD") == pytest.approx(700.0 * 1000.0)
+    assert conv.value(snap, "NY_AU") == pytest.approx(3110.0)          # 没有覆盖的原样返回
+    assert conv.unit_label("LDN_AU") == "元/克"
+    assert conv.unit_label("SGE_AUTD") == "元/千克"
+    assert conv.unit_label("NY_AU") == "美元/盎司"
+
+
+def test_factors_follow_fx_tick():
+    conv = UnitConverter({"LDN_AU": "CNY/g"})
+    a = conv.value(_snap(LDN_AU=3100.0, USDCNY=7.2), "LDN_AU")
+    b = conv.value(_snap(LDN_AU=3100.0, USDCNY=7.0), "LDN_AU")
+    assert b == pytest.approx(a * 7.0 / 7.2)
+    assert conv.value(_snap(LDN_AU=3100.0), "LDN_AU") is None          # 没有汇率无法换算
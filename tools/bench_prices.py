@@ -0,0 +1,144 @@
+# tools/bench_prices.py
+# 价格客户端压测：在本地模拟服务上测取数 + 解析的延迟分位、吞吐、重试放大与内存分配
+# 用法：python -m tools.bench_prices --count 200 --requests 300 --threads 4 --latency 0.02 --jitter 0.01 --err-5xx 0.05
+# 指定 --server 时不启动模拟服务，直接压测该地址。
+# 对冲请求：--replicas 2 --hedge-delay 0.05 启动两个模拟上游；--hedge-delay 0 表示只用主上游（对照组）。
+import argparse, gc, threading, time, tracemalloc
+from typing import List, Optional
+
+from core import prices
+from tools.mock_server import serve, add_fault_args, faults_from_args
+
+
+def percentile(sorted_vals: List[float], q: float) -> float:
+    if not sorted_vals:
+        return float("nan")
+    k = (len(sorted_vals) - 1) * q
+    lo = int(k); hi = min(lo + 1, len(sorted_vals) - 1)
+    return sorted_vals[lo] + (sorted_vals[hi] - sorted_vals[lo]) * (k - lo)
+
+
+def fetch_and_parse(s, st: Optional[prices.FetchState], fetcher: Optional[prices.HedgedFetcher] = None):
+    if fetcher is not None:
+        code, lines, _ = fetcher.fetch(s, st)
+    else:
+        code, lines, _ = prices._fetch_lines(s, st)
+    snap = prices.QuoteSnapshot.parse(lines) if lines else None
+    return code, snap
+
+
+def run_latency(n: int, threads: int, conditional: bool,
+                fetcher: Optional[prices.HedgedFetcher] = None) -> dict:
+    """threads 个线程各持一个 Session，共发 n 次取数；记录每次取数 + 解析耗时。"""
+    lat: List[float] = []
+    fails = [0]
+    lock = threading.Lock()
+    per = [n // threads + (1 if i < n % threads else 0) for i in range(threads)]
+
+    def worker(k: int):
+        s = prices._build_session()
+        st = prices.FetchState() if conditional else None
+        mine, bad = [], 0
+        try:
+            for _ in range(k):
+                t0 = time.perf_counter()
+                code, snap = fetch_and_parse(s, st, fetcher)
+                mine.append(time.perf_counter() - t0)
+                if code not in (200, 304) or (code == 200 and not snap):
+                    bad += 1
+        finally:
+            s.close()
+        with lock:
+            lat.extend(mine); fails[0] += bad
+
+    ts = [threading.Thread(target=worker, args=(k,), daemon=True) for k in per]
+    t0 = time.perf_counter()
+    for t in ts: t.start()
+    for t in ts: t.join()
+    wall = time.perf_counter() - t0
+    lat.sort()
+    return {"calls": n, "fails": fails[0], "wall_s": wall, "lat": lat}
+
+
+def run_alloc(n: int) -> dict:
+    """单线程 n 次取数 + 解析的内存开销：单次峰值、常驻增长（泄漏）、GC 0 代回收次数。"""
+    s = prices._build_session()
+    try:
+        fetch_and_parse(s, None)                 # 预热连接
+        gc.collect()
+        gen0 = gc.get_stats()[0]["collections"]
+        tracemalloc.start()
+        base, _ = tracemalloc.get_traced_memory()
+        peak = 0
+        for _ in range(n):
+            tracemalloc.reset_peak()
+            fetch_and_parse(s, None)
+            _, p = tracemalloc.get_traced_memory()
+            peak = max(peak, p - base)
+        gc.collect()
+        cur, _ = tracemalloc.get_traced_memory()
+        blocks = sum(st.count for st in tracemalloc.take_snapshot().statistics("filename"))
+        tracemalloc.stop()
+        return {"peak_kib": peak / 1024.0, "retained_kib": (cur - base) / 1024.0,
+                "live_blocks": blocks, "gc0": gc.get_stats()[0]["collections"] - gen0}
+    finally:
+        s.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="价格客户端压测")
+    ap.add_argument("--server", default=None, help="压测已有服务地址（不启动模拟服务）")
+    ap.add_argument("--count", type=int, default=200, help="模拟品种数量")
+    ap.add_argument("--tick", type=float, default=0.5, help="模拟行情变动间隔（秒）")
+    ap.add_argument("--requests", type=int, default=300, help="总取数次数")
+    ap.add_argument("--threads", type=int, default=1, help="并发线程数（各自一个 Session）")
+    ap.add_argument("--alloc", type=int, default=50, help="内存测量的取数次数，0 跳过")
+    ap.add_argument("--conditional", action="store_true", help="启用 ETag 条件请求")
+    ap.add_argument("--replicas", type=int, default=1, help="模拟上游副本数（各自独立的延迟抖动）")
+    ap.add_argument("--hedge-delay", type=float, default=prices.HEDGE_DELAY_S,
+                    help="对冲补发延迟（秒），0 表示不对冲")
+    add_fault_args(ap)
+    args = ap.parse_args()
+
+    srvs = []
+    if args.server:
+        urls = [u.strip() for u in args.server.split(",") if u.strip()]
+    else:
+        for i in range(max(1, args.replicas)):
+            srvs.append(serve(count=args.count, tick_s=args.tick, seed=1,
+                              faults=faults_from_args(args, seed=100 + i)))
+        urls = [x.url for x in srvs]
+    prices.SERVER_URL = urls[0]
+    prices.CONDITIONAL = args.conditional
+    fetcher = None
+    if len(urls) > 1:
+        fetcher = prices.HedgedFetcher(urls if args.hedge_delay > 0 else urls[:1], args.hedge_delay)
+
+    try:
+        r = run_latency(args.requests, args.threads, args.conditional, fetcher)
+        lat = r["lat"]
+        ms = lambda q: percentile(lat, q) * 1000.0
+        print(f"calls={r['calls']} fails={r['fails']} threads={args.threads} wall={r['wall_s']:.2f}s "
+              f"throughput={r['calls'] / r['wall_s']:.1f}/s")
+        print(f"latency ms: p50={ms(0.50):.2f} p95={ms(0.95):.2f} p99={ms(0.99):.2f} max={ms(1.0):.2f}")
+        if srvs:
+            total = 0
+            for i, x in enumerate(srvs):
+                st = x.stats.snapshot(); total += st["requests"]
+                print(f"server[{i}]: requests={st['requests']} bytes={st['bytes_out']} status={st['status']}")
+            print(f"retry_amplification={total / max(1, r['calls']):.2f}x")
+        if fetcher is not None:
+            eps = ", ".join(f"{e.url} ewma={e.ewma * 1000:.1f}ms" for e in fetcher.endpoints)
+            print(f"hedges={fetcher.hedges}  {eps}")
+            fetcher.close()
+        if args.alloc > 0:
+            a = run_alloc(args.alloc)
+            print(f"alloc: peak/fetch={a['peak_kib']:.1f}KiB retained={a['retained_kib']:.1f}KiB "
+                  f"live_blocks={a['live_blocks']} gc0_collections={a['gc0']}")
+    finally:
+        for x in srvs:
+            x.stop()
+
+
+if __name__ == "__main__":
+    main()
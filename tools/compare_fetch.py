@@ -0,0 +1,57 @@
+# tools/compare_fetch.py
+# 对比三种取数方式在模拟服务上的流量与解析耗时：全量 / ETag 条件请求 / ETag + 增量
+# 用法：python -m tools.compare_fetch --count 200 --polls 60 --interval 0.2 --tick 2.0
+import argparse, time
+
+from core import prices
+from tools.mock_server import serve
+
+MODES = (
+    ("full",  False, False),
+    ("etag",  True,  False),
+    ("delta", True,  True),
+)
+
+
+def run_mode(name: str, conditional: bool, delta: bool, args) -> dict:
+    srv = serve(count=args.count, tick_s=args.tick, change_ratio=args.change_ratio, seed=1)
+    prices.SERVER_URL = srv.url
+    prices.CONDITIONAL = conditional
+    prices.DELTA_MODE = delta
+    s = prices._build_session()
+    st = prices.FetchState()
+    snap = prices.EMPTY_SNAPSHOT
+    parse_s = 0.0
+    try:
+        for _ in range(args.polls):
+            code, lines, is_delta = prices._fetch_lines(s, st)
+            t0 = time.perf_counter()
+            if code == 304:
+                snap = snap.touched()
+            elif lines:
+                snap = snap.merged(lines) if (is_delta and snap) else prices.QuoteSnapshot.parse(lines)
+            parse_s += time.perf_counter() - t0
+            time.sleep(args.interval)
+    finally:
+        s.close()
+        srv.stop()
+    out = srv.stats.snapshot()
+    out.update({"mode": name, "parse_ms": parse_s * 1000.0, "instruments": len(snap)})
+    return out
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="对比全量 / 条件 / 增量取数")
+    ap.add_argument("--count", type=int, default=200)
+    ap.add_argument("--polls", type=int, default=60)
+    ap.add_argument("--interval", type=float, default=0.2, help="客户端轮询间隔（秒）")
+    ap.add_argument("--tick", type=float, default=2.0, help="模拟行情变动间隔（秒），0 表示休市")
+    ap.add_argument("--change-ratio", type=float, default=0.05)
+    args = ap.parse_args()
+
+    print(f"{'mode':<6} {'req':>5} {'200':>5} {'304':>5} {'bytes':>10} {'parse(ms)':>10}")
+    for name, cond, delta in MODES:
+        r = run_mode(name, cond, delta, args)
+        st = r["status"]
+        print(f"{r['mode']:<6} {r['requests']:>5} {st.get(200, 0):>5} {st.get(304, 0):>5} "
+              f"{r['bytes_out']:>10} {r['parse_ms']:>10.2f}")
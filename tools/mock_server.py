@@ -0,0 +1,286 @@
+# tools/mock_server.py
+# 本地模拟 /api/v1/lines 与 /api/v1/stream（SSE）：离线调试客户端、对比取数开销
+# 用法：python -m tools.mock_server --port 8765 --count 11 --tick 1.0 --latency 0.05 --err-5xx 0.02
+import argparse, json, random, threading, time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+BASE_LINES = (
+    ("伦敦金（现货黄金）", 2400.0),
+    ("纽约黄金",           2410.0),
+    ("黄金延期",           560.0),
+    ("黄金T+D(JD)",        560.0),
+    ("白银T+D(JD)",        7400.0),
+    ("浙商银行积存金(JD)", 562.0),
+    ("伦敦银（现货白银）", 29.0),
+    ("纽约白银",           29.2),
+    ("美元人民币",         7.2),
+)
+
+
+class MockMarket:
+    """模拟行情：count 个品种随机游走，每次 tick 随机改动 change_ratio 比例的品种。"""
+    def __init__(self, count: int = 11, change_ratio: float = 0.2, seed: Optional[int] = None):
+        self._rnd = random.Random(seed)
+        self.names: List[str] = []
+        self.prices: List[float] = []
+        for i in range(count):
+            if i < len(BASE_LINES):
+                n, p = BASE_LINES[i]
+            else:
+                n, p = f"模拟品种{i:04d}", 100.0 + i
+            self.names.append(n); self.prices.append(p)
+        self.change_ratio = change_ratio
+        self.seq = 1
+        self.changed_at = [1] * count      # 每个品种最后一次变动时的 seq
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def tick(self):
+        with self._lock:
+            k = max(1, int(len(self.names) * self.change_ratio))
+            self.seq += 1
+            for i in self._rnd.sample(range(len(self.names)), min(k, len(self.names))):
+                self.prices[i] = round(self.prices[i] * (1 + self._rnd.gauss(0, 0.0005)), 2)
+                self.changed_at[i] = self.seq
+            self._changed.notify_all()
+
+    def wait_change(self, seq: int, timeout: float) -> bool:
+        with self._changed:
+            return self._changed.wait_for(lambda: self.seq > seq, timeout)
+
+    def full(self) -> Tuple[int, List[str]]:
+        with self._lock:
+            return self.seq, [f"{n},{p:.2f}" for n, p in zip(self.names, self.prices)]
+
+    def since(self, seq: int) -> Tuple[int, List[str]]:
+        with self._lock:
+            return self.seq, [f"{n},{p:.2f}" for n, p, c in zip(self.names, self.prices, self.changed_at)
+                              if c > seq]
+
+
+class Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.bytes_out = 0
+        self.status = {}
+
+    def add(self, code: int, nbytes: int):
+        with self._lock:
+            self.requests += 1
+            self.bytes_out += nbytes
+            self.status[code] = self.status.get(code, 0) + 1
+
+    def add_bytes(self, nbytes: int):
+        with self._lock:
+            self.bytes_out += nbytes
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"requests": self.requests, "bytes_out": self.bytes_out, "status": dict(self.status)}
+
+
+class Faults:
+    """注入的延迟与错误：latency ± jitter（秒，高斯）、429 / 5xx 概率、每次响应附加的填充字节。"""
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, err_429: float = 0.0,
+                 err_5xx: float = 0.0, pad_bytes: int = 0, seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.err_429 = err_429
+        self.err_5xx = err_5xx
+        self.pad = "x" * pad_bytes
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self) -> float:
+        if self.latency <= 0 and self.jitter <= 0:
+            return 0.0
+        with self._lock:
+            return max(0.0, self._rnd.gauss(self.latency, self.jitter) if self.jitter > 0 else self.latency)
+
+    def error(self) -> int:
+        if self.err_429 <= 0 and self.err_5xx <= 0:
+            return 0
+        with self._lock:
+            x = self._rnd.random()
+            if x < self.err_429:
+                return 429
+            if x < self.err_429 + self.err_5xx:
+                return self._rnd.choice((500, 502, 503, 504))
+        return 0
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "MockServer"
+
+    def log_message(self, *_args):
+        pass
+
+    def _send(self, code: int, body: bytes = b"", headers: Optional[dict] = None):
+        self.server.stats.add(code, len(body))
+        self.send_response(code)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        u = urlparse(self.path)
+        qs = parse_qs(u.query)
+        if u.path == "/api/v1/stream":
+            return self._stream(qs)
+        if u.path != "/api/v1/lines":
+            return self._send(404)
+        faults = self.server.faults
+        d = faults.delay()
+        if d > 0:
+            time.sleep(d)
+        err = faults.error()
+        if err:
+            return self._send(err, b'{"error":"injected"}', {"Content-Type": "application/json"})
+        market = self.server.market
+        etag = f'"{market.seq}"'
+        if self.headers.get("If-None-Match") == etag:
+            return self._send(304, headers={"ETag": etag})
+        payload = {}
+        since = qs.get("since", [None])[0]
+        if since is not None and since.isdigit():
+            seq, lines = market.since(int(since))
+            payload["delta"] = True
+        else:
+            seq, lines = market.full()
+        payload.update({"seq": seq, "lines": lines})
+        if faults.pad:
+            payload["pad"] = faults.pad
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self._send(200, body, {"Content-Type": "application/json; charset=utf-8", "ETag": f'"{seq}"'})
+
+    def _stream(self, qs):
+        """SSE：首个事件为全量（或带 since / Last-Event-ID 时为增量），之后每次行情变动推一次增量。
+        服务端 stream_drop > 0 时发满该数量事件后主动断开，用于测试续传。"""
+        srv, market = self.server, self.server.market
+        since = self.headers.get("Last-Event-ID") or qs.get("since", [None])[0]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        srv.stats.add(200, 0)
+
+        def emit(payload: dict) -> int:
+            data = json.dumps(payload, ensure_ascii=False)
+            body = f"id: {payload['seq']}\nevent: lines\ndata: {data}\n\n".encode("utf-8")
+            self.wfile.write(body); self.wfile.flush()
+            srv.stats.add_bytes(len(body))
+            return payload["seq"]
+
+        sent = 0
+        try:
+            if since is not None and str(since).isdigit():
+                seq, lines = market.since(int(since))
+                last = emit({"seq": seq, "lines": lines, "delta": True})
+            else:
+                seq, lines = market.full()
+                last = emit({"seq": seq, "lines": lines})
+            sent += 1
+            while not srv.stopping:
+                if srv.stream_drop and sent >= srv.stream_drop:
+                    return
+                if market.wait_change(last, srv.heartbeat_s):
+                    seq, lines = market.since(last)
+                    last = emit({"seq": seq, "lines": lines, "delta": True})
+                    sent += 1
+                else:
+                    self.wfile.write(b": ping\n\n"); self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError, OSError):
+            return
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    request_queue_size = 128
+
+    def __init__(self, addr, market: MockMarket, tick_s: float = 1.0,
+                 heartbeat_s: float = 10.0, stream_drop: int = 0, faults: Optional[Faults] = None):
+        super().__init__(addr, _Handler)
+        self.market = market
+        self.faults = faults or Faults()
+        self.stats = Stats()
+        self.tick_s = tick_s
+        self.heartbeat_s = heartbeat_s
+        self.stream_drop = stream_drop
+        self._stop = threading.Event()
+
+    @property
+    def stopping(self) -> bool:
+        return self._stop.is_set()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _ticker(self):
+        while not self._stop.wait(self.tick_s):
+            self.market.tick()
+
+    def start(self) -> "MockServer":
+        threading.Thread(target=self.serve_forever, name="MockServer", daemon=True).start()
+        if self.tick_s > 0:
+            threading.Thread(target=self._ticker, name="MockTicker", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self.shutdown()
+        self.server_close()
+
+
+def serve(host: str = "127.0.0.1", port: int = 0, count: int = 11, tick_s: float = 1.0,
+          change_ratio: float = 0.2, seed: Optional[int] = None,
+          heartbeat_s: float = 10.0, stream_drop: int = 0, faults: Optional[Faults] = None) -> MockServer:
+    """后台启动一个模拟服务；port=0 时自动分配端口，用 .url 取地址。"""
+    return MockServer((host, port), MockMarket(count, change_ratio, seed), tick_s,
+                      heartbeat_s, stream_drop, faults).start()
+
+
+def add_fault_args(ap: argparse.ArgumentParser):
+    ap.add_argument("--latency", type=float, default=0.0, help="响应延迟均值（秒）")
+    ap.add_argument("--jitter", type=float, default=0.0, help="响应延迟标准差（秒）")
+    ap.add_argument("--err-429", type=float, default=0.0, help="返回 429 的概率")
+    ap.add_argument("--err-5xx", type=float, default=0.0, help="返回 5xx 的概率")
+    ap.add_argument("--pad-bytes", type=int, default=0, help="每次响应附加的填充字节")
+
+
+def faults_from_args(args, seed: Optional[int] = None) -> Faults:
+    return Faults(args.latency, args.jitter, args.err_429, args.err_5xx, args.pad_bytes, seed)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="GoldPriceBubble 本地模拟行情服务")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--count", type=int, default=11, help="品种数量")
+    ap.add_argument("--tick", type=float, default=1.0, help="行情变动间隔（秒），0 表示不变动")
+    ap.add_argument("--change-ratio", type=float, default=0.2, help="每次变动的品种比例")
+    ap.add_argument("--heartbeat", type=float, default=10.0, help="SSE 心跳间隔（秒）")
+    ap.add_argument("--stream-drop", type=int, default=0, help="SSE 每连接推送多少事件后断开，0 不断开")
+    add_fault_args(ap)
+    args = ap.parse_args()
+
+    srv = serve(args.host, args.port, args.count, args.tick, args.change_ratio,
+                heartbeat_s=args.heartbeat, stream_drop=args.stream_drop, faults=faults_from_args(args))
+    print(f"mock server on {srv.url}/api/v1/lines , {srv.url}/api/v1/stream  (Ctrl+C 退出)")
+    try:
+        while True:
+            time.sleep(5)
+            print("[mock]", srv.stats.snapshot())
+    except KeyboardInterrupt:
+        srv.stop()
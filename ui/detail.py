@@ -1,13 +1,27 @@
 # ui/detail.py
+import bisect
 import tkinter as tk
 from tkinter import ttk
 import tkinter.messagebox as msg
+from tkinter import filedialog
+from typing import Dict
 
 from utils.icons import set_window_icon
 from core.styles import *
 from core.resource import get_scaling
 from ui.theme import apply_tencent_theme
-from core.prices import probe_all_lines  # 仅用该接口
+from ui.txnlog import TxnLog
+from core import store, importer
+from core.portfolio import DEFAULT_CODE, BINDABLE, new_pid
+from core.ledger import Ledger, infer_opening
+from core.lots import LotBook, METHODS, METHOD_NAMES
+from core.instruments import by_code
+
+
+def _bind_choices():
+    """可绑定的计价品种：(展示名列表, 展示名 → code)。"""
+    names = [by_code(c).name for c in BINDABLE]
+    return names, dict(zip(names, BINDABLE))
 
 
 class NewPortfolioDialog:
@@ -19,7 +33,7 @@ class NewPortfolioDialog:
         self.win.title("新建仓库")
         set_window_icon(self.win)
         self.scale = get_scaling()
-        self.win.geometry(self._dpi("420x260"))
+        self.win.geometry(self._dpi("420x300"))
         self.win.attributes("-topmost", True)
         apply_tencent_theme(self.win)
 
@@ -37,6 +51,12 @@ class NewPortfolioDialog:
         ttk.Label(frm, text="成本价/克(¥)").grid(row=row, column=0, sticky="e", padx=8, pady=6)
         self.ent_cost = ttk.Entry(frm, width=28); self.ent_cost.insert(0, "0"); self.ent_cost.grid(row=row, column=1, sticky="w"); row += 1
 
+        ttk.Label(frm, text="计价品种").grid(row=row, column=0, sticky="e", padx=8, pady=6)
+        names, self._bind_map = _bind_choices()
+        self.cmb_inst = ttk.Combobox(frm, values=names, state="readonly", width=26)
+        self.cmb_inst.set(by_code(DEFAULT_CODE).name)
+        self.cmb_inst.grid(row=row, column=1, sticky="w"); row += 1
+
         btns = ttk.Frame(frm); btns.grid(row=row, column=0, columnspan=2, sticky="e", pady=(8, 0))
         ttk.Button(btns, text="取消", command=self.win.destroy).pack(side=tk.RIGHT, padx=6)
         ttk.Button(btns, text="创建", style="Primary.TButton", command=self._create).pack(side=tk.RIGHT, padx=6)
@@ -58,7 +78,9 @@ class NewPortfolioDialog:
         if grams < 0 or cost < 0:
             msg.showwarning("提示", "克数/成本需为非负"); return
 
-        p = {"name": name, "grams": grams, "cost_per_g": (cost if grams > 0 else 0.0), "txns": []}
+        p = {"pid": new_pid(), "name": name, "instrument": self._bind_map.get(self.cmb_inst.get(), DEFAULT_CODE),
+             "grams": grams, "cost_per_g": (cost if grams > 0 else 0.0),
+             "opening": [grams, (cost if grams > 0 else 0.0)], "txns": []}
         self.app.portfolios.append(p)
         if self.app.active_index is None:
             self.app.active_index = 0
@@ -67,34 +89,110 @@ class NewPortfolioDialog:
         self.win.destroy()
 
 
+class TxnEditDialog:
+    """修改一笔历史流水：买卖改时间 / 克数 / 价格 / 手续费；ADJ 改校正后的克数 / 均价。"""
+    def __init__(self, app_ref, txn: dict, on_ok):
+        self.app = app_ref
+        self.txn = txn
+        self.on_ok = on_ok
+        adj = txn.get("side") == "ADJ"
+
+        self.win = tk.Toplevel(self.app.root)
+        self.win.title("修改流水")
+        set_window_icon(self.win)
+        self.scale = get_scaling()
+        self.win.geometry(self._dpi("400x290"))
+        self.win.attributes("-topmost", True)
+        apply_tencent_theme(self.win)
+
+        card = ttk.Labelframe(self.win, labelwidget=ttk.Label(self.win, text=f"流水（{txn.get('side')}）"), style="Card.TLabelframe")
+        card.pack(fill=tk.BOTH, expand=True, padx=16, pady=16)
+        frm = ttk.Frame(card, padding=16); frm.pack(fill=tk.BOTH, expand=True)
+
+        if adj:
+            fields = (("ts", "时间", txn.get("ts", "")),
+                      ("post_grams", "总克数 (g)", f"{txn.get('post_grams', 0.0):.3f}"),
+                      ("post_avg", "均价/克 (¥)", f"{txn.get('post_avg', 0.0):.2f}"))
+        else:
+            fields = (("ts", "时间", txn.get("ts", "")),
+                      ("grams", "数量(克)", f"{txn.get('grams', 0.0):.3f}"),
+                      ("price", "价格(¥)", f"{txn.get('price', 0.0):.2f}"),
+                      ("fee_amt", "手续费(¥)", f"{txn.get('fee_amt', 0.0):.2f}"))
+        self.ents = {}
+        for row, (key, text, val) in enumerate(fields):
+            ttk.Label(frm, text=text).grid(row=row, column=0, sticky="e", padx=8, pady=6)
+            ent = ttk.Entry(frm, width=24); ent.insert(0, val); ent.grid(row=row, column=1, sticky="w")
+            self.ents[key] = ent
+
+        btns = ttk.Frame(frm); btns.grid(row=len(fields), column=0, columnspan=2, sticky="e", pady=(8, 0))
+        ttk.Button(btns, text="取消", command=self.win.destroy).pack(side=tk.RIGHT, padx=6)
+        ttk.Button(btns, text="保存", style="Primary.TButton", command=self._ok).pack(side=tk.RIGHT, padx=6)
+
+    def _dpi(self, geom: str):
+        try:
+            w, h = geom.lower().split("x"); return f"{int(int(w) * self.scale)}x{int(int(h) * self.scale)}"
+        except Exception:
+            return geom
+
+    def _ok(self):
+        t = dict(self.txn)
+        try:
+            for key, ent in self.ents.items():
+                t[key] = ent.get().strip() if key == "ts" else float(ent.get())
+        except Exception:
+            msg.showwarning("提示", "请输入有效数字"); return
+        if any(v < 0 for k, v in t.items() if k in self.ents and k != "ts"):
+            msg.showwarning("提示", "数值需为非负"); return
+        if t.get("side") != "ADJ":
+            if t["grams"] <= 0:
+                msg.showwarning("提示", "数量需大于 0"); return
+            amt = t["grams"] * t["price"]
+            t["fee_rate"] = t["fee_amt"] / amt * 100.0 if amt else 0.0
+        if self.on_ok(t) is not False:
+            self.win.destroy()
+
+
 class DetailWindow:
+    # pid → 已打开的详情窗口。同一个仓只开一个：两个窗口各持一份账本 / 批次 / 表格，又共用 p["txns"]，
+    # 一个关闭时 release 掉列表后另一个就和分片对不上了
+    opened: Dict[str, "DetailWindow"] = {}
+
+    @classmethod
+    def show(cls, app_ref, index: int, on_change=None, on_close=None) -> "DetailWindow":
+        """打开仓详情；该仓已有窗口时提到前面。"""
+        w = cls.opened.get(app_ref.portfolios[index].get("pid"))
+        if w is not None:
+            try:
+                w.win.deiconify(); w.win.lift(); w.win.focus_force()
+                return w
+            except tk.TclError:
+                pass
+        return cls(app_ref, index, on_change, on_close)
+
     def __init__(self, app_ref, index: int, on_change=None, on_close=None):
         self.app = app_ref
         self.index = index
         self.on_change = on_change
         self.on_close = on_close
+        self._pid = app_ref.portfolios[index].get("pid")
+        DetailWindow.opened[self._pid] = self
 
         self.win = tk.Toplevel(self.app.root)
         self.win.title(f"仓库管理 - {self.portfolio['name']}")
         set_window_icon(self.win)
         self.scale = get_scaling()
-        self.win.geometry(self._dpi("900x620"))
+        self.win.geometry(self._dpi("900x680"))
         self.win.attributes("-topmost", True)
         apply_tencent_theme(self.win)
 
-        def _close():
-            try:
-                if callable(self.on_close):
-                    self.on_close()
-            finally:
-                self.win.destroy()
-        self.win.protocol("WM_DELETE_WINDOW", _close)
+        self.win.protocol("WM_DELETE_WINDOW", self.close)
 
         header = ttk.Frame(self.win, padding=(16, 14, 16, 8)); header.pack(fill=tk.X)
         self.lbl_pos = ttk.Label(header, text="", style="Title.TLabel"); self.lbl_pos.pack(side=tk.LEFT)
 
         #交易卡片
-        trade_card = ttk.Labelframe(self.win, labelwidget=ttk.Label(self.win, text="交易（按当前黄金T+D价）"), style="Card.TLabelframe")
+        self.lbl_trade = ttk.Label(self.win, text=f"交易（按当前{self._inst_name()}价）")
+        trade_card = ttk.Labelframe(self.win, labelwidget=self.lbl_trade, style="Card.TLabelframe")
         trade_card.pack(fill=tk.X, padx=16, pady=(8, 8))
         tfrm = ttk.Frame(trade_card, padding=12); tfrm.pack(fill=tk.X)
 
@@ -116,6 +214,12 @@ class DetailWindow:
         ttk.Button(btns, text="买入", style="Primary.TButton", command=self._buy).pack(side=tk.LEFT, padx=6)
         ttk.Button(btns, text="卖出", command=self._sell).pack(side=tk.LEFT, padx=6)
 
+        # 指定批次口径下卖出前选批次
+        ttk.Label(tfrm, text="卖出批次").grid(row=2, column=0, sticky="e", padx=8, pady=(6, 0))
+        self.cmb_lot = ttk.Combobox(tfrm, state="readonly", width=48)
+        self.cmb_lot.grid(row=2, column=1, columnspan=4, sticky="w", pady=(6, 0))
+        self._lot_map = {}
+
         #校正均价 + 总克数 + 仓名
         adj_card = ttk.Labelframe(self.win, labelwidget=ttk.Label(self.win, text="校正（可同时修改仓名 / 总克数 / 均价）"), style="Card.TLabelframe")
         adj_card.pack(fill=tk.X, padx=16, pady=8)
@@ -135,36 +239,75 @@ class DetailWindow:
         ttk.Label(afr, text="新的均价/克 (¥)").grid(row=r, column=0, sticky="e", padx=8, pady=6)
         self.ent_new_avg = ttk.Entry(afr, width=16)
         self.ent_new_avg.insert(0, f"{self.portfolio['cost_per_g']:.2f}")
-        self.ent_new_avg.grid(row=r, column=1, sticky="w")
+        self.ent_new_avg.grid(row=r, column=1, sticky="w"); r += 1
+
+        ttk.Label(afr, text="计价品种").grid(row=r, column=0, sticky="e", padx=8, pady=6)
+        names, self._bind_map = _bind_choices()
+        self.cmb_inst = ttk.Combobox(afr, values=names, state="readonly", width=22)
+        self.cmb_inst.set(self._inst_name())
+        self.cmb_inst.grid(row=r, column=1, sticky="w")
 
-        ttk.Button(afr, text="应用", style="Primary.TButton", command=self._apply_adjustments).grid(row=r, column=2, padx=8)
+        ttk.Button(afr, text="应用", style="Primary.TButton", command=self._apply_adjustments).grid(row=r, column=2, padx=8); r += 1
+
+        ttk.Label(afr, text="成本计算").grid(row=r, column=0, sticky="e", padx=8, pady=6)
+        self._method_map = {METHOD_NAMES[m]: m for m in METHODS}
+        self.cmb_method = ttk.Combobox(afr, values=list(self._method_map), state="readonly", width=22)
+        self.cmb_method.set(METHOD_NAMES[self.app.pnl.method_of(self.portfolio)])
+        self.cmb_method.grid(row=r, column=1, sticky="w")
 
         #流水
         log_card = ttk.Labelframe(self.win, labelwidget=ttk.Label(self.win, text="流水记录"), style="Card.TLabelframe")
         log_card.pack(fill=tk.BOTH, expand=True, padx=16, pady=(8, 16))
         lfrm = ttk.Frame(log_card, padding=8); lfrm.pack(fill=tk.BOTH, expand=True)
 
-        cols = ("ts", "side", "g", "price", "fee", "post_g", "post_avg")
-        self.log = ttk.Treeview(lfrm, columns=cols, show="headings", selectmode="browse")
-        self.log.heading("ts",       text="时间");     self.log.column("ts",       width=160, anchor="center")
-        self.log.heading("side",     text="类型");     self.log.column("side",     width=80,  anchor="center")
-        self.log.heading("g",        text="数量(g)");  self.log.column("g",        width=100, anchor="e")
-        self.log.heading("price",    text="价格(¥)");  self.log.column("price",    width=100, anchor="e")
-        self.log.heading("fee",      text="手续费");    self.log.column("fee",      width=130, anchor="center")
-        self.log.heading("post_g",   text="持仓(g)");  self.log.column("post_g",   width=100, anchor="e")
-        self.log.heading("post_avg", text="均价");      self.log.column("post_avg", width=100, anchor="e")
-
-        vsb = ttk.Scrollbar(lfrm, orient="vertical", command=self.log.yview)
-        self.log.configure(yscrollcommand=vsb.set)
-        self.log.pack(side=tk.LEFT, fill=tk.BOTH, expand=True); vsb.pack(side=tk.RIGHT, fill=tk.Y)
+        txns = store.txns(self.portfolio)
+        if "opening" not in self.portfolio:         # 旧仓没记期初持仓，按第一笔流水倒推一次并随摘要保存
+            self.portfolio["opening"] = list(infer_opening(txns))
+        self.ledger = Ledger(txns, tuple(self.portfolio["opening"]))
+        self.lots = LotBook(txns, tuple(self.portfolio["opening"]), self.app.pnl.method_of(self.portfolio))
+        self.app.pnl.update(self.portfolio, self.lots)
+        self._refresh_lots()
+        self.log = TxnLog(lfrm, txns, self.ledger)
+        lbtns = ttk.Frame(lfrm); lbtns.pack(fill=tk.X, pady=(6, 0))
+        ttk.Button(lbtns, text="删除选中", command=self._delete_txn).pack(side=tk.RIGHT, padx=6)
+        ttk.Button(lbtns, text="修改选中", command=self._edit_txn).pack(side=tk.RIGHT, padx=6)
+        ttk.Button(lbtns, text="导入CSV…", command=self._import_csv).pack(side=tk.LEFT, padx=6)
 
         self._refresh_header()
-        self._refresh_log()
+        self.app.add_quote_listener(self._on_quotes)
+        self.win.after(5000, self._tick_header)
+
+    def close(self):
+        try:
+            DetailWindow.opened.pop(self._pid, None)
+            self.app.remove_quote_listener(self._on_quotes)
+            p = self.portfolio
+            if p is not None:
+                store.release(p)            # 流水只在详情打开期间驻留内存
+            if callable(self.on_close):
+                self.on_close()
+        finally:
+            self.win.destroy()
 
     # 属性
     @property
     def portfolio(self):
-        return self.app.portfolios[self.index]
+        """按 pid 找仓：管理窗口删掉排在前面的仓会挪动下标，index 只当缓存；仓已被删除时为 None。"""
+        ps = self.app.portfolios
+        if self.index < len(ps) and ps[self.index].get("pid") == self._pid:
+            return ps[self.index]
+        for i, p in enumerate(ps):
+            if p.get("pid") == self._pid:
+                self.index = i
+                return p
+        return None
+
+    @property
+    def pid(self):
+        p = self.portfolio
+        if self.app.book.get(p.get("pid")) is not p:
+            self.app.book.sync(self.app.portfolios)
+        return p["pid"]
 
     def _dpi(self, geom: str):
         try:
@@ -172,49 +315,64 @@ class DetailWindow:
         except Exception:
             return geom
 
-    def _inner_price(self):
+    def _inst_name(self):
+        inst = by_code(self.app.book.instrument_of(self.pid))
+        return inst.name if inst else self.app.book.instrument_of(self.pid)
+
+    def _inner_price(self, allow_stale: bool = False):
+        # 绑定品种在共享快照下的 元/克 价（所有仓同一次估值），不在 Tk 线程上发请求；交易只用新鲜价格
         try:
-            lines = probe_all_lines()
-            for s in lines:
-                name, price = s.split(",", 1)
-                if ("Au(T+D)" in name) or ("黄金T+D" in name):
-                    return float(price) if price.strip() else None
+            snap = self.app.feed.latest()
+            if snap.stale and not allow_stale:
+                return None
+            return self.app.book.price_of(self.pid, snap)
         except Exception:
             return None
-        return None
+
+    def _stale_note(self):
+        try:
+            since = self.app.feed.health().get("stale_since")
+        except Exception:
+            return ""
+        if not since:
+            return ""
+        from datetime import datetime
+        return f"（行情停滞于 {datetime.fromtimestamp(since).strftime('%H:%M:%S')}）"
 
     def _now(self):
         from datetime import datetime
         return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
+    def _on_quotes(self, _snap):
+        try:
+            if self.win.winfo_exists():
+                self._refresh_header()
+        except Exception:
+            pass
+
+    def _tick_header(self):
+        # 上游故障时不会有新快照，定时刷新一次以显示“行情停滞于 …”
+        try:
+            if not self.win.winfo_exists():
+                return
+            self._refresh_header()
+            self.win.after(5000, self._tick_header)
+        except Exception:
+            pass
+
     # 头部 / 流水
     def _refresh_header(self):
-        inner = self._inner_price()
+        inner = self._inner_price(allow_stale=True)
         g = self.portfolio["grams"]; avg = self.portfolio["cost_per_g"]
-        pnl = (inner - avg) * g if inner is not None else None
-        inner_str = f"{inner:.2f} ¥" if inner is not None else "--"
+        pnl = self.app.book.pnl(self.pid, inner)
+        inner_str = (f"{inner:.2f} ¥" if inner is not None else "--") + self._stale_note()
         pnl_str = f"{pnl:+.2f} ¥" if pnl is not None else "--"
         self.lbl_pos.config(
             text=f"仓名: {self.portfolio['name']}    持仓: {g:.3f} g    "
-                 f"均价: {avg:.2f} ¥/g    参考价(黄金T+D): {inner_str}    当前仓盈亏: {pnl_str}"
+                 f"均价: {avg:.2f} ¥/g    参考价({self._inst_name()}): {inner_str}    当前仓盈亏: {pnl_str}    "
+                 f"已实现({METHOD_NAMES[self.lots.method]}): {self.lots.realized:+.2f} ¥"
         )
 
-    def _refresh_log(self):
-        for i in self.log.get_children():
-            self.log.delete(i)
-        for t in self.portfolio.get("txns", []):
-            iid = self.log.insert(
-                "", "end",
-                values=(
-                    t["ts"], t["side"], f"{t['grams']:.3f}", f"{t['price']:.2f}",
-                    f"{t['fee_rate']:.2f}%(" + f"{t['fee_amt']:.2f})",
-                    f"{t['post_grams']:.3f}", f"{t['post_avg']:.2f}"
-                )
-            )
-            if len(self.log.get_children()) % 2 == 0:
-                self.log.item(iid, tags=("odd",))
-        self.log.tag_configure("odd", background="#F7F8FA")
-
     #交互
     def _on_fee_toggle(self):
         on = bool(self.var_fee_on.get())
@@ -252,25 +410,20 @@ class DetailWindow:
     def _buy(self):
         inner = self._inner_price()
         if inner is None:
-            msg.showwarning("提示", "当前无法获取黄金T+D价格"); return
+            msg.showwarning("提示", f"当前无法获取{self._inst_name()}价格"); return
         r = self._read_trade()
         if not r: return
         qty, fee_rate = r
 
         fee_amt = inner * qty * (fee_rate / 100.0)
-        g0 = self.portfolio["grams"]; c0 = self.portfolio["cost_per_g"]
-        cost_total1 = g0 * c0 + inner * qty + fee_amt
-        g1 = g0 + qty; c1 = (cost_total1 / g1) if g1 > 0 else 0.0
-
-        self.portfolio["grams"] = g1
-        self.portfolio["cost_per_g"] = c1
+        g1, c1 = self.app.book.buy(self.pid, qty, inner, fee_amt)
         self._append("BUY", qty, inner, fee_rate, fee_amt, g1, c1)
         self._after_change()
 
     def _sell(self):
         inner = self._inner_price()
         if inner is None:
-            msg.showwarning("提示", "当前无法获取黄金T+D价格"); return
+            msg.showwarning("提示", f"当前无法获取{self._inst_name()}价格"); return
         r = self._read_trade()
         if not r: return
         qty, fee_rate = r
@@ -278,21 +431,148 @@ class DetailWindow:
         if qty > self.portfolio["grams"]:
             msg.showwarning("提示", "卖出克数不可大于持仓"); return
 
-        fee_amt = inner * qty * (fee_rate / 100.0)
-        g0 = self.portfolio["grams"]; c0 = self.portfolio["cost_per_g"]
-        g1 = g0 - qty; c1 = c0 if g1 > 0 else 0.0
+        lots = None
+        lid = self._lot_map.get(self.cmb_lot.get())
+        if self.lots.method == "SPEC" and lid:
+            lot = self.lots.queue.get(lid)
+            if lot is None or qty > lot.grams + 1e-9:
+                msg.showwarning("提示", "卖出克数不可大于所选批次的剩余克数"); return
+            lots = [[lid, float(qty)]]
 
-        self.portfolio["grams"] = g1
-        self.portfolio["cost_per_g"] = c1
-        self._append("SELL", qty, inner, fee_rate, fee_amt, g1, c1)
+        fee_amt = inner * qty * (fee_rate / 100.0)
+        g1, c1 = self.app.book.sell(self.pid, qty)
+        self._append("SELL", qty, inner, fee_rate, fee_amt, g1, c1, lots)
         self._after_change()
 
-    def _append(self, side, qty, price, fee_rate, fee_amt, post_g, post_avg):
-        self.portfolio.setdefault("txns", []).append({
-            "ts": self._now(), "side": side, "grams": float(qty), "price": float(price),
+    def _append(self, side, qty, price, fee_rate, fee_amt, post_g, post_avg, lots=None):
+        t = {
+            "id": new_pid(), "ts": self._now(), "side": side, "grams": float(qty), "price": float(price),
             "fee_rate": float(fee_rate), "fee_amt": float(fee_amt),
             "post_grams": float(post_g), "post_avg": float(post_avg)
-        })
+        }
+        if lots:
+            t["lots"] = lots
+        self.app.record_txn(self.portfolio, t)
+        i = len(self.log.txns) - 1
+        self.ledger.append(t)
+        self.lots.apply(t)
+        self.app.pnl.update(self.portfolio, self.lots)
+        self.log.add(i)
+
+    def _refresh_lots(self):
+        """卖出批次下拉：指定批次口径时列出未平批次，其余口径禁用。"""
+        self._lot_map = {}
+        if self.lots.method == "SPEC":
+            for lot in self.lots.queue.open_lots():
+                self._lot_map[f"{lot.ts}  剩 {lot.grams:.3f} g  成本 {lot.cost:.2f} ¥/g  [{lot.lid}]"] = lot.lid
+        names = list(self._lot_map)
+        self.cmb_lot.configure(values=names, state=("readonly" if names else "disabled"))
+        self.cmb_lot.set(names[0] if names else "")
+
+    # 修改 / 删除历史流水：账本只从该笔往后重放，持仓以重放结果为准
+    def _edit_txn(self):
+        i = self.log.selected()
+        if i is None:
+            msg.showwarning("提示", "请先选择一条流水"); return
+
+        def _ok(t):
+            j = self._position(i, t.get("ts", ""))
+            if not self.ledger.edit(i, t, j):
+                msg.showwarning("提示", "修改后会出现卖出克数大于持仓"); return False
+            store.edit_txn(self.portfolio, i, t)
+            if j != i:
+                store.move_txn(self.portfolio, i, j)
+            self._save_posts(min(i, j))
+            self._after_replay()
+        TxnEditDialog(self.app, self.log.txns[i], _ok)
+
+    def _position(self, i, ts):
+        """第 i 笔改成时间 ts 后在流水里应处的下标：仍在前后两笔之间就不动，否则按时间插到同一时间的最后。"""
+        cur = self.log.txns
+        if (i == 0 or cur[i - 1].get("ts", "") <= ts) and (i == len(cur) - 1 or ts <= cur[i + 1].get("ts", "")):
+            return i
+        rest = [t.get("ts", "") for k, t in enumerate(cur) if k != i]
+        return bisect.bisect_right(rest, ts)
+
+    def _save_posts(self, start):
+        """第 start 笔往后的成交后克数 / 均价按账本重放结果写回流水。"""
+        led = self.ledger
+        if start < len(led):
+            store.set_posts(self.portfolio, start, [(led.grams[k], led.avg_at(k)) for k in range(start, len(led))])
+
+    def _delete_txn(self):
+        i = self.log.selected()
+        if i is None:
+            msg.showwarning("提示", "请先选择一条流水"); return
+        t = self.log.txns[i]
+        if not msg.askyesno("确认删除", f"确定删除 {t.get('ts', '')} 的这条 {t.get('side', '')} 流水吗？"):
+            return
+        if not self.ledger.delete(i):
+            msg.showwarning("提示", "删除后会出现卖出克数大于持仓"); return
+        store.delete_txn(self.portfolio, i)
+        self._save_posts(i)
+        self._after_replay()
+
+    # 批量导入对账单：解析、校验都在写入前完成；写入一次落盘，账本 / 批次 / 表格只在最后重建一次
+    def _import_csv(self):
+        path = filedialog.askopenfilename(parent=self.win, title="导入对账单",
+                                          filetypes=[("CSV 文件", "*.csv"), ("所有文件", "*.*")])
+        if not path:
+            return
+        try:
+            enc, header = importer.sniff(path)
+            maps = importer.load_mappings()
+            name = importer.guess(header, maps)
+            if name is None:
+                msg.showwarning("提示", f"无法识别表头：{'、'.join(header[:12])}\n"
+                                       f"请在数据目录的 {importer.MAPPINGS_FILE} 中配置列映射"); return
+            res = importer.parse(path, maps[name], enc)
+        except (OSError, importer.ImportFailed) as e:
+            msg.showwarning("提示", f"读取失败：{e}"); return
+        new = res.txns
+        if not new:
+            msg.showwarning("提示", "没有可导入的流水" + (f"（{len(res.errors)} 行无法识别）" if res.errors else "")); return
+        text = f"按“{name}”识别出 {len(new)} 条流水（{new[0]['ts']} ~ {new[-1]['ts']}）"
+        if res.errors:
+            line, why = res.errors[0]
+            text += f"\n另有 {len(res.errors)} 行无法识别将跳过，如第 {line} 行：{why}"
+        if not msg.askyesno("确认导入", text + "\n导入到本仓？"):
+            return
+
+        cur = self.log.txns
+        if not cur or new[0]["ts"] >= max(t.get("ts", "") for t in cur):
+            merged, ledger = None, self.ledger
+            hit = ledger.extend(new)
+            rows = range(len(cur), len(cur) + len(new))
+        else:
+            # 早于已有流水：按时间并入后整体重放一次
+            merged = sorted(cur + new, key=lambda t: t.get("ts", ""))
+            ledger = Ledger(merged, tuple(self.portfolio["opening"]))
+            hit = -1 if ledger.bad < 0 else ledger.bad
+            rows = range(len(merged))
+        if hit >= 0:
+            t = new[hit] if merged is None else merged[hit]
+            msg.showwarning("提示", f"导入后 {t['ts']} 的卖出克数大于持仓，未导入"); return
+        for i, t in zip(rows, new if merged is None else merged):
+            t["post_grams"], t["post_avg"] = ledger.grams[i], ledger.avg_at(i)
+        try:
+            store.import_txns(self.portfolio, new, merged)
+        except OSError as e:
+            if merged is None:                  # 账本已追加，按原流水重建
+                self.ledger = self.log.ledger = Ledger(cur, tuple(self.portfolio["opening"]))
+            msg.showwarning("提示", f"写入失败：{e}"); return
+        self.ledger = self.log.ledger = ledger
+        self.log.txns = self.portfolio["txns"]
+        self._after_replay()
+        msg.showinfo("成功", f"已导入 {len(new)} 条流水")
+
+    def _after_replay(self):
+        g, avg = self.ledger.position()
+        self.app.book.set_position(self.pid, g, avg)
+        self.lots.rebuild(self.log.txns)
+        self.app.pnl.update(self.portfolio, self.lots)
+        self.log.reload()
+        self._after_change()
 
     #统一应用仓名、克数、均价的校正
     def _apply_adjustments(self):
@@ -321,11 +601,21 @@ class DetailWindow:
             except Exception:
                 pass
 
-        self.portfolio["grams"] = new_grams
-        self.portfolio["cost_per_g"] = new_avg
-
-        # 记录一条 ADJ 流水
-        self._append("ADJ", 0.0, 0.0, 0.0, 0.0, new_grams, new_avg)
+        moved = (new_grams, new_avg) != (self.portfolio["grams"], self.portfolio["cost_per_g"])
+        self.app.book.set_position(self.pid, new_grams, new_avg)
+        code = self._bind_map.get(self.cmb_inst.get())
+        if code:
+            self.app.book.rebind(self.pid, code)
+            self.lbl_trade.config(text=f"交易（按当前{self._inst_name()}价）")
+        method = self._method_map.get(self.cmb_method.get())
+        if method and method != self.lots.method:
+            self.lots.method = method
+            self.lots.rebuild(self.log.txns)
+            self.app.pnl.update(self.portfolio, self.lots)
+
+        # 持仓有变化时记录一条 ADJ 流水（ADJ 会把批次合并成一个，只改仓名 / 品种 / 口径时不记）
+        if moved:
+            self._append("ADJ", 0.0, 0.0, 0.0, 0.0, new_grams, new_avg)
 
         # 刷新 & 落盘 & 通知
         self._after_change()
@@ -334,7 +624,7 @@ class DetailWindow:
     def _after_change(self):
         # 刷新本页
         self._refresh_header()
-        self._refresh_log()
+        self._refresh_lots()
         self.app.save_all()
 
         if callable(self.on_change):
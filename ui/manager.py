@@ -8,6 +8,7 @@ from core.styles import *
 from core.resource import get_scaling
 from .theme import apply_tencent_theme
 from .detail import DetailWindow, NewPortfolioDialog
+from core import store
 
 
 class ManagerWindow:
@@ -24,6 +25,8 @@ class ManagerWindow:
 
         header = ttk.Frame(self.win, padding=(16, 14, 16, 8)); header.pack(fill=tk.X)
         ttk.Label(header, text="我的仓库", style="Title.TLabel").pack(side=tk.LEFT)
+        self.lbl_total = ttk.Label(header, text="", style="Subtle.TLabel")     # 所有仓的总浮动盈亏
+        self.lbl_total.pack(side=tk.LEFT, padx=12)
 
         btns = ttk.Frame(header); btns.pack(side=tk.RIGHT)
         ttk.Button(btns, text="新建仓库", style="Primary.TButton", command=self._new).pack(side=tk.LEFT, padx=6)
@@ -34,22 +37,40 @@ class ManagerWindow:
         card.pack(fill=tk.BOTH, expand=True, padx=16, pady=(4, 16))
         inner = ttk.Frame(card, padding=12); inner.pack(fill=tk.BOTH, expand=True)
 
-        cols = ("name", "grams", "avg")
+        cols = ("name", "grams", "avg", "realized", "unrealized")
         self.tree = ttk.Treeview(inner, columns=cols, show="headings", selectmode="browse")
-        self.tree.heading("name",  text="仓名");      self.tree.column("name",  width=280, anchor="w")
-        self.tree.heading("grams", text="持仓(g)");   self.tree.column("grams", width=140, anchor="center")
-        self.tree.heading("avg",   text="均价(¥/g)"); self.tree.column("avg",   width=140, anchor="center")
+        self.tree.heading("name",       text="仓名");      self.tree.column("name",       width=200, anchor="w")
+        self.tree.heading("grams",      text="持仓(g)");   self.tree.column("grams",      width=110, anchor="center")
+        self.tree.heading("avg",        text="均价(¥/g)"); self.tree.column("avg",        width=110, anchor="center")
+        self.tree.heading("realized",   text="已实现(¥)"); self.tree.column("realized",   width=120, anchor="e")
+        self.tree.heading("unrealized", text="浮动盈亏(¥)"); self.tree.column("unrealized", width=120, anchor="e")
 
         vsb = ttk.Scrollbar(inner, orient="vertical", command=self.tree.yview)
         self.tree.configure(yscrollcommand=vsb.set)
         self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True); vsb.pack(side=tk.RIGHT, fill=tk.Y)
 
+        # 展示项报价（按 unit_overrides 换算的口径）
+        self.lbl_quotes = ttk.Label(self.win, text="", style="Subtle.TLabel")
+        self.lbl_quotes.pack(side=tk.TOP, anchor="w", padx=16, pady=(0, 4), before=card)
+
         self.hint = ttk.Label(self.win, text="", style="Subtle.TLabel")
         self.hint.pack(side=tk.TOP, anchor="w", padx=16, pady=(0, 8))
 
         self._refresh()
         self.tree.bind("<Double-Button-1>", lambda _e: self._open_detail())
 
+        # 浮动盈亏随行情刷新：只改两列文字，数值来自 app 的缓存汇总
+        if hasattr(self.app, "add_quote_listener"):
+            self.app.add_quote_listener(self._on_quotes)
+
+        def _close():
+            try:
+                if hasattr(self.app, "remove_quote_listener"):
+                    self.app.remove_quote_listener(self._on_quotes)
+            finally:
+                self.win.destroy()
+        self.win.protocol("WM_DELETE_WINDOW", _close)
+
     def _dpi(self, geom: str):
         try:
             w, h = geom.lower().split("x")
@@ -63,25 +84,83 @@ class ManagerWindow:
         elif getattr(self.app, "bubble", None):
             try:
                 self.app.bubble.reload_all(
-                    display_quotes=self.app.display_quotes,
+                    display_quotes=self.app.display_names(),
                     portfolios=self.app.portfolios,
                     active_index=self.app.active_index
                 )
             except Exception:
                 pass
 
+    def _pnl_cells(self, report, p):
+        rz, un = report.per_pid.get(p.get("pid"), (0.0, None)) if report else (0.0, None)
+        return f"{rz:+.2f}", (f"{un:+.2f}" if un is not None else "--")
+
+    def _report(self):
+        try:
+            return self.app.pnl_report() if hasattr(self.app, "pnl_report") else None
+        except Exception:
+            return None
+
     def _refresh(self):
         for i in self.tree.get_children():
             self.tree.delete(i)
+        report = self._report()
         for idx, p in enumerate(self.app.portfolios):
             iid = self.tree.insert(
                 "", "end", iid=str(idx),
-                values=(p["name"], f"{p['grams']:.3f}", f"{p['cost_per_g']:.2f}")
+                values=(p["name"], f"{p['grams']:.3f}", f"{p['cost_per_g']:.2f}", *self._pnl_cells(report, p))
             )
             if idx % 2 == 1:
                 self.tree.item(iid, tags=("odd",))
         self.tree.tag_configure("odd", background="#F7F8FA")
         self.hint.config(text=("暂无仓库，请点击右上角“新建仓库”创建。" if not self.app.portfolios else ""))
+        self._refresh_quotes()
+
+    def _stats(self):
+        try:
+            return self.app.quote_stats() if hasattr(self.app, "quote_stats") else {}
+        except Exception:
+            return {}
+
+    def _quote_text(self, snap=None) -> str:
+        stats = self._stats()
+        parts = []
+        for code, name, px, unit in self.app.quote_view(snap):
+            text = f"{name} {px:,.2f} {unit}" if px is not None else f"{name} --"
+            st = stats.get(code) or {}
+            chg, vol = st.get("chg_open", float("nan")), st.get("vol", float("nan"))
+            if chg == chg:
+                text += f" 较开盘 {chg * 100:+.2f}%"
+            if vol == vol:
+                text += f" 波动 {vol * 100:.3f}%"
+            parts.append(text)
+        return "　　".join(parts)
+
+    def _refresh_quotes(self, snap=None):
+        if hasattr(self.app, "quote_view"):
+            try:
+                self.lbl_quotes.config(text=self._quote_text(snap))
+            except Exception:
+                pass
+        if hasattr(self.app, "total_pnl"):
+            try:
+                pnl = self.app.total_pnl()
+                self.lbl_total.config(text=(f"总浮动盈亏 ¥{pnl:+,.2f}" if pnl is not None else "总浮动盈亏 --"))
+            except Exception:
+                pass
+
+    def _on_quotes(self, snap):
+        try:
+            if not self.win.winfo_exists():
+                return
+            self._refresh_quotes(snap)
+            report = self._report()
+            for idx, p in enumerate(self.app.portfolios):
+                rz, un = self._pnl_cells(report, p)
+                self.tree.set(str(idx), "realized", rz)
+                self.tree.set(str(idx), "unrealized", un)
+        except Exception:
+            pass
 
     def _selected_index(self):
         sel = self.tree.selection()
@@ -104,6 +183,12 @@ class ManagerWindow:
         name = self.app.portfolios[idx]["name"]
         if not msg.askyesno("确认删除", f"确定删除“{name}”吗？该仓流水将一并删除。"):
             return
+        pid = self.app.portfolios[idx]["pid"]
+        w = DetailWindow.opened.get(pid)
+        if w is not None:                   # 该仓的详情窗口先关掉（释放流水、摘掉行情监听）
+            try: w.close()
+            except tk.TclError: pass
+        store.drop_txns(pid)
         del self.app.portfolios[idx]
         if self.app.active_index is not None:
             if idx < self.app.active_index:
@@ -120,7 +205,7 @@ class ManagerWindow:
         if idx is None:
             msg.showwarning("提示", "请先选择一个仓库"); return
 
-        DetailWindow(
+        DetailWindow.show(
             self.app, idx,
             on_change=self._on_detail_change,
             on_close=self._refresh
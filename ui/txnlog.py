@@ -0,0 +1,169 @@
+# ui/txnlog.py
+# 流水表：排序 / 筛选在 Python 侧的下标列表上完成，表格里只放已滚动到的那几页（滚到底部再加载下一页）；
+# 新成交只插入一行，不重建整表。几万条流水打开时也只渲染第一页。
+# 成交后持仓 / 均价取账本（core.ledger）重放的结果，改删历史流水后自动一致。
+import bisect
+import tkinter as tk
+from tkinter import ttk
+from typing import List
+
+PAGE = 200                      # 每页渲染的行数
+SIDES = ("全部", "BUY", "SELL", "ADJ")
+
+COLUMNS = (
+    ("ts",       "时间",    160, "center"),
+    ("side",     "类型",    80,  "center"),
+    ("g",        "数量(g)", 100, "e"),
+    ("price",    "价格(¥)", 100, "e"),
+    ("fee",      "手续费",   130, "center"),
+    ("post_g",   "持仓(g)", 100, "e"),
+    ("post_avg", "均价",     100, "e"),
+)
+
+SORT_KEYS = {
+    "ts":       lambda t: t.get("ts", ""),
+    "side":     lambda t: t.get("side", ""),
+    "g":        lambda t: float(t.get("grams") or 0.0),
+    "price":    lambda t: float(t.get("price") or 0.0),
+    "fee":      lambda t: float(t.get("fee_amt") or 0.0),
+}
+
+
+class TxnLog:
+    """仓流水表。txns 为该仓的流水列表（按记录顺序），ledger 为对应的重放账本；表格行的 iid 是流水在列表里的下标。
+    _order / _keys 为筛选后按 (排序键, 下标) 升序排好的下标，倒序显示时从尾部取。"""
+    def __init__(self, parent, txns: List[dict], ledger):
+        self.txns = txns
+        self.ledger = ledger
+        self.sort_col = "ts"
+        self.sort_desc = True           # 默认最新在前
+        self._order: List[int] = []
+        self._keys: list = []
+        self._shown = 0                 # 已渲染到表格里的行数
+        self._loading = False
+        self._filter = (SIDES[0], "", "")   # (类型, 日期从, 日期到)，reload 时从输入框读一次
+
+        bar = ttk.Frame(parent); bar.pack(fill=tk.X, pady=(0, 6))
+        ttk.Label(bar, text="类型").pack(side=tk.LEFT)
+        self.cmb_side = ttk.Combobox(bar, values=SIDES, state="readonly", width=8)
+        self.cmb_side.set(SIDES[0])
+        self.cmb_side.bind("<<ComboboxSelected>>", lambda _e: self.reload())
+        self.cmb_side.pack(side=tk.LEFT, padx=(6, 12))
+        ttk.Label(bar, text="日期从").pack(side=tk.LEFT)
+        self.ent_from = ttk.Entry(bar, width=12); self.ent_from.pack(side=tk.LEFT, padx=6)
+        ttk.Label(bar, text="到").pack(side=tk.LEFT)
+        self.ent_to = ttk.Entry(bar, width=12); self.ent_to.pack(side=tk.LEFT, padx=6)
+        ttk.Button(bar, text="筛选", command=self.reload).pack(side=tk.LEFT, padx=6)
+        self.lbl_count = ttk.Label(bar, text=""); self.lbl_count.pack(side=tk.RIGHT)
+
+        body = ttk.Frame(parent); body.pack(fill=tk.BOTH, expand=True)
+        self.tree = ttk.Treeview(body, columns=[c[0] for c in COLUMNS], show="headings", selectmode="browse")
+        for col, text, width, anchor in COLUMNS:
+            self.tree.heading(col, text=text, command=lambda c=col: self.sort_by(c))
+            self.tree.column(col, width=width, anchor=anchor)
+        self.tree.tag_configure("odd", background="#F7F8FA")
+
+        self.vsb = ttk.Scrollbar(body, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_scroll)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True); self.vsb.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.reload()
+
+    # ---------- 筛选 / 排序 ----------
+    def _match(self, t: dict) -> bool:
+        side, lo, hi = self._filter
+        if side != SIDES[0] and t.get("side") != side:
+            return False
+        ts = t.get("ts", "")
+        # 时间是 "YYYY-MM-DD HH:MM:SS"，按前缀比较：输入 2024-05 即整月
+        if lo and ts[:len(lo)] < lo:
+            return False
+        if hi and ts[:len(hi)] > hi:
+            return False
+        return True
+
+    def _key(self, i: int):
+        if self.sort_col == "post_g":
+            return (self.ledger.grams[i], i)
+        if self.sort_col == "post_avg":
+            return (self.ledger.avg_at(i), i)
+        return (SORT_KEYS[self.sort_col](self.txns[i]), i)
+
+    def sort_by(self, col: str):
+        if col == self.sort_col:
+            self.sort_desc = not self.sort_desc
+        else:
+            self.sort_col, self.sort_desc = col, col == "ts"
+        self.reload()
+
+    def reload(self, txns: List[dict] = None):
+        """重建下标并从第一页开始渲染（筛选 / 排序 / 流水整体变化时调用）。"""
+        if txns is not None:
+            self.txns = txns
+        self._filter = (self.cmb_side.get(), self.ent_from.get().strip(), self.ent_to.get().strip())
+        keys = sorted(self._key(i) for i, t in enumerate(self.txns) if self._match(t))
+        self._keys = keys
+        self._order = [k[1] for k in keys]
+        self.tree.delete(*self.tree.get_children())
+        self._shown = 0
+        self._more()
+
+    # ---------- 渲染 ----------
+    def _at(self, r: int) -> int:
+        return self._order[-1 - r] if self.sort_desc else self._order[r]
+
+    def _row(self, i: int):
+        t = self.txns[i]
+        return (
+            t["ts"], t["side"], f"{t['grams']:.3f}", f"{t['price']:.2f}",
+            f"{t['fee_rate']:.2f}%(" + f"{t['fee_amt']:.2f})",
+            f"{self.ledger.grams[i]:.3f}", f"{self.ledger.avg_at(i):.2f}"
+        )
+
+    def _insert(self, i: int, r: int):
+        """第 i 条流水渲染到表格第 r 行；斑马纹按显示位置，不按流水下标（排序 / 筛选后下标不连续）。"""
+        self.tree.insert("", r, iid=str(i), values=self._row(i), tags=(("odd",) if r % 2 else ()))
+
+    def _restripe(self, start: int):
+        """中间插入一行后，其后各行的奇偶位置都变了。"""
+        for r, iid in enumerate(self.tree.get_children()[start:], start):
+            self.tree.item(iid, tags=(("odd",) if r % 2 else ()))
+
+    def selected(self):
+        """选中行对应的流水下标；未选中为 None。"""
+        sel = self.tree.selection()
+        return int(sel[0]) if sel else None
+
+    def _more(self):
+        self._loading = False
+        end = min(self._shown + PAGE, len(self._order))
+        for r in range(self._shown, end):
+            self._insert(self._at(r), r)
+        self._shown = end
+        self._update_count()
+
+    def _on_scroll(self, lo, hi):
+        self.vsb.set(lo, hi)
+        if float(hi) >= 0.98 and self._shown < len(self._order) and not self._loading:
+            self._loading = True
+            self.tree.after_idle(self._more)
+
+    def _update_count(self):
+        n, m = len(self.txns), len(self._order)
+        self.lbl_count.config(text=f"共 {n} 条" if m == n else f"共 {n} 条，筛选后 {m} 条")
+
+    def add(self, i: int):
+        """流水列表末尾新增了第 i 条：按排序位置插入下标；落在已渲染范围内才往表格插一行。"""
+        t = self.txns[i]
+        if self._match(t):
+            k = self._key(i)
+            pos = bisect.bisect(self._keys, k)
+            self._keys.insert(pos, k)
+            self._order.insert(pos, i)
+            r = len(self._order) - 1 - pos if self.sort_desc else pos
+            if r < self._shown or self._shown == len(self._order) - 1:
+                self._insert(i, r)
+                self._shown += 1
+                self._restripe(r + 1)
+                self.tree.see(str(i))
+        self._update_count()
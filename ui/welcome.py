@@ -5,11 +5,8 @@ from tkinter import ttk, messagebox
 import re
 
 from ui.theme import BG_APP
-from core.prices import probe_all_lines
-
-SPREAD_NAME = "伦-纽差价"
-LONDON_KEY  = "伦敦金（现货黄金）"
-NEWYORK_KEY = "纽约黄金"
+from core.prices import latest_snapshot
+from core.instruments import resolve
 
 T_BLUE       = "#1E80FF"
 T_BLUE_HOVER = "#1669D7"
@@ -21,26 +18,6 @@ FONT_FAMILY  = "Microsoft YaHei UI"
 CHK_ON  = "✔"
 CHK_OFF = ""
 
-def _is_jd_name(name: str) -> bool:
-    n = (name or "").strip()
-    if "(JD)" in n:
-        return True
-    for k in ("黄金T+D", "Au(T+D)"):
-        if k in n:
-            return True
-    return False
-
-def is_sina_reco(name: str) -> bool:
-    n = (name or "").strip()
-    if _is_jd_name(n):
-        return False
-    if "伦敦金（现货黄金）" in n:
-        return True
-    if "黄金延期" in n:
-        return True
-    return False
-
-
 class WelcomeSelector(ttk.Frame):
     def __init__(self, master, header_text="请选择正好两个关注品种", min_pick=2, max_pick=2,
                  on_confirm=None, on_cancel=None):
@@ -50,63 +27,63 @@ class WelcomeSelector(ttk.Frame):
         self.min_pick   = min_pick
         self.max_pick   = max_pick
 
-        self.selected = []
-        self._rowmap  = {}
+        self.selected = []       # 品种 code
+        self._rowmap  = {}       # code -> iid
+        self._iidmap  = {}       # iid  -> code
 
-        # 一次性取数
+        # 一次性取数（读后台快照，不阻塞）；先显示缓存快照，实时快照到了再补填
         self.fetched_at = datetime.datetime.now()
+        self._stale = False
         self.data = self._fetch_once()
 
         self._setup_style()
         self._build_ui(header_text)
         self._fill_tree(self.data)
+        if len(self.data) <= 1 or self._stale:
+            self.after(300, self._wait_first_snapshot)
+
+    def _wait_first_snapshot(self, tries: int = 0):
+        try:
+            if not self.winfo_exists():
+                return
+        except Exception:
+            return
+        rows = self._fetch_once()
+        if len(rows) <= 1 or self._stale:
+            if tries < 100:
+                self.after(300, lambda: self._wait_first_snapshot(tries + 1))
+            return
+        self.data = rows
+        self.lbl_ts.config(text=self._ts_text())
+        for iid in self.tree.get_children():
+            self.tree.delete(iid)
+        self._rowmap.clear(); self._iidmap.clear()
+        self._fill_tree(self.data)
 
     def _fetch_once(self):
-        price_map = {}
         rows = []
+        seen = set()
+        snap = latest_snapshot()
+        if snap:
+            self.fetched_at = datetime.datetime.fromtimestamp(snap.ts)
+        self._stale = snap.stale
         try:
-            for s in probe_all_lines():
-                try:
-                    n, p = s.split(",", 1)
-                except ValueError:
+            for raw, val in snap.items():
+                inst = resolve(raw)
+                if inst.code in seen:
                     continue
-                raw = (n or "").strip()
-                p = (p or "").strip()
-                try:
-                    val = float(p)
-                    price_str = f"{val:.2f}"
-                except Exception:
-                    val = None
-                    price_str = ""
-                price_map[raw] = val
-                reco = is_sina_reco(raw)
-                show = raw + ("（推荐）" if reco else "")
+                seen.add(inst.code)
+                price_str = f"{val:.2f}" if val is not None else ""
+                if price_str and inst.unit == "%":
+                    price_str += "%"
+                show = raw + ("（推荐）" if inst.reco else "")
                 rows.append({
-                    "raw": raw, "price": val, "price_str": price_str,
-                    "reco": reco, "show": show
+                    "code": inst.code, "raw": raw, "price": val, "price_str": price_str,
+                    "reco": inst.reco, "derived": inst.source == "derived", "show": show
                 })
         except Exception:
             pass
 
-        # 计算一次差价
-        spread_str = ""
-        try:
-            ln = price_map.get(LONDON_KEY)
-            ny = price_map.get(NEWYORK_KEY)
-            if (ln is not None) and (ny is not None) and ln != 0:
-                spread = (ny - ln) / ln * 100.0
-                spread_str = f"{spread:.2f}%"
-        except Exception:
-            spread_str = ""
-
-        rows.append({
-            "raw": SPREAD_NAME,
-            "price": None,           # 不参与数值排序
-            "price_str": spread_str, # 展示方便
-            "reco": True,            # 给个推荐标记便于靠前展示
-            "show": SPREAD_NAME
-        })
-
         # 推荐优先，再按名称
         rows.sort(key=lambda d: (0 if d["reco"] else 1, d["raw"]))
         return rows
@@ -134,8 +111,8 @@ class WelcomeSelector(ttk.Frame):
         self.grid_rowconfigure(2, weight=1)
 
         ttk.Label(self, text=header_text, style="Header.TLabel").grid(row=0, column=0, sticky="w")
-        ts = self.fetched_at.strftime("%Y-%m-%d %H:%M:%S")
-        ttk.Label(self, text=f"更新于 {ts}", style="Sub.TLabel").grid(row=1, column=0, sticky="w", pady=(2, 8))
+        self.lbl_ts = ttk.Label(self, text=self._ts_text(), style="Sub.TLabel")
+        self.lbl_ts.grid(row=1, column=0, sticky="w", pady=(2, 8))
 
         wrap = ttk.Frame(self); wrap.grid(row=2, column=0, sticky="nsew")
         wrap.grid_columnconfigure(0, weight=1); wrap.grid_rowconfigure(0, weight=1)
@@ -171,31 +148,35 @@ class WelcomeSelector(ttk.Frame):
         self.btn_confirm.grid(row=0, column=1)
         self._update_confirm_state()
 
+    def _ts_text(self):
+        ts = self.fetched_at.strftime("%Y-%m-%d %H:%M:%S")
+        return f"更新于 {ts}" + ("（缓存，正在获取最新行情…）" if self._stale else "")
+
     def _fill_tree(self, rows):
         if not self.selected:
             for d in rows:
-                raw = d["raw"]
-                if ("伦敦金" in raw and not _is_jd_name(raw)) or ("黄金延期" in raw and not _is_jd_name(raw)):
-                    if raw not in self.selected:
-                        self.selected.append(raw)
+                if d["reco"] and not d["derived"] and d["code"] not in self.selected:
+                    self.selected.append(d["code"])
                 if len(self.selected) >= self.max_pick:
                     break
 
         for d in rows:
             iid = self.tree.insert(
                 "", "end",
-                values=(d["show"], d["price_str"], CHK_ON if d["raw"] in self.selected else CHK_OFF),
+                values=(d["show"], d["price_str"], CHK_ON if d["code"] in self.selected else CHK_OFF),
             )
             if d["reco"]:
                 self.tree.tag_configure("reco", font=(FONT_FAMILY, 10, "bold"))
                 self.tree.item(iid, tags=("reco",))
-            self._rowmap[d["raw"]] = iid
+            self._rowmap[d["code"]] = iid
+            self._iidmap[iid] = d["code"]
 
         self._update_confirm_state()
 
     def _toggle_by_iid(self, iid):
-        name_show = self.tree.set(iid, "name")
-        raw = name_show.replace("（推荐）", "")
+        raw = self._iidmap.get(iid)
+        if raw is None:
+            return
         if raw in self.selected:
             self.selected = [x for x in self.selected if x != raw]
             self.tree.set(iid, "pick", CHK_OFF)
@@ -247,13 +228,12 @@ class WelcomeSelector(ttk.Frame):
         if callable(self.on_cancel):
             self.on_cancel()
 
-    def preset_selected(self, raw_names):
+    def preset_selected(self, codes):
         try:
-            self.selected = list(raw_names or [])[: self.max_pick]
+            self.selected = list(codes or [])[: self.max_pick]
             for iid in self.tree.get_children():
-                name_show = self.tree.set(iid, "name")
-                raw = name_show.replace("（推荐）", "")
-                self.tree.set(iid, "pick", CHK_ON if raw in self.selected else CHK_OFF)
+                code = self._iidmap.get(iid)
+                self.tree.set(iid, "pick", CHK_ON if code in self.selected else CHK_OFF)
             self._update_confirm_state()
         except Exception:
             pass